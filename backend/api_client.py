@@ -2,7 +2,10 @@ import requests
 import json
 
 # Import from config using the new, refactored function name
-from config import VOS_SERVERS, DEFAULT_TIMEOUT, get_server_info_from_url
+from config import VOS_SERVERS, DEFAULT_TIMEOUT, VOS_ACCEPT_COMPRESSED, get_server_info_from_url
+from metrics import VosCallObservation
+import json_codec
+import tracing
 
 def call_api(
     base_url: str,
@@ -12,11 +15,31 @@ def call_api(
     timeout: int = DEFAULT_TIMEOUT,
     server_name_for_log: str | None = None
 ) -> tuple[dict | None, str | None]:
+    # Every call is timed and counted per server/endpoint (see metrics.py, served on /metrics)
+    server_label = server_name_for_log or get_server_info_from_url(base_url, VOS_SERVERS).get("name", base_url)
+    observation = VosCallObservation(server_label, endpoint)
+    with tracing.span("vos.call", server=server_label, endpoint=endpoint) as call_span:
+        try:
+            return _call_api(base_url, endpoint, payload, method, timeout, server_name_for_log, observation)
+        finally:
+            observation.finish()
+            call_span.set(response_bytes=observation.response_bytes, error_type=observation.error_type)
+
+def _call_api(
+    base_url: str,
+    endpoint: str,
+    payload: dict,
+    method: str,
+    timeout: int,
+    server_name_for_log: str | None,
+    observation: VosCallObservation,
+) -> tuple[dict | None, str | None]:
 
     effective_server_name = server_name_for_log
     server_log_prefix = f"[{effective_server_name}] " if effective_server_name else ""
 
     if not base_url:
+        observation.error_type = "other"
         return None, f"{server_log_prefix}Error: Base URL was not provided to call API."
 
     url = base_url + endpoint
@@ -24,6 +47,8 @@ def call_api(
         "Content-Type": "application/json",
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.0.0 Safari/537.36",
         "Accept": "application/json, text/plain, */*",
+        # Only codings requests can decode (br/zstd need the optional brotli/zstandard packages)
+        "Accept-Encoding": requests.utils.DEFAULT_ACCEPT_ENCODING if VOS_ACCEPT_COMPRESSED else "identity",
     }
 
     if not effective_server_name:
@@ -35,24 +60,31 @@ def call_api(
 
     try:
         if method.upper() == "POST":
-            if endpoint in ["GetGatewayMapping", "GetGatewayRouting", "GetAllCustomers"] and \
-               (payload == {} or payload == {"": ""}):
-                response_obj = requests.post(url, data="{}", headers=headers, timeout=timeout)
-            else:
-                response_obj = requests.post(url, json=payload, headers=headers, timeout=timeout)
+            with tracing.span("download") as download_span:
+                if endpoint in ["GetGatewayMapping", "GetGatewayRouting", "GetAllCustomers"] and \
+                   (payload == {} or payload == {"": ""}):
+                    response_obj = requests.post(url, data="{}", headers=headers, timeout=timeout)
+                else:
+                    response_obj = requests.post(url, json=payload, headers=headers, timeout=timeout)
+                download_span.set(content_encoding=response_obj.headers.get("Content-Encoding", "identity"))
         else:
+            observation.error_type = "other"
             return None, f"{server_log_prefix}Error: HTTP method '{method}' is not supported by this call_api function."
 
+        observation.response_bytes = len(response_obj.content)
         response_obj.raise_for_status() # Raises HTTPError for bad responses (4XX or 5XX)
 
         try:
-            result_data = response_obj.json()
+            with tracing.span("decode"):
+                result_data = json_codec.loads(response_obj.content)
         except json.JSONDecodeError as e_json:
+            observation.error_type = "decode"
             raw_response_text = response_obj.text[:500] # Get a snippet of the raw response
             return None, f"{server_log_prefix}JSON Decode Error for {endpoint}: {e_json}. Raw response (partial): {raw_response_text}"
 
         # Check for VOS-specific error code if present in the response
         if result_data is not None and result_data.get("retCode") != 0:
+            observation.error_type = "ret_code"
             error_exception = result_data.get('exception', 'No specific exception information from API.')
             return None, f"{server_log_prefix}API {endpoint} returned retCode={result_data.get('retCode')}: {error_exception}"
         
@@ -60,6 +92,7 @@ def call_api(
         return result_data, None
 
     except requests.exceptions.HTTPError as e_http:
+        observation.error_type = "http"
         error_content = "No detailed response content from server."
         status_code_str = "N/A"
         if e_http.response is not None:
@@ -72,10 +105,14 @@ def call_api(
                 error_content = e_http.response.text[:500] # Fallback to raw text
         return None, f"{server_log_prefix}HTTP Error {status_code_str} at {endpoint}: {e_http}. Server Response: {error_content}"
     except requests.exceptions.ConnectionError as e_conn:
+        observation.error_type = "connection"
         return None, f"{server_log_prefix}Connection Error at {endpoint}: {e_conn}"
     except requests.exceptions.Timeout as e_timeout:
+        observation.error_type = "timeout"
         return None, f"{server_log_prefix}Timeout during API call to {endpoint}: {e_timeout}"
     except requests.exceptions.RequestException as e_req: # Catch other requests-related errors
+        observation.error_type = "other"
         return None, f"{server_log_prefix}General Request Error at {endpoint}: {e_req}"
     except Exception as e_general: # Catch any other unexpected errors
+        observation.error_type = "other"
         return None, f"{server_log_prefix}An unexpected error occurred while calling {endpoint}: {type(e_general).__name__} - {e_general}"
\ No newline at end of file
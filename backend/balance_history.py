@@ -0,0 +1,358 @@
+# backend/balance_history.py
+# Customer balance / credit limit / consumption history.
+# A background sampler reads every account of every server at a fixed interval (accounts from the
+# customer account index, details through batched GetCustomer) and stores one row per account and
+# sample in SQLite. Amounts are stored as scaled integers and timestamps as epoch seconds; raw rows
+# older than the raw retention are folded into hourly min/max/last rows, which have their own retention.
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+from customer_index import account_indexes
+from customer_management import get_raw_customer_details_batch
+
+
+AMOUNT_SCALE = 1000  # amounts are stored as round(value * AMOUNT_SCALE)
+HOUR = 3600
+
+RESOLUTION_AUTO = "auto"
+RESOLUTION_RAW = "raw"
+RESOLUTION_HOURLY = "hourly"
+RESOLUTIONS = (RESOLUTION_AUTO, RESOLUTION_RAW, RESOLUTION_HOURLY)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    server_name TEXT NOT NULL,
+    account TEXT NOT NULL,
+    UNIQUE (server_name, account)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    account_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    money INTEGER,
+    limit_money INTEGER,            -- NULL = unlimited
+    today_consumption INTEGER,
+    PRIMARY KEY (account_id, ts)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts);
+CREATE TABLE IF NOT EXISTS samples_hourly (
+    account_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,            -- start of the hour
+    money INTEGER,                  -- last value in the hour
+    money_min INTEGER,
+    money_max INTEGER,
+    limit_money INTEGER,
+    today_consumption INTEGER,      -- max in the hour
+    PRIMARY KEY (account_id, ts)
+) WITHOUT ROWID;
+"""
+
+# Raw samples in [?, ?) folded per account and hour: min/max per hour plus the values of the
+# hour's last sample (joined back on its primary key).
+_HOURLY_SELECT = """
+SELECT g.account_id, g.hour, l.money, g.m_min, g.m_max, l.limit_money, g.consumption
+FROM (SELECT account_id, (ts / 3600) * 3600 AS hour, MIN(money) AS m_min, MAX(money) AS m_max,
+             MAX(today_consumption) AS consumption, MAX(ts) AS last_ts
+      FROM samples WHERE ts >= ? AND ts < ? {account_filter}
+      GROUP BY account_id, hour) g
+JOIN samples l ON l.account_id = g.account_id AND l.ts = g.last_ts
+"""
+
+
+def _to_scaled(value) -> Optional[int]:
+    try:
+        return round(float(str(value).strip()) * AMOUNT_SCALE)
+    except (TypeError, ValueError):
+        return None
+
+
+def _limit_to_scaled(value) -> Optional[int]:
+    if str(value).strip().lower() in ("-1", "infinity", "unlimited", "không giới hạn"):
+        return None
+    return _to_scaled(value)
+
+
+def _from_scaled(value: Optional[int]) -> Optional[float]:
+    return None if value is None else value / AMOUNT_SCALE
+
+
+class BalanceHistoryStore:
+    """SQLite-backed store. One connection shared behind a lock (the sampler is the only heavy writer)."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+        self._account_ids: Dict[Tuple[str, str], int] = {}
+
+    def _account_id_locked(self, server_name: str, account: str) -> int:
+        key = (server_name, account)
+        account_id = self._account_ids.get(key)
+        if account_id is None:
+            self._conn.execute("INSERT OR IGNORE INTO accounts (server_name, account) VALUES (?, ?)", key)
+            account_id = self._conn.execute(
+                "SELECT id FROM accounts WHERE server_name = ? AND account = ?", key
+            ).fetchone()[0]
+            self._account_ids[key] = account_id
+        return account_id
+
+    def record(self, server_name: str, customers: List[dict], ts: Optional[int] = None) -> int:
+        """Store one sample per raw customer dict. Returns the number of rows written."""
+        ts = int(ts if ts is not None else time.time())
+        with self._lock:
+            rows = [
+                (
+                    self._account_id_locked(server_name, c["account"]), ts,
+                    _to_scaled(c.get("money")), _limit_to_scaled(c.get("limitMoney")), _to_scaled(c.get("todayConsumption")),
+                )
+                for c in customers if c.get("account")
+            ]
+            self._conn.executemany("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+        return len(rows)
+
+    def compact(self, now: Optional[int] = None) -> None:
+        """Fold raw samples older than the raw retention into hourly rows and apply both retentions."""
+        now = int(now if now is not None else time.time())
+        raw_cutoff = (now - config.BALANCE_RAW_RETENTION_HOURS * HOUR) // HOUR * HOUR
+        hourly_cutoff = now - config.BALANCE_HOURLY_RETENTION_DAYS * 24 * HOUR
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO samples_hourly " + _HOURLY_SELECT.format(account_filter=""), (0, raw_cutoff))
+            self._conn.execute("DELETE FROM samples WHERE ts < ?", (raw_cutoff,))
+            self._conn.execute("DELETE FROM samples_hourly WHERE ts < ?", (hourly_cutoff,))
+            self._conn.commit()
+
+    def _account_id(self, server_name: str, account: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM accounts WHERE server_name = ? AND account = ?", (server_name, account)
+            ).fetchone()
+        return row[0] if row else None
+
+    def trend(
+        self,
+        server_name: str,
+        account: str,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        resolution: str = RESOLUTION_AUTO,
+    ) -> List[dict]:
+        """
+        Points for one account in [since, until). raw: every sample still kept; hourly: one point
+        per hour (recent raw samples are folded on the fly); auto: hourly rows for the compacted
+        past followed by raw samples.
+        """
+        account_id = self._account_id(server_name, account)
+        if account_id is None:
+            return []
+        since = int(since if since is not None else 0)
+        until = int(until if until is not None else time.time() + 1)
+        points: List[dict] = []
+        with self._lock:
+            if resolution in (RESOLUTION_AUTO, RESOLUTION_HOURLY):
+                for ts, money, m_min, m_max, limit_money, consumption in self._conn.execute(
+                    "SELECT ts, money, money_min, money_max, limit_money, today_consumption FROM samples_hourly "
+                    "WHERE account_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                    (account_id, since, until),
+                ):
+                    points.append(_hourly_point(ts, money, m_min, m_max, limit_money, consumption))
+            if resolution == RESOLUTION_HOURLY:
+                for _, ts, money, m_min, m_max, limit_money, consumption in self._conn.execute(
+                    _HOURLY_SELECT.format(account_filter="AND account_id = ?") + " ORDER BY g.hour",
+                    (since, until, account_id),
+                ):
+                    points.append(_hourly_point(ts, money, m_min, m_max, limit_money, consumption))
+            else:
+                for ts, money, limit_money, consumption in self._conn.execute(
+                    "SELECT ts, money, limit_money, today_consumption FROM samples "
+                    "WHERE account_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                    (account_id, since, until),
+                ):
+                    points.append({
+                        "ts": ts, "money": _from_scaled(money), "limit_money": _from_scaled(limit_money),
+                        "today_consumption": _from_scaled(consumption),
+                    })
+        return points
+
+    def near_limit(
+        self,
+        max_ratio: float = 0.1,
+        max_headroom: Optional[float] = None,
+        server_name: Optional[str] = None,
+        rate_window_seconds: int = HOUR,
+        limit: int = 100,
+    ) -> List[dict]:
+        """
+        Accounts whose headroom (money + limitMoney, from the latest sample) is at most
+        max_ratio * limitMoney, or at most max_headroom when given. Unlimited accounts are skipped.
+        Each entry carries the spend rate over rate_window_seconds and the hours left at that rate.
+        Sorted by headroom ratio, tightest first.
+        """
+        with self._lock:
+            latest_ts_row = self._conn.execute("SELECT MAX(ts) FROM samples").fetchone()
+            if not latest_ts_row or latest_ts_row[0] is None:
+                return []
+            rows = self._conn.execute(
+                """
+                SELECT a.server_name, a.account, s.ts, s.money, s.limit_money, s.today_consumption,
+                       (SELECT p.money FROM samples p
+                        WHERE p.account_id = s.account_id AND p.ts >= s.ts - ? ORDER BY p.ts LIMIT 1) AS money_then,
+                       (SELECT MIN(p.ts) FROM samples p
+                        WHERE p.account_id = s.account_id AND p.ts >= s.ts - ?) AS ts_then
+                FROM (SELECT account_id, MAX(ts) AS ts FROM samples GROUP BY account_id) last
+                JOIN samples s ON s.account_id = last.account_id AND s.ts = last.ts
+                JOIN accounts a ON a.id = s.account_id
+                WHERE s.limit_money IS NOT NULL AND s.money IS NOT NULL
+                """ + (" AND a.server_name = ?" if server_name else ""),
+                (rate_window_seconds, rate_window_seconds, *([server_name] if server_name else [])),
+            ).fetchall()
+
+        out: List[dict] = []
+        for s_name, account, ts, money, limit_money, consumption, money_then, ts_then in rows:
+            headroom = money + limit_money
+            ratio = headroom / limit_money if limit_money > 0 else None
+            by_ratio = ratio is not None and ratio <= max_ratio
+            by_amount = max_headroom is not None and headroom <= max_headroom * AMOUNT_SCALE
+            if not (by_ratio or by_amount or (limit_money <= 0 and headroom <= 0)):
+                continue
+            spend_per_hour = None
+            hours_left = None
+            if ts_then is not None and ts > ts_then and money_then is not None:
+                spend_per_hour = (money_then - money) / ((ts - ts_then) / HOUR)
+                if spend_per_hour > 0:
+                    hours_left = round(max(headroom, 0) / spend_per_hour, 2)
+            out.append({
+                "server_name": s_name,
+                "account": account,
+                "sampled_at": ts,
+                "money": _from_scaled(money),
+                "limit_money": _from_scaled(limit_money),
+                "headroom": _from_scaled(headroom),
+                "headroom_ratio": None if ratio is None else round(ratio, 4),
+                "today_consumption": _from_scaled(consumption),
+                "spend_per_hour": None if spend_per_hour is None else round(spend_per_hour / AMOUNT_SCALE, 3),
+                "hours_left": hours_left,
+            })
+        out.sort(key=lambda e: (e["headroom_ratio"] if e["headroom_ratio"] is not None else -1, e["headroom"]))
+        return out[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            accounts = self._conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+            raw = self._conn.execute("SELECT COUNT(*), MIN(ts), MAX(ts) FROM samples").fetchone()
+            hourly = self._conn.execute("SELECT COUNT(*), MIN(ts) FROM samples_hourly").fetchone()
+        return {
+            "accounts": accounts,
+            "raw_samples": raw[0], "raw_from": raw[1], "raw_to": raw[2],
+            "hourly_samples": hourly[0], "hourly_from": hourly[1],
+        }
+
+
+def _hourly_point(ts, money, m_min, m_max, limit_money, consumption) -> dict:
+    return {
+        "ts": ts, "money": _from_scaled(money), "money_min": _from_scaled(m_min), "money_max": _from_scaled(m_max),
+        "limit_money": _from_scaled(limit_money), "today_consumption": _from_scaled(consumption),
+    }
+
+
+def _sample_server(store: BalanceHistoryStore, server_info: dict, ts: int) -> Tuple[int, Optional[str]]:
+    index, err = account_indexes.get(server_info)
+    if index is None:
+        return 0, err
+    customers, err = get_raw_customer_details_batch(server_info["url"], server_info["name"], index.accounts)
+    return store.record(server_info["name"], list(customers.values()), ts), err
+
+
+class SamplerBusy(Exception):
+    """Raised by sample_once() while another sweep (background or manual) is running."""
+
+
+class BalanceSampler:
+    """
+    Background thread: sample every server every config.BALANCE_SAMPLE_INTERVAL_SECONDS, then compact.
+    Every process that starts it runs its own sweeps, so enable it in one process only.
+    """
+
+    def __init__(self):
+        self._store: Optional[BalanceHistoryStore] = None
+        self._store_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweep_lock = threading.Lock()  # one sweep at a time per process
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[dict] = None
+
+    @property
+    def store(self) -> BalanceHistoryStore:
+        with self._store_lock:
+            if self._store is None:
+                self._store = BalanceHistoryStore(config.BALANCE_HISTORY_DB_PATH)
+            return self._store
+
+    @property
+    def busy(self) -> bool:
+        return self._sweep_lock.locked()
+
+    def sample_once(self, server_list: List[dict]) -> dict:
+        if not self._sweep_lock.acquire(blocking=False):
+            raise SamplerBusy("A balance sampling run is already in progress.")
+        try:
+            return self._sample_locked(server_list)
+        finally:
+            self._sweep_lock.release()
+
+    def _sample_locked(self, server_list: List[dict]) -> dict:
+        store, ts = self.store, int(time.time())
+        started = time.time()
+        written, errors = 0, []
+        if server_list:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(server_list)) as executor:
+                future_to_server = {executor.submit(_sample_server, store, s, ts): s for s in server_list}
+                for future in concurrent.futures.as_completed(future_to_server):
+                    server_name = future_to_server[future]["name"]
+                    try:
+                        count, err = future.result()
+                    except Exception as exc:  # noqa: BLE001
+                        count, err = 0, str(exc)
+                    written += count
+                    if err:
+                        errors.append(f"{server_name}: {err}")
+        store.compact(ts)
+        self.last_run = {"ts": ts, "samples_written": written, "errors": sorted(errors), "duration": round(time.time() - started, 3)}
+        return self.last_run
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sample_once(config.VOS_SERVERS)
+            except SamplerBusy:
+                logging.info("Balance sampler: skipping a run, a manual sweep is in progress.")
+            except Exception as exc:  # noqa: BLE001
+                logging.error(f"Balance sampler error: {exc}")
+            self._stop.wait(config.BALANCE_SAMPLE_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="balance-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+balance_sampler = BalanceSampler()
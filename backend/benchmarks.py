@@ -0,0 +1,249 @@
+# backend/benchmarks.py
+# Benchmarks for the backend hot paths on synthetic data of increasing size.
+# Scans and searches run against mock VOS servers (mock_vos_server.py) started in a child
+# process, so their HTTP/JSON cost is measured like in production but the mock's own work is
+# not. Each case reports wall time (min/median over --repeat runs after one warm-up) and the
+# peak traced Python memory of one extra run. Work done inside the parse process pool is not
+# visible to tracemalloc.
+#
+#   python benchmarks.py run --sizes 1,4,16 --output bench-before.json
+#   python benchmarks.py compare bench-before.json bench-after.json --threshold 0.15
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import config
+import json_codec
+from customer_index import account_indexes, search_accounts_across_servers
+from customer_management import find_customers_across_all_servers
+from mock_vos_server import MockServerProcess, MockVosDataset, dataset_options_for_size
+from routing_gateway_management import _scan_server_for_number_info, identify_rgs_for_cleanup_backend
+from utils import (
+    format_rewrite_rules_for_vos,
+    generate_object_hash,
+    generate_search_variants,
+    generate_search_variants_batch,
+    parse_vos_rewrite_rules,
+)
+
+
+MOCK_SERVER_COUNT = 2
+CUSTOMER_QUERY = "0012"  # matches roughly 1% of the generated accounts
+
+
+class BenchContext:
+    """Inputs shared by the cases of one size: the local copy of dataset 0 and the mock servers."""
+
+    def __init__(self, size: int, servers: List[dict]):
+        self.size = size
+        self.servers = servers
+        dataset = MockVosDataset(seed=0, **dataset_options_for_size(size))
+        self.routings = list(dataset.routings.values())
+        self.rule_strings = [rg["rewriteRulesInCaller"] for rg in self.routings]
+        self.parsed_rules = [parse_vos_rewrite_rules(s) for s in self.rule_strings]
+
+        # Input numbers: half stored on server 0 (reals, prefixes, keys), half random
+        rnd = random.Random(size)
+        stored = sorted({r for rules in self.parsed_rules for reals in rules.values() for r in reals if r != "hetso"})
+        stored += sorted({k for rules in self.parsed_rules for k in rules})
+        count = 200 * size
+        self.numbers = rnd.sample(stored, min(count // 2, len(stored)))
+        self.numbers += ["09" + "".join(rnd.choices("0123456789", k=8)) for _ in range(count - len(self.numbers))]
+
+
+def _case_parse_rules(ctx: BenchContext) -> Callable[[], object]:
+    return lambda: [parse_vos_rewrite_rules(s) for s in ctx.rule_strings]
+
+
+def _case_format_rules(ctx: BenchContext) -> Callable[[], object]:
+    return lambda: [format_rewrite_rules_for_vos(rules) for rules in ctx.parsed_rules]
+
+
+def _case_search_variants(ctx: BenchContext) -> Callable[[], object]:
+    return lambda: [generate_search_variants(n) for n in ctx.numbers]
+
+
+def _case_object_hash(ctx: BenchContext) -> Callable[[], object]:
+    return lambda: [generate_object_hash(rg) for rg in ctx.routings]
+
+
+def _case_json_decode(ctx: BenchContext) -> Callable[[], object]:
+    body = json.dumps({"retCode": 0, "infoGatewayRoutings": ctx.routings}).encode("utf-8")
+    return lambda: json_codec.loads(body)
+
+
+def _case_cleanup_scan(ctx: BenchContext) -> Callable[[], object]:
+    server = ctx.servers[0]
+    check = set(ctx.numbers)
+    return lambda: identify_rgs_for_cleanup_backend(server["url"], server["name"], check)
+
+
+def _case_number_info_scan(ctx: BenchContext) -> Callable[[], object]:
+    server = ctx.servers[0]
+    variants = set().union(*generate_search_variants_batch(ctx.numbers))
+    return lambda: _scan_server_for_number_info(server, variants, ctx.numbers)
+
+
+def _case_account_search(ctx: BenchContext) -> Callable[[], object]:
+    account_indexes.refresh_all(ctx.servers)
+    return lambda: search_accounts_across_servers(ctx.servers, CUSTOMER_QUERY)
+
+
+def _case_customer_search(ctx: BenchContext) -> Callable[[], object]:
+    account_indexes.refresh_all(ctx.servers)
+    return lambda: find_customers_across_all_servers(ctx.servers, "account", CUSTOMER_QUERY)
+
+
+# name -> setup(ctx) returning the callable to time
+BENCHMARKS: Dict[str, Callable[[BenchContext], Callable[[], object]]] = {
+    "parse_vos_rewrite_rules": _case_parse_rules,
+    "format_rewrite_rules_for_vos": _case_format_rules,
+    "generate_search_variants": _case_search_variants,
+    "generate_object_hash": _case_object_hash,
+    "json_decode_routing_list": _case_json_decode,
+    "identify_rgs_for_cleanup_backend": _case_cleanup_scan,
+    "scan_server_for_number_info": _case_number_info_scan,
+    "search_accounts_across_servers": _case_account_search,
+    "find_customers_across_all_servers": _case_customer_search,
+}
+
+
+def measure(fn: Callable[[], object], repeat: int) -> dict:
+    fn()  # warm-up (imports, caches, connection pools)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "runs": repeat,
+        "min_s": round(min(times), 6),
+        "median_s": round(statistics.median(times), 6),
+        "mean_s": round(statistics.fmean(times), 6),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(sizes: List[int], repeat: int, only: Optional[List[str]] = None) -> dict:
+    names = [n for n in BENCHMARKS if not only or n in only]
+    results = []
+    for size in sizes:
+        mock = MockServerProcess(MOCK_SERVER_COUNT, **dataset_options_for_size(size))
+        try:
+            config.VOS_SERVERS[:] = mock.servers
+            ctx = BenchContext(size, mock.servers)
+            for name in names:
+                result = {"name": name, "size": size, **measure(BENCHMARKS[name](ctx), repeat)}
+                results.append(result)
+                print(f"{name:<36} size={size:<4} median={result['median_s'] * 1000:10.2f} ms  peak={result['peak_kib']:10.1f} KiB", flush=True)
+        finally:
+            mock.close()
+    return {"meta": _run_metadata(sizes, repeat), "results": results}
+
+
+def _run_metadata(sizes: List[int], repeat: int) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parse_pool": {"enabled": config.PARSE_POOL_ENABLED, "workers": config.PARSE_POOL_WORKERS, "min_chars": config.PARSE_POOL_MIN_CHARS},
+        "sizes": sizes,
+        "repeat": repeat,
+        "dataset": {str(s): dataset_options_for_size(s) for s in sizes},
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.15, min_delta_s: float = 0.001) -> List[dict]:
+    """
+    Per (name, size) in both runs: relative change of median time and peak memory. A case regresses
+    when either grows by more than threshold (time also needs an absolute growth above min_delta_s).
+    """
+    base = {(r["name"], r["size"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in current.get("results", []):
+        old = base.get((r["name"], r["size"]))
+        if old is None:
+            continue
+        time_change = (r["median_s"] - old["median_s"]) / old["median_s"] if old["median_s"] else 0.0
+        mem_change = (r["peak_kib"] - old["peak_kib"]) / old["peak_kib"] if old["peak_kib"] else 0.0
+        regressed = (time_change > threshold and r["median_s"] - old["median_s"] > min_delta_s) or mem_change > threshold
+        rows.append({
+            "name": r["name"],
+            "size": r["size"],
+            "old_median_s": old["median_s"],
+            "new_median_s": r["median_s"],
+            "time_change": round(time_change, 4),
+            "old_peak_kib": old["peak_kib"],
+            "new_peak_kib": r["peak_kib"],
+            "memory_change": round(mem_change, 4),
+            "regressed": regressed,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backend hot-path benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_p = sub.add_parser("run", help="run the benchmarks and save JSON results")
+    run_p.add_argument("--sizes", default="1,4,16", help="comma-separated dataset size steps")
+    run_p.add_argument("--repeat", type=int, default=5)
+    run_p.add_argument("--only", default="", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    run_p.add_argument("--output", default="benchmark-results.json")
+    cmp_p = sub.add_parser("compare", help="compare two result files; exit code 1 on regressions")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current")
+    cmp_p.add_argument("--threshold", type=float, default=0.15, help="allowed relative growth (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        only = [n.strip() for n in args.only.split(",") if n.strip()]
+        unknown = [n for n in only if n not in BENCHMARKS]
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+        report = run_benchmarks([int(s) for s in args.sizes.split(",") if s.strip()], args.repeat, only)
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Results written to {args.output}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    with open(args.current, encoding="utf-8") as fh:
+        current = json.load(fh)
+    rows = compare_results(baseline, current, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regressed"] else "ok"
+        print(
+            f"{row['name']:<36} size={row['size']:<4} time {row['time_change']:+8.1%} "
+            f"({row['old_median_s'] * 1000:.2f} -> {row['new_median_s'] * 1000:.2f} ms)  "
+            f"memory {row['memory_change']:+8.1%}  {flag}"
+        )
+    regressions = sum(row["regressed"] for row in rows)
+    print(f"{len(rows)} cases compared, {regressions} regression(s).")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+# backend/cleanup_plan.py
+# Server-side cleanup plans.
+# A plan turns cleanup scan results into per-gateway diffs (what would be removed) and keeps the
+# prepared ModifyGateway* payloads on the server, so clients only review diffs and send back a
+# plan id. Every item remembers the hash of the gateway it was computed from; on execution the
+# gateway lists are re-downloaded once per server and items whose gateway changed since
+# planning are reported as conflicts instead of being written.
+from __future__ import annotations
+
+import concurrent.futures
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import config
+import snapshot_cache
+from mapping_gateway_management import apply_mg_update_for_cleanup_backend
+from routing_gateway_management import apply_rg_update_for_cleanup_backend, identify_gateways_for_cleanup_parallel
+from number_set import CompactNumberSet
+from rewrite_rules import RewriteRuleDocument
+from utils import generate_object_hash
+
+
+ITEM_PENDING = "pending"
+ITEM_SUCCESS = "success"
+ITEM_FAILED = "failed"
+ITEM_CONFLICT = "conflict"
+RUNNABLE_ITEM_STATES = {ITEM_PENDING, ITEM_FAILED}
+
+PLAN_READY = "ready"
+PLAN_EXECUTING = "executing"
+PLAN_COMPLETED = "completed"
+
+
+class PlanNotExecutable(Exception):
+    """Raised when a plan is already executing or has nothing left to run."""
+
+
+def _remove_from_csv(original: List[str], to_remove: List[str]) -> Tuple[str, List[str]]:
+    """Drop to_remove from an ordered prefix list; returns (new csv, actually removed in original order)."""
+    remove_set = set(to_remove)
+    kept = [p for p in original if p not in remove_set]
+    removed = [p for p in original if p in remove_set]
+    return ",".join(kept), removed
+
+
+def _plan_mg_item(found: dict) -> Tuple[dict, dict, int]:
+    new_csv, removed = _remove_from_csv(found.get("original_calloutCallerPrefixes_list") or [], found.get("common_numbers_in_calloutCaller") or [])
+    payload = dict(found["raw_mg_info"])
+    payload["calloutCallerPrefixes"] = new_csv
+    return payload, {"calloutCallerPrefixes": {"removed": removed}}, len(removed)
+
+
+def _plan_rg_item(found: dict) -> Tuple[dict, dict, int]:
+    caller_csv, removed_caller = _remove_from_csv(found.get("original_callin_caller_prefixes_list") or [], found.get("common_in_callin_caller") or [])
+    callee_csv, removed_callee = _remove_from_csv(found.get("original_callin_callee_prefixes_list") or [], found.get("common_in_callin_callee") or [])
+
+    rules_doc = RewriteRuleDocument(found.get("original_rewrite_str") or "")
+    deleted_keys = [k for k in found.get("common_virtual_keys_to_delete") or [] if rules_doc.delete_key(k)]
+    removed_reals: Dict[str, List[str]] = {}
+    emptied_keys: List[str] = []
+    for key, reals in (found.get("common_real_values_to_delete_map") or {}).items():
+        current = rules_doc.get_reals(key)
+        if current is None:
+            continue
+        remove_set = set(reals)
+        removed = [r for r in current if r in remove_set]
+        if removed:
+            rules_doc.remove_reals(key, removed, drop_empty=True)
+            removed_reals[key] = removed
+            if key not in rules_doc:
+                emptied_keys.append(key)
+
+    payload = dict(found["raw_rg_info"])
+    payload["callinCallerPrefixes"] = caller_csv
+    payload["callinCalleePrefixes"] = callee_csv
+    payload["rewriteRulesInCaller"] = rules_doc.to_string()
+    diff = {
+        "callinCallerPrefixes": {"removed": removed_caller},
+        "callinCalleePrefixes": {"removed": removed_callee},
+        "rewriteRulesInCaller": {
+            "deleted_keys": deleted_keys,
+            "removed_reals": removed_reals,
+            "emptied_keys_dropped": emptied_keys,
+        },
+    }
+    removal_count = len(removed_caller) + len(removed_callee) + len(deleted_keys) + sum(len(v) for v in removed_reals.values())
+    return payload, diff, removal_count
+
+
+class CleanupPlan:
+    """
+    One computed plan. Items are plain dicts; the payload and base hash of each item stay
+    server-side (see to_dict) and are only used by execute_cleanup_plan.
+    """
+
+    def __init__(self, numbers_count: int, items: List[dict], errors: List[str]):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.numbers_count = numbers_count
+        self.items = items
+        self.errors = errors
+        self.status = PLAN_READY
+        self.executed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            items = [{k: v for k, v in item.items() if not k.startswith("_")} for item in self.items]
+            return {
+                "plan_id": self.id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "executed_at": self.executed_at,
+                "numbers_count": self.numbers_count,
+                "gateway_count": len(items),
+                "total_removals": sum(i["removal_count"] for i in items),
+                "errors": self.errors,
+                "items": items,
+            }
+
+
+def build_cleanup_plan(
+    server_list: List[dict],
+    numbers_to_check_set: set | CompactNumberSet,
+    numbers_count: int,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> CleanupPlan:
+    """Run the cleanup scan and turn every identified gateway into a plan item with a minimal diff."""
+    found_items = identify_gateways_for_cleanup_parallel(server_list, numbers_to_check_set, progress_callback)
+    items: List[dict] = []
+    errors: List[str] = []
+    for found in found_items:
+        if "_error" in found:
+            errors.append(found["_error"])
+            continue
+        if found.get("type") == "MG":
+            raw, (payload, diff, removal_count) = found["raw_mg_info"], _plan_mg_item(found)
+        else:
+            raw, (payload, diff, removal_count) = found["raw_rg_info"], _plan_rg_item(found)
+        items.append({
+            "server_name": found["server_name"],
+            "server_url": found["server_url"],
+            "type": found["type"],
+            "name": found["name"],
+            "diff": diff,
+            "removal_count": removal_count,
+            "status": ITEM_PENDING,
+            "message": None,
+            "_base_hash": generate_object_hash(raw),
+            "_payload": payload,
+        })
+    items.sort(key=lambda i: (i["server_name"], i["type"], i["name"]))
+    for item_id, item in enumerate(items):
+        item["item_id"] = item_id
+    return CleanupPlan(numbers_count, items, sorted(errors))
+
+
+def _execute_items_on_server(server_info: dict, items: List[dict], progress_callback: Optional[Callable[..., None]]) -> None:
+    """Re-download the server's gateway lists once, then write every item whose gateway is unchanged."""
+    s_url, s_name = server_info["url"], server_info["name"]
+    current: Dict[str, Dict[str, dict]] = {}
+    fetch_errors: Dict[str, str] = {}
+    for gw_type, endpoint in (("MG", snapshot_cache.MAPPING), ("RG", snapshot_cache.ROUTING)):
+        if any(i["type"] == gw_type for i in items):
+            snapshot, err = snapshot_cache.get_gateway_snapshot(server_info, endpoint, max_age=0)
+            if err:
+                fetch_errors[gw_type] = err
+            else:
+                current[gw_type] = {gw.get("name"): gw for gw in snapshot.gateways}
+
+    for item in items:
+        if item["type"] in fetch_errors:
+            status, message = ITEM_FAILED, f"Could not re-read gateways from {s_name}: {fetch_errors[item['type']]}"
+        else:
+            gateway = current[item["type"]].get(item["name"])
+            if gateway is None:
+                status, message = ITEM_CONFLICT, "Gateway no longer exists."
+            elif generate_object_hash(gateway) != item["_base_hash"]:
+                status, message = ITEM_CONFLICT, "CONFLICT_ERROR: Gateway was modified after the plan was computed. Re-plan and try again."
+            else:
+                apply = apply_mg_update_for_cleanup_backend if item["type"] == "MG" else apply_rg_update_for_cleanup_backend
+                try:
+                    ok, message = apply(s_url, s_name, item["name"], item["_payload"])
+                except Exception as exc:  # noqa: BLE001
+                    ok, message = False, f"An unexpected error occurred: {exc}"
+                status = ITEM_SUCCESS if ok else ITEM_FAILED
+        item["status"], item["message"] = status, message
+        if progress_callback:
+            progress_callback(gateways_processed=1)
+
+
+def execute_cleanup_plan(
+    plan: CleanupPlan,
+    item_ids: Optional[List[int]] = None,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> dict:
+    """
+    Execute the runnable (pending or previously failed) items of a plan, optionally only item_ids.
+    Servers run in parallel, items of one server in order. Returns the execution log and item states.
+    """
+    with plan._lock:
+        if plan.status == PLAN_EXECUTING:
+            raise PlanNotExecutable(f"Plan {plan.id} is already executing.")
+        wanted = set(item_ids) if item_ids is not None else None
+        to_run = [i for i in plan.items if i["status"] in RUNNABLE_ITEM_STATES and (wanted is None or i["item_id"] in wanted)]
+        if not to_run:
+            raise PlanNotExecutable(f"Plan {plan.id} has no pending items to execute.")
+        plan.status = PLAN_EXECUTING
+
+    try:
+        by_server: Dict[Tuple[str, str], List[dict]] = {}
+        for item in to_run:
+            by_server.setdefault((item["server_url"], item["server_name"]), []).append(item)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(by_server)) as executor:
+            futures = {
+                executor.submit(_execute_items_on_server, {"url": url, "name": name}, items, progress_callback): items
+                for (url, name), items in by_server.items()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except Exception as exc:  # noqa: BLE001
+                    for item in futures[future]:
+                        if item["status"] == ITEM_PENDING:
+                            item["status"], item["message"] = ITEM_FAILED, f"An unexpected error occurred: {exc}"
+    finally:
+        with plan._lock:
+            plan.executed_at = time.time()
+            plan.status = PLAN_READY if any(i["status"] in RUNNABLE_ITEM_STATES for i in plan.items) else PLAN_COMPLETED
+
+    log = [f"[{item['status'].upper()}] {item['server_name']} - {item['name']}: {item['message']}" for item in to_run]
+    return {
+        "plan_id": plan.id,
+        "status": plan.status,
+        "execution_log": log,
+        "results": [
+            {"item_id": i["item_id"], "server_name": i["server_name"], "name": i["name"], "status": i["status"], "message": i["message"]}
+            for i in to_run
+        ],
+    }
+
+
+class CleanupPlanStore:
+    """Keeps plans for ttl_seconds, evicting the oldest beyond max_plans."""
+
+    def __init__(self, ttl_seconds: int = 1800, max_plans: int = 50):
+        self._plans: Dict[str, CleanupPlan] = {}
+        self._lock = threading.Lock()
+        self.ttl_seconds = ttl_seconds
+        self.max_plans = max_plans
+
+    def add(self, plan: CleanupPlan) -> CleanupPlan:
+        with self._lock:
+            self._plans[plan.id] = plan
+            self._evict_locked()
+        return plan
+
+    def get(self, plan_id: str) -> Optional[CleanupPlan]:
+        with self._lock:
+            self._evict_locked()
+            return self._plans.get(plan_id)
+
+    def _evict_locked(self) -> None:
+        now = time.time()
+        for plan in list(self._plans.values()):
+            if now - plan.created_at > self.ttl_seconds and plan.status != PLAN_EXECUTING:
+                del self._plans[plan.id]
+        if len(self._plans) > self.max_plans:
+            oldest = sorted((p for p in self._plans.values() if p.status != PLAN_EXECUTING), key=lambda p: p.created_at)
+            for plan in oldest[:len(self._plans) - self.max_plans]:
+                del self._plans[plan.id]
+
+
+plan_store = CleanupPlanStore(config.CLEANUP_PLAN_TTL_SECONDS, config.CLEANUP_PLAN_MAX_RETAINED)
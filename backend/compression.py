@@ -0,0 +1,183 @@
+# backend/compression.py
+# Negotiated response compression for the API (installed as ASGI middleware in main.py).
+# Bodies of at least config.COMPRESSION_MIN_SIZE bytes are sent brotli-encoded when the client
+# accepts "br" and the optional brotli package is installed, otherwise gzip-encoded when it
+# accepts "gzip". Smaller bodies, partial (206) and already-encoded responses, and the media
+# types in INCOMPRESSIBLE_TYPES are sent unchanged, whatever the coding.
+# Written against the plain ASGI message interface; streaming bodies (e.g. number exports) are
+# compressed chunk by chunk, and large chunks are compressed in a worker thread.
+from __future__ import annotations
+
+import zlib
+from typing import Callable, Dict, Optional
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+THREAD_MINIMUM_SIZE = 128 * 1024  # chunks this large are compressed in a worker thread
+# Already compressed or not worth compressing (prefix match on the media type)
+INCOMPRESSIBLE_TYPES = (
+    "image/", "audio/", "video/", "font/woff", "application/zip", "application/gzip",
+    "application/x-gzip", "application/octet-stream", "application/grpc", "text/event-stream",
+)
+
+
+def supported_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Accept-Encoding parsed to {coding: q}; codings with q=0 are kept so they can be refused."""
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip()] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported coding for an Accept-Encoding header (brotli preferred on ties), or None."""
+    accepted = _accepted_encodings(accept_encoding)
+    best, best_q = None, 0.0
+    for coding in supported_encodings():
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, more_body: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, more_body: bool) -> bytes:
+        return self._compressor.process(data) + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class _CompressingSend:
+    """Wraps the ASGI send of one response: holds back the start message until the first body decides."""
+
+    def __init__(self, send: Send, encoding: str, make_compressor: Callable[[], object], minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.make_compressor = make_compressor
+        self.compressor = None  # created for the first compressed body only
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.compressing = False
+
+    async def _compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self.compressor.compress, body, more_body)
+        return self.compressor.compress(body, more_body)
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] == 206
+                or media_type.startswith(INCOMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start_message = message
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if message["type"] != "http.response.body":
+            # e.g. http.response.pathsend / trailers: never compressed
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            self.passthrough = True
+            await self.send(message)
+            return
+
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.start_message is None:
+            # Continuation of a response we are already compressing
+            if self.compressing:
+                message["body"] = await self._compress(body, more_body)
+            await self.send(message)
+            return
+
+        start, self.start_message = self.start_message, None
+        if not more_body and len(body) < self.minimum_size:
+            await self.send(start)
+            await self.send(message)
+            return
+
+        self.compressing = True
+        self.compressor = self.make_compressor()
+        headers = MutableHeaders(raw=start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        message["body"] = await self._compress(body, more_body)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(message["body"]))
+        await self.send(start)
+        await self.send(message)
+
+
+class CompressionMiddleware:
+    """Compresses API responses with the best coding the client accepts (see negotiate_encoding)."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 5,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not config.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        if encoding == "br":
+            make_compressor = lambda: _BrotliCompressor(self.brotli_quality)  # noqa: E731
+        else:
+            make_compressor = lambda: _GzipCompressor(self.gzip_level)  # noqa: E731
+        await self.app(scope, receive, _CompressingSend(send, encoding, make_compressor, self.minimum_size))
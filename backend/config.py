@@ -1,11 +1,81 @@
+import json
 import os
 import platform
 
 VOS_SERVERS = [
 
 ]
+# Optional override, e.g. VOS_SERVERS_JSON='[{"name": "MOCK1", "url": "http://127.0.0.1:9100/external/server/"}]'
+# (see mock_vos_server.py)
+if os.environ.get("VOS_SERVERS_JSON"):
+    VOS_SERVERS = json.loads(os.environ["VOS_SERVERS_JSON"])
 DEFAULT_TIMEOUT = 45
 DEFAULT_ENCODING = "utf-8"
+JSON_CODEC = "auto"  # "auto" (orjson when installed), "orjson" or "stdlib"; see json_codec.py
+
+# --- Bulk Operation Limits ---
+GET_CUSTOMER_BATCH_SIZE = 100  # Accounts per multi-account GetCustomer request
+BULK_MUTATION_WORKERS_PER_SERVER = 4  # Concurrent ModifyCustomer calls per server
+
+# --- Snapshots & Registries ---
+SNAPSHOT_TTL_SECONDS = 60  # Max age of a cached per-server gateway list
+VN_REGISTRY_TTL_SECONDS = 300  # Max age of the fleet-wide virtual number registry
+VN_REGISTRY_MIN_REFRESH_SECONDS = 10  # Forced refreshes of a registry younger than this are ignored
+VN_RESERVATION_TTL_SECONDS = 600  # How long an allocated free key stays reserved
+PARSED_RULES_CACHE_SIZE = 2048  # Distinct rewriteRulesInCaller strings kept parsed in memory
+VN_STATUS_RANGE_LIMIT = 5000  # Max definitions returned per range in batch VN status
+
+# --- Customer Account Index ---
+CUSTOMER_INDEX_REFRESH_SECONDS = 120  # Background re-download interval of each server's account list
+CUSTOMER_INDEX_MAX_AGE_SECONDS = 900  # Older indexes are rebuilt inline by the next search
+CUSTOMER_SEARCH_DEFAULT_LIMIT = 50
+CUSTOMER_DETAIL_CACHE_TTL_SECONDS = 15  # Page details reused for this long (writes invalidate earlier)
+CUSTOMER_DETAIL_CACHE_MAX_ENTRIES = 5000
+
+# --- Balance History ---
+# Off by default: each API worker process that enables it runs its own fleet-wide GetCustomer sweeps
+# into the same database, so enable it for a single process (e.g. one dedicated worker) only.
+BALANCE_HISTORY_ENABLED = os.environ.get("VOS_BALANCE_HISTORY_ENABLED", "") == "1"
+BALANCE_HISTORY_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "balance_history.sqlite3")
+BALANCE_SAMPLE_INTERVAL_SECONDS = 300
+BALANCE_RAW_RETENTION_HOURS = 48  # Older samples are folded into hourly rows
+BALANCE_HOURLY_RETENTION_DAYS = 90
+
+# --- Background Jobs ---
+JOB_MAX_WORKERS = 4  # Jobs running at the same time
+JOB_RETENTION_SECONDS = 3600  # How long finished jobs (and their results) are kept
+JOB_MAX_RETAINED = 200  # Oldest finished jobs are evicted beyond this count
+CLEANUP_PLAN_TTL_SECONDS = 1800  # How long a computed cleanup plan can still be executed
+CLEANUP_PLAN_MAX_RETAINED = 50  # Oldest plans are evicted beyond this count
+
+# --- Metrics (/metrics) ---
+METRICS_ENABLED = True
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # seconds
+METRICS_SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)  # bytes
+
+# --- Tracing (opt-in per request, see tracing.py) ---
+TRACING_ENABLED = True  # Honour the opt-in request header
+TRACE_HEADER = "X-Trace"  # Any non-empty value traces the request; the response carries X-Trace-Id
+TRACE_MAX_SPANS = 5000  # Per trace; further spans are dropped and counted
+TRACE_MAX_RETAINED = 100  # Finished traces kept for /debug/traces
+
+# --- Request Profiling (opt-in, see profiling.py) ---
+PROFILING_TOKEN = os.environ.get("VOS_PROFILING_TOKEN", "")  # Empty disables profiling entirely
+PROFILING_SAMPLE_INTERVAL_MS = 5
+PROFILING_TRACEMALLOC_FRAMES = 10  # Stack depth recorded per allocation in memory mode
+PROFILING_MAX_RETAINED = 20  # Reports kept for download
+
+# --- Compression (see compression.py) ---
+COMPRESSION_ENABLED = True  # gzip/brotli-encode API responses when the client accepts it
+COMPRESSION_MIN_SIZE = 1024  # Bytes; smaller responses are sent as-is
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5  # Used only when the optional brotli package is installed
+VOS_ACCEPT_COMPRESSED = True  # Ask VOS servers for gzip/deflate (br/zstd when requests can decode them)
+
+# --- Process Pool (CPU-bound parse/match stage) ---
+PARSE_POOL_ENABLED = True
+PARSE_POOL_WORKERS = os.cpu_count() or 1  # 1 disables the pool
+PARSE_POOL_MIN_CHARS = 2_000_000  # Gateway text per server above which parsing moves to the pool
 
 # --- Server Utility Functions ---
 
@@ -0,0 +1,213 @@
+# backend/customer_index.py
+# Per-server customer account index kept warm in the background.
+# GetAllCustomers is slow on large servers, so account lists are downloaded by a background
+# refresher instead of on every search. Each index keeps a trigram -> account-ids posting list
+# for substring queries and a case-insensitively sorted key list for prefix queries.
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import config
+from api_client import call_api  # Must return (data, error_message)
+
+
+MODE_SUBSTRING = "substring"
+MODE_PREFIX = "prefix"
+MODE_ALL_TERMS = "all_terms"
+SEARCH_MODES = (MODE_SUBSTRING, MODE_PREFIX, MODE_ALL_TERMS)
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class AccountIndex:
+    """Immutable index over one server's account ids."""
+
+    def __init__(self, server_name: str, accounts: List[str]):
+        self.server_name = server_name
+        self.accounts = [a for a in accounts if isinstance(a, str) and a]
+        self.built_at = time.time()
+        self._lower = [a.lower() for a in self.accounts]
+        self._sorted_ids = sorted(range(len(self._lower)), key=self._lower.__getitem__)
+        self._sorted_keys = [self._lower[i] for i in self._sorted_ids]
+        self._postings: Dict[str, array] = {}
+        for i, acc in enumerate(self._lower):
+            for gram in _trigrams(acc):
+                posting = self._postings.get(gram)
+                if posting is None:
+                    posting = self._postings[gram] = array("I")
+                posting.append(i)  # ids are appended in ascending order
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def _substring_ids(self, term: str) -> List[int]:
+        """Ids (ascending) of accounts containing term, using postings for terms of 3+ characters."""
+        lower = self._lower
+        if len(term) < 3:
+            return [i for i, acc in enumerate(lower) if term in acc]
+        postings = []
+        for gram in _trigrams(term):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = postings[0]
+        if len(postings) > 1:
+            other = set(postings[1])
+            candidates = [i for i in candidates if i in other]
+        return [i for i in candidates if term in lower[i]]
+
+    def _prefix_ids(self, prefix: str) -> List[int]:
+        start = bisect_left(self._sorted_keys, prefix)
+        end = bisect_left(self._sorted_keys, prefix + "\U0010ffff", start)
+        return self._sorted_ids[start:end]
+
+    def search(self, query: str, mode: str = MODE_SUBSTRING, limit: Optional[int] = None) -> List[str]:
+        """
+        Case-insensitive account search.
+        - substring: accounts containing query (server order), same as `query.lower() in acc.lower()`
+        - prefix:    accounts starting with query (sorted case-insensitively)
+        - all_terms: accounts containing every whitespace-separated term of query (server order)
+        An empty query matches every account, as the plain substring test does.
+        """
+        query = (query or "").lower()
+        if mode == MODE_PREFIX:
+            ids = self._prefix_ids(query.strip())
+        elif mode == MODE_ALL_TERMS:
+            terms = sorted(set(query.split()), key=len, reverse=True) or [""]
+            ids = self._substring_ids(terms[0])
+            for term in terms[1:]:
+                ids = [i for i in ids if term in self._lower[i]]
+        else:
+            ids = self._substring_ids(query)
+        if limit is not None:
+            ids = ids[:limit]
+        return [self.accounts[i] for i in ids]
+
+
+class CustomerAccountIndexes:
+    """
+    Index per server, refreshed every config.CUSTOMER_INDEX_REFRESH_SECONDS by a background thread.
+    A search that finds no index (or one older than config.CUSTOMER_INDEX_MAX_AGE_SECONDS) builds it inline.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[str, AccountIndex] = {}
+        self._errors: Dict[str, str] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _lock_for(self, server_url: str) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(server_url, threading.Lock())
+
+    def _refresh_locked(self, server_info: dict) -> Tuple[Optional[AccountIndex], Optional[str]]:
+        server_url, server_name = server_info["url"], server_info["name"]
+        data, err = call_api(server_url, "GetAllCustomers", {}, timeout=45, server_name_for_log=server_name)
+        if err or not data:
+            err = err or "No data returned from API for GetAllCustomers."
+            self._errors[server_url] = err
+            return self._indexes.get(server_url), err
+        index = AccountIndex(server_name, data.get("accounts", []) or [])
+        self._indexes[server_url] = index
+        self._errors.pop(server_url, None)
+        return index, None
+
+    def refresh(self, server_info: dict) -> Tuple[Optional[AccountIndex], Optional[str]]:
+        """Download the account list and swap in a new index; on error the previous index is kept."""
+        with self._lock_for(server_info["url"]):
+            return self._refresh_locked(server_info)
+
+    def get(self, server_info: dict) -> Tuple[Optional[AccountIndex], Optional[str]]:
+        index = self._indexes.get(server_info["url"])
+        if index is not None and index.age <= config.CUSTOMER_INDEX_MAX_AGE_SECONDS:
+            return index, None
+        with self._lock_for(server_info["url"]):
+            index = self._indexes.get(server_info["url"])  # another caller may have just built it
+            if index is not None and index.age <= config.CUSTOMER_INDEX_MAX_AGE_SECONDS:
+                return index, None
+            return self._refresh_locked(server_info)
+
+    def refresh_all(self, server_list: List[dict]) -> None:
+        if not server_list:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(server_list)) as executor:
+            for server_info, (_, err) in zip(server_list, executor.map(self.refresh, server_list)):
+                if err:
+                    logging.warning(f"Customer index refresh failed for {server_info['name']}: {err}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh_all(config.VOS_SERVERS)
+            except Exception as exc:  # noqa: BLE001
+                logging.error(f"Customer index refresh loop error: {exc}")
+            self._stop.wait(config.CUSTOMER_INDEX_REFRESH_SECONDS)
+
+    def start_background_refresh(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="customer-index", daemon=True)
+            self._thread.start()
+
+    def stop_background_refresh(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> List[dict]:
+        out = []
+        for server_info in config.VOS_SERVERS:
+            index = self._indexes.get(server_info["url"])
+            out.append({
+                "server_name": server_info["name"],
+                "accounts": len(index) if index else 0,
+                "age": round(index.age, 3) if index else None,
+                "error": self._errors.get(server_info["url"]),
+            })
+        return out
+
+
+account_indexes = CustomerAccountIndexes()
+
+
+def search_accounts_across_servers(
+    server_list: List[dict],
+    query: str,
+    mode: str = MODE_SUBSTRING,
+    limit: Optional[int] = None,
+) -> Tuple[List[dict], List[str]]:
+    """Search every server's index in parallel. Returns ([{"server_name", "account"}], errors), limited overall."""
+    results: List[dict] = []
+    errors: List[str] = []
+    if not server_list:
+        return results, errors
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(server_list)) as executor:
+        future_to_server = {executor.submit(account_indexes.get, s): s for s in server_list}
+        for future in concurrent.futures.as_completed(future_to_server):
+            server_name = future_to_server[future]["name"]
+            try:
+                index, err = future.result()
+            except Exception as exc:  # noqa: BLE001
+                index, err = None, str(exc)
+            if err:
+                errors.append(f"{server_name}: {err}")
+            if index is not None:
+                results.extend({"server_name": server_name, "account": acc} for acc in index.search(query, mode, limit))
+    results.sort(key=lambda r: (r["account"].lower(), r["server_name"]))
+    return (results[:limit] if limit is not None else results), sorted(errors)
@@ -4,12 +4,18 @@
 # This module keeps network/API logic pure and UI-agnostic.
 from __future__ import annotations
 
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 import concurrent.futures
+import math
+import queue
+import threading
+import time
 
 import config
 from api_client import call_api  # Expects to return tuple: (data, error_msg)
+from customer_index import MODE_SUBSTRING, account_indexes, search_accounts_across_servers
 from utils import format_amount_vietnamese_style, generate_object_hash
 
 
@@ -57,6 +63,30 @@ def get_raw_customer_details(base_url: str, server_name: str, customer_account:
     return info_customers_list[0], None
 
 
+def get_raw_customer_details_batch(base_url: str, server_name: str, customer_accounts: List[str]) -> Tuple[Dict[str, dict], Optional[str]]:
+    """
+    Fetch raw customer dicts for many accounts with multi-account GetCustomer calls,
+    chunked by config.GET_CUSTOMER_BATCH_SIZE. Returns ({account: raw}, error).
+    Accounts missing from the response are simply absent from the map.
+    """
+    found: Dict[str, dict] = {}
+    errs: List[str] = []
+    unique_accounts = list(dict.fromkeys(a for a in customer_accounts if a))
+    step = max(1, config.GET_CUSTOMER_BATCH_SIZE)
+
+    for start in range(0, len(unique_accounts), step):
+        chunk = unique_accounts[start:start + step]
+        api_data, error_msg_api = call_api(base_url, "GetCustomer", {"accounts": chunk}, server_name_for_log=server_name)
+        if error_msg_api:
+            errs.append(f"Failed to get details for {len(chunk)} accounts on {server_name}: {error_msg_api}")
+            continue
+        for raw in (api_data or {}).get("infoCustomers", []) or []:
+            if raw.get("account"):
+                found[raw["account"]] = raw
+
+    return found, "; ".join(errs) if errs else None
+
+
 def get_customer_details_canonical(base_url: str, server_name: str, customer_account: str) -> Tuple[Optional[dict], Optional[Json], Optional[str]]:
     """
     Fetch raw data and a canonical, UI-agnostic view with typed fields.
@@ -149,7 +179,9 @@ def get_current_customer_limit_money(base_url: str, customer_account: str, serve
 
 
 def _update_customer_api_call(base_url: str, payload_to_modify: dict, server_name: str) -> Tuple[Optional[dict], Optional[str]]:
-    return call_api(base_url, "ModifyCustomer", payload_to_modify, server_name_for_log=server_name)
+    result = call_api(base_url, "ModifyCustomer", payload_to_modify, server_name_for_log=server_name)
+    invalidate_customer_details(base_url, payload_to_modify.get("account"))
+    return result
 
 
 def update_customer_credit_limit(server_url: str, server_list: list, customer_account: str, new_credit_limit_str: str, initial_hash: Optional[str]) -> Tuple[bool, Optional[str]]:
@@ -197,6 +229,137 @@ def update_customer_lock_status(server_url: str, server_list: list, customer_acc
     return True, f"Successfully {action} account."
 
 
+def _bulk_update_outcome(update: dict, success: bool, message: str) -> dict:
+    return {
+        "index": update.get("_index"),
+        "server_name": update.get("server_name"),
+        "account": update.get("account"),
+        "success": success,
+        "message": message,
+    }
+
+
+def _valid_credit_limit(value) -> bool:
+    """A credit limit is a non-negative finite number, or -1 for unlimited (numbers or numeric strings)."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return False
+    try:
+        limit = float(value)
+    except ValueError:
+        return False
+    return math.isfinite(limit) and (limit >= 0 or limit == -1)
+
+
+def _build_bulk_modify_payload(update: dict) -> Tuple[Optional[dict], Optional[str]]:
+    payload = {"account": update["account"]}
+    if update.get("new_limit") is not None:
+        if not _valid_credit_limit(update["new_limit"]):
+            return None, f"Invalid credit limit '{update['new_limit']}', expected a non-negative number or -1 (unlimited)."
+        payload["limitMoney"] = str(update["new_limit"]).strip()
+    if update.get("new_lock_status") is not None:
+        if str(update["new_lock_status"]) not in ("0", "1"):
+            return None, f"Invalid lock status '{update['new_lock_status']}', expected '0' or '1'."
+        payload["lockType"] = str(update["new_lock_status"])
+    if len(payload) == 1:
+        return None, "Nothing to update: provide 'new_limit' and/or 'new_lock_status'."
+    return payload, None
+
+
+def _bulk_update_customers_on_server(server_info: dict, updates: List[dict], emit) -> None:
+    """
+    Apply updates for one server. Conflict-check reads are batched through multi-account
+    GetCustomer; ModifyCustomer calls run with at most BULK_MUTATION_WORKERS_PER_SERVER in flight.
+    Each outcome is passed to emit(update, outcome) as soon as it is known.
+    """
+    server_url, server_name = server_info["url"], server_info["name"]
+
+    to_check = [u["account"] for u in updates if u.get("initial_hash")]
+    latest_by_account: Dict[str, dict] = {}
+    fetch_err: Optional[str] = None
+    if to_check:
+        latest_by_account, fetch_err = get_raw_customer_details_batch(server_url, server_name, to_check)
+
+    ready: List[Tuple[dict, dict]] = []
+    for u in updates:
+        payload, err = _build_bulk_modify_payload(u)
+        if err:
+            emit(u, _bulk_update_outcome(u, False, err))
+            continue
+        if u.get("initial_hash"):
+            latest = latest_by_account.get(u["account"])
+            if latest is None:
+                emit(u, _bulk_update_outcome(u, False, f"Could not re-fetch data for conflict check: {fetch_err or 'account not found'}"))
+                continue
+            if generate_object_hash(latest) != u["initial_hash"]:
+                emit(u, _bulk_update_outcome(u, False, "CONFLICT_ERROR: This customer's data has been modified by someone else. Please reload."))
+                continue
+        ready.append((u, payload))
+
+    def _apply(u: dict, payload: dict) -> dict:
+        _, error_msg_api = _update_customer_api_call(server_url, payload, server_name)
+        if error_msg_api:
+            return _bulk_update_outcome(u, False, f"Failed to update customer: {error_msg_api}")
+        return _bulk_update_outcome(u, True, "Successfully updated customer.")
+
+    if not ready:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, config.BULK_MUTATION_WORKERS_PER_SERVER)) as executor:
+        futures = {executor.submit(_apply, u, payload): u for u, payload in ready}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                emit(futures[future], future.result())
+            except Exception as exc:  # noqa: BLE001
+                emit(futures[future], _bulk_update_outcome(futures[future], False, f"Unexpected error: {exc}"))
+
+
+def _run_bulk_update_on_server(server_info: dict, updates: List[dict], out_queue: "queue.Queue[dict]") -> None:
+    """Worker wrapper: guarantees exactly one outcome per update reaches out_queue, even on failure."""
+    pending = {id(u): u for u in updates}
+
+    def emit(update: dict, outcome: dict) -> None:
+        pending.pop(id(update), None)
+        out_queue.put(outcome)
+
+    try:
+        _bulk_update_customers_on_server(server_info, updates, emit)
+    except Exception as exc:  # noqa: BLE001
+        for u in list(pending.values()):
+            emit(u, _bulk_update_outcome(u, False, f"Error during bulk update on {server_info['name']}: {exc}"))
+
+
+def bulk_update_customers(server_list: List[dict], updates: List[dict]) -> Iterator[dict]:
+    """
+    Bulk credit-limit / lock-status mutation across servers.
+    Each update is {"server_name", "account", "new_limit"?, "new_lock_status"?, "initial_hash"?}.
+    Servers are processed in parallel; yields one outcome dict per update as it completes, with
+    the update's position in `updates` as "index".
+    """
+    servers_by_name = {s["name"]: s for s in server_list or []}
+    updates_by_server: Dict[str, List[dict]] = {}
+
+    for i, u in enumerate(updates or []):
+        u = {**u, "_index": i} if isinstance(u, dict) else {"_index": i}
+        if not all(isinstance(u.get(f), str) and u.get(f) for f in ("server_name", "account")):
+            yield _bulk_update_outcome(u, False, "Invalid update: 'server_name' and 'account' must be non-empty strings.")
+        elif u.get("initial_hash") is not None and not isinstance(u["initial_hash"], str):
+            yield _bulk_update_outcome(u, False, "'initial_hash' must be a string.")
+        elif u["server_name"] not in servers_by_name:
+            yield _bulk_update_outcome(u, False, f"Server '{u['server_name']}' not found in config.")
+        else:
+            updates_by_server.setdefault(u["server_name"], []).append(u)
+
+    if not updates_by_server:
+        return
+
+    out_queue: "queue.Queue[dict]" = queue.Queue()
+    expected = sum(len(v) for v in updates_by_server.values())
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(updates_by_server)) as executor:
+        for name, server_updates in updates_by_server.items():
+            executor.submit(_run_bulk_update_on_server, servers_by_name[name], server_updates, out_queue)
+        for _ in range(expected):
+            yield out_queue.get()
+
+
 def fetch_all_customer_details_on_server(base_url: str, server_name: str, customer_accounts_list: List[str]) -> Tuple[Optional[List[dict]], Optional[str]]:
     """
     Batch fetch details for multiple accounts on a single server.
@@ -233,43 +396,50 @@ def fetch_all_customer_details_on_server(base_url: str, server_name: str, custom
     return out, final_err
 
 
+def _customer_summary(cust: dict, server_name: str, server_url: str) -> dict:
+    """Lightweight search-result entry for one raw customer dict."""
+    return {
+        "AccountID": cust.get("account"),
+        "BalanceRaw": cust.get("money", 0.0),
+        "CreditLimitRaw": cust.get("limitMoney", 0.0),
+        "LockType": cust.get("lockType", "0"),
+        "Status": "Locked" if str(cust.get("lockType", "0")) == "1" else "Active",
+        "ServerName": server_name,
+        "_server_url": server_url
+    }
+
+
 def _fetch_customers_for_single_server(server_info: dict, filter_type: str, filter_text: str) -> List[dict]:
     """
     Internal: fetch and filter customers on a single server.
+    Matching accounts come from the background-refreshed account index (see customer_index).
     """
     server_url = server_info["url"]
     server_name = server_info["name"]
 
-    all_accounts_data, err = call_api(server_url, "GetAllCustomers", {}, timeout=45, server_name_for_log=server_name)
-    if err or not all_accounts_data or not all_accounts_data.get("accounts"):
+    account_index, _ = account_indexes.get(server_info)
+    if account_index is None:
         return []
 
-    accounts_on_server = all_accounts_data.get("accounts", [])
-    accounts_to_fetch = [acc for acc in accounts_on_server if filter_text.lower() in acc.lower()]
+    accounts_to_fetch = account_index.search(filter_text, MODE_SUBSTRING)
 
     if not accounts_to_fetch:
         return []
 
     detailed_customers, _ = fetch_all_customer_details_on_server(server_url, server_name, accounts_to_fetch)
 
-    found: List[dict] = []
-    if detailed_customers:
-        for cust in detailed_customers:
-            found.append({
-                "AccountID": cust.get("account"),
-                "BalanceRaw": cust.get("money", 0.0),
-                "CreditLimitRaw": cust.get("limitMoney", 0.0),
-                "LockType": cust.get("lockType", "0"),
-                "Status": "Locked" if str(cust.get("lockType", "0")) == "1" else "Active",
-                "ServerName": server_name,
-                "_server_url": server_url
-            })
-    return found
+    return [_customer_summary(cust, server_name, server_url) for cust in detailed_customers or []]
 
 
-def find_customers_across_all_servers(server_list: List[dict], filter_type: str, filter_text: str) -> List[dict]:
+def find_customers_across_all_servers(
+    server_list: List[dict],
+    filter_type: str,
+    filter_text: str,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> List[dict]:
     """
     Parallel search across servers. Returns a sorted list of lightweight entries.
+    progress_callback, if given, receives servers_done=1 per finished server.
     """
     if not server_list or not filter_text:
         return []
@@ -289,5 +459,129 @@ def find_customers_across_all_servers(server_list: List[dict], filter_type: str,
                 # Avoid print/log side effects in backend helper; propagate via None entries if needed
                 server_name = future_to_server[future]['name']
                 all_found.append({"_error": f"Error fetching from {server_name}: {exc}", "ServerName": server_name})
+            if progress_callback:
+                progress_callback(servers_done=1)
 
     return sorted(all_found, key=lambda x: (x.get("ServerName", ""), x.get("AccountID", "")))
+
+
+# ------------------------------
+# Two-phase search: account ids first, details per visible page
+# ------------------------------
+_detail_cache: "OrderedDict[Tuple[str, str], Tuple[float, dict]]" = OrderedDict()  # (url, account) -> (fetched_at, raw)
+_detail_cache_lock = threading.Lock()
+# Bumped by invalidate_customer_details(); (url, None) counts server-wide invalidations.
+# Guards in-flight fetches, which must not cache details read before a write.
+_detail_generations: Dict[Tuple[str, Optional[str]], int] = {}
+
+
+def _detail_generation_locked(server_url: str, account: str) -> Tuple[int, int]:
+    return _detail_generations.get((server_url, account), 0), _detail_generations.get((server_url, None), 0)
+
+
+def invalidate_customer_details(server_url: str, account: Optional[str] = None) -> None:
+    """Drop cached details for one account, or for every account of a server."""
+    with _detail_cache_lock:
+        _detail_generations[(server_url, account)] = _detail_generations.get((server_url, account), 0) + 1
+        if account is not None:
+            _detail_cache.pop((server_url, account), None)
+        else:
+            for key in [k for k in _detail_cache if k[0] == server_url]:
+                del _detail_cache[key]
+
+
+def get_customer_details_cached(base_url: str, server_name: str, accounts: List[str]) -> Tuple[Dict[str, dict], Optional[str]]:
+    """
+    get_raw_customer_details_batch behind a cache of config.CUSTOMER_DETAIL_CACHE_TTL_SECONDS,
+    so re-rendering the same page does not hit GetCustomer again. Returns ({account: raw}, error).
+    """
+    now = time.time()
+    found: Dict[str, dict] = {}
+    missing: List[str] = []
+    generations: Dict[str, Tuple[int, int]] = {}
+    with _detail_cache_lock:
+        for acc in dict.fromkeys(accounts):
+            entry = _detail_cache.get((base_url, acc))
+            if entry is not None and now - entry[0] <= config.CUSTOMER_DETAIL_CACHE_TTL_SECONDS:
+                found[acc] = entry[1]
+            else:
+                missing.append(acc)
+                generations[acc] = _detail_generation_locked(base_url, acc)
+    if not missing:
+        return found, None
+
+    fetched, err = get_raw_customer_details_batch(base_url, server_name, missing)
+    with _detail_cache_lock:
+        for acc, raw in fetched.items():
+            if _detail_generation_locked(base_url, acc) != generations.get(acc):
+                continue  # invalidated while we fetched: the details may predate the write
+            _detail_cache[(base_url, acc)] = (now, raw)
+            _detail_cache.move_to_end((base_url, acc))
+        while len(_detail_cache) > config.CUSTOMER_DETAIL_CACHE_MAX_ENTRIES:
+            _detail_cache.popitem(last=False)
+    found.update(fetched)
+    return found, err
+
+
+def list_matching_accounts(server_list: List[dict], filter_text: str, page: int = 1, page_size: int = 50) -> dict:
+    """
+    Phase 1: matching account ids on all servers (from the account index, no GetCustomer calls),
+    ordered by account then server and sliced into pages.
+    """
+    matches, errors = search_accounts_across_servers(server_list, filter_text, MODE_SUBSTRING)
+    start = (max(1, page) - 1) * page_size
+    return {
+        "total": len(matches),
+        "page": max(1, page),
+        "page_size": page_size,
+        "items": matches[start:start + page_size],
+        "errors": errors,
+    }
+
+
+def _is_summary_item(server_name, account) -> bool:
+    return isinstance(server_name, str) and isinstance(account, str) and bool(account)
+
+
+def get_customer_summaries_batch(server_list: List[dict], items: List[dict]) -> dict:
+    """
+    Phase 2: search-result entries for the given [{"server_name", "account"}] (one visible page),
+    fetched with one batched GetCustomer per server and served from the short-TTL cache when fresh.
+    Entries come back in input order; unknown or vanished accounts, and items whose server_name or
+    account is not a string, are listed under "missing".
+    """
+    servers_by_name = {s["name"]: s for s in server_list or []}
+    accounts_by_server: Dict[str, List[str]] = {}
+    errors: List[str] = []
+    for item in items:
+        name, acc = item.get("server_name"), item.get("account")
+        if not _is_summary_item(name, acc) or name not in servers_by_name:
+            continue
+        accounts_by_server.setdefault(name, []).append(acc)
+
+    details: Dict[str, Dict[str, dict]] = {}
+    if accounts_by_server:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(accounts_by_server)) as executor:
+            future_to_server = {
+                executor.submit(get_customer_details_cached, servers_by_name[name]["url"], name, accs): name
+                for name, accs in accounts_by_server.items()
+            }
+            for future in concurrent.futures.as_completed(future_to_server):
+                name = future_to_server[future]
+                try:
+                    details[name], err = future.result()
+                except Exception as exc:  # noqa: BLE001
+                    details[name], err = {}, str(exc)
+                if err:
+                    errors.append(err)
+
+    customers: List[dict] = []
+    missing: List[dict] = []
+    for item in items:
+        name, acc = item.get("server_name"), item.get("account")
+        raw = details.get(name, {}).get(acc) if _is_summary_item(name, acc) else None
+        if raw is None:
+            missing.append({"server_name": name, "account": acc})
+        else:
+            customers.append(_customer_summary(raw, name, servers_by_name[name]["url"]))
+    return {"customers": customers, "missing": missing, "errors": sorted(errors)}
@@ -0,0 +1,158 @@
+# backend/job_manager.py
+# In-process background job manager for long-running scans and mutations.
+# Jobs run on a bounded thread pool; HTTP handlers only submit and poll.
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+import concurrent.futures
+from typing import Callable, Dict, List, Optional
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED}
+
+
+class JobCancelled(Exception):
+    """Raised from a progress report once cancellation has been requested."""
+
+
+class Job:
+    """
+    A single background job. The worker function receives the job and reports progress
+    through update_progress(); each report is also a cancellation checkpoint. A worker that
+    catches JobCancelled and returns what it has done so far keeps that as the cancelled
+    job's result.
+    """
+
+    def __init__(self, kind: str, params: Optional[dict] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress: Dict[str, int] = {}
+        self.result = None
+        self.error: Optional[str] = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled.")
+
+    def set_progress(self, **values: int) -> None:
+        """Set absolute progress values (e.g. servers_total)."""
+        with self._lock:
+            self.progress.update(values)
+
+    def update_progress(self, **increments: int) -> None:
+        """Increment progress counters (e.g. servers_done=1, gateways_processed=1)."""
+        with self._lock:
+            for key, inc in increments.items():
+                self.progress[key] = self.progress.get(key, 0) + inc
+        self.check_cancelled()
+
+    def to_dict(self, include_result: bool = False) -> dict:
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "type": self.kind,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "progress": dict(self.progress),
+                "error": self.error,
+            }
+        if include_result and (self.status == JOB_SUCCEEDED or (self.status == JOB_CANCELLED and self.result is not None)):
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded pool and keeps finished jobs for retention_seconds,
+    evicting the oldest finished jobs once more than max_retained are held.
+    """
+
+    def __init__(self, max_workers: int = 4, retention_seconds: int = 3600, max_retained: int = 200):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+
+    def submit(self, kind: str, func: Callable[[Job], object], params: Optional[dict] = None) -> Job:
+        job = Job(kind, params)
+        with self._lock:
+            self._evict_locked()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._evict_locked()
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            self._evict_locked()
+            return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Request cancellation. Queued jobs never start; running jobs stop at their next progress report."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job._cancel_event.set()
+        with job._lock:
+            if job.status == JOB_QUEUED:
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+        return job
+
+    def _run(self, job: Job, func: Callable[[Job], object]) -> None:
+        with job._lock:
+            if job.status != JOB_QUEUED:
+                return
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+        result = None
+        try:
+            result = func(job)
+            job.check_cancelled()
+            status, error = JOB_SUCCEEDED, None
+        except JobCancelled:
+            status, error = JOB_CANCELLED, None  # result is the partial one, if func returned before stopping
+        except Exception as exc:  # noqa: BLE001
+            result, status, error = None, JOB_FAILED, f"{type(exc).__name__}: {exc}"
+            if job.cancel_requested:
+                status, error = JOB_CANCELLED, None
+        with job._lock:
+            job.result, job.status, job.error = result, status, error
+            job.finished_at = time.time()
+
+    def _evict_locked(self) -> None:
+        now = time.time()
+        finished = [j for j in self._jobs.values() if j.status in FINISHED_STATES and j.finished_at is not None]
+        for j in finished:
+            if now - j.finished_at > self.retention_seconds:
+                del self._jobs[j.id]
+        if len(self._jobs) > self.max_retained:
+            finished = sorted((j for j in self._jobs.values() if j.status in FINISHED_STATES), key=lambda j: j.finished_at or 0)
+            for j in finished[:len(self._jobs) - self.max_retained]:
+                del self._jobs[j.id]
@@ -0,0 +1,52 @@
+# backend/json_codec.py
+# JSON codec used for VOS responses (api_client.call_api) and for the large API responses.
+# orjson is used when installed (and config.JSON_CODEC allows it), otherwise the stdlib json
+# module; both produce the same documents. FastJSONResponse returns a body encoded here and,
+# when an endpoint returns it directly, also skips FastAPI's jsonable_encoder pass.
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+import config
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None and config.JSON_CODEC in ("auto", "orjson"):
+    BACKEND = "orjson"
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def loads(data: bytes | str) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    if config.JSON_CODEC == "orjson":
+        raise ImportError("config.JSON_CODEC is 'orjson' but orjson is not installed.")
+    BACKEND = "stdlib"
+
+    def loads(data: bytes | str) -> Any:
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the configured codec."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,328 @@
+# backend/load_test.py
+# End-to-end load generator for the API.
+# Drives a weighted mix of operations (customer search, cleanup scan, RG detail, RG save with
+# initial_hash, add-reals) from --concurrency threads and reports throughput and p50/p95/p99
+# latency per endpoint. Without --api-url it starts mock VOS servers (mock_vos_server.py) and
+# the API itself (uvicorn, --api-workers processes) pointed at them.
+#
+#   python load_test.py --concurrency 16 --duration 60 --mix search=2,cleanup_scan=1,detail=4,save=1,add_reals=1
+#   python load_test.py --api-url http://127.0.0.1:8000 --concurrency 32 --output load.json
+#
+# Save and add-reals write to the target servers, so only point --api-url at test systems.
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+from mock_vos_server import MockServerProcess, dataset_options_for_size
+
+
+DEFAULT_MIX = "search=2,cleanup_scan=1,detail=4,save=1,add_reals=1"
+Sample = Tuple[str, int, float]  # (endpoint label, HTTP status or 0 on connection error, seconds)
+
+
+class Targets:
+    """Names and numbers discovered through the API and used to build requests."""
+
+    def __init__(self, base_url: str, session: requests.Session):
+        self.routings: List[Tuple[str, str, List[str]]] = []  # (server, rg name, rewrite keys)
+        self.numbers: List[str] = []
+        self.search_terms: List[str] = []
+        servers = session.get(f"{base_url}/servers", timeout=60).json()
+        for server in servers:
+            name = server["name"]
+            resp = session.get(f"{base_url}/servers/{quote(name)}/routing-gateways", timeout=120)
+            if resp.status_code != 200:
+                continue
+            for rg in resp.json() or []:
+                rules = rg.get("rewriteRulesInCaller") or ""
+                keys = [seg.split(":", 1)[0] for seg in rules.split(",") if ":" in seg]
+                self.routings.append((name, rg["name"], keys))
+                self.numbers.extend(p for p in (rg.get("callinCallerPrefixes") or "").split(",")[:5] if p)
+            accounts = session.get(f"{base_url}/customers/accounts/search", params={"q": "", "mode": "prefix", "limit": 1000}, timeout=120)
+            if accounts.status_code == 200:
+                for entry in accounts.json().get("accounts", [])[:200]:
+                    account = entry["account"]
+                    if len(account) >= 4:
+                        self.search_terms.append(account[-4:])
+        if not self.routings:
+            raise RuntimeError("No routing gateways found through the API; nothing to load-test.")
+        self.numbers = self.numbers or ["0912345678"]
+        self.search_terms = self.search_terms or ["0012"]
+
+
+class LoadClient:
+    """One worker thread's session plus the operations of the mix. Each operation returns its samples."""
+
+    def __init__(self, base_url: str, targets: Targets, seed: int):
+        self.base_url = base_url
+        self.targets = targets
+        self.session = requests.Session()
+        self.random = random.Random(seed)
+
+    def _request(self, label: str, method: str, path: str, **kwargs) -> Tuple[Sample, Optional[requests.Response]]:
+        start = time.perf_counter()
+        try:
+            resp = self.session.request(method, self.base_url + path, timeout=300, **kwargs)
+        except requests.RequestException:
+            return (label, 0, time.perf_counter() - start), None
+        return (label, resp.status_code, time.perf_counter() - start), resp
+
+    def _rg(self) -> Tuple[str, str, List[str]]:
+        return self.random.choice(self.targets.routings)
+
+    def search(self) -> List[Sample]:
+        term = self.random.choice(self.targets.search_terms)
+        sample, _ = self._request("GET /customers/search", "GET", "/customers/search", params={"filter_text": term})
+        return [sample]
+
+    def cleanup_scan(self) -> List[Sample]:
+        numbers = self.random.sample(self.targets.numbers, min(20, len(self.targets.numbers)))
+        sample, _ = self._request("POST /cleanup/scan", "POST", "/cleanup/scan", json={"numbers": numbers})
+        return [sample]
+
+    def _detail(self, server: str, rg_name: str) -> Tuple[Sample, Optional[dict]]:
+        sample, resp = self._request(
+            "GET /servers/{server}/routing-gateways/{rg}", "GET", f"/servers/{quote(server)}/routing-gateways/{quote(rg_name)}"
+        )
+        return sample, (resp.json() if resp is not None and resp.status_code == 200 else None)
+
+    def detail(self) -> List[Sample]:
+        server, rg_name, _ = self._rg()
+        return [self._detail(server, rg_name)[0]]
+
+    def save(self) -> List[Sample]:
+        """Unchanged re-save guarded by initial_hash (409 when another worker saved first)."""
+        server, rg_name, _ = self._rg()
+        get_sample, details = self._detail(server, rg_name)
+        if not details:
+            return [get_sample]
+        initial_hash = details.pop("hash", None)
+        put_sample, _ = self._request(
+            "PUT /servers/{server}/routing-gateways/{rg}", "PUT", f"/servers/{quote(server)}/routing-gateways/{quote(rg_name)}",
+            json={"initial_hash": initial_hash, "payload_update_data": details},
+        )
+        return [get_sample, put_sample]
+
+    def add_reals(self) -> List[Sample]:
+        server, rg_name, keys = self._rg()
+        get_sample, details = self._detail(server, rg_name)
+        if not details or not keys:
+            return [get_sample]
+        new_real = "09" + "".join(self.random.choices("0123456789", k=8))
+        post_sample, _ = self._request(
+            "POST /servers/{server}/routing-gateways/{rg}/rules/{key}/reals", "POST",
+            f"/servers/{quote(server)}/routing-gateways/{quote(rg_name)}/rules/{quote(self.random.choice(keys))}/reals",
+            json={"new_reals": [new_real], "initial_hash": details.get("hash")},
+        )
+        return [get_sample, post_sample]
+
+
+OPERATIONS: Dict[str, Callable[[LoadClient], List[Sample]]] = {
+    "search": LoadClient.search,
+    "cleanup_scan": LoadClient.cleanup_scan,
+    "detail": LoadClient.detail,
+    "save": LoadClient.save,
+    "add_reals": LoadClient.add_reals,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}'. Known: {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError("The mix needs at least one operation with a positive weight.")
+    return weights
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[Sample], elapsed: float) -> dict:
+    """Per endpoint: count, throughput, status breakdown and latency percentiles (ms). 409 counts as a conflict, not an error."""
+    by_label: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_label.setdefault(sample[0], []).append(sample)
+    endpoints = {}
+    for label, items in sorted(by_label.items()):
+        latencies = sorted(s[2] for s in items)
+        statuses: Dict[str, int] = {}
+        for _, status, _ in items:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        endpoints[label] = {
+            "count": len(items),
+            "throughput_rps": round(len(items) / elapsed, 2) if elapsed else 0.0,
+            "errors": sum(1 for s in items if s[1] == 0 or (s[1] >= 400 and s[1] != 409)),
+            "conflicts": statuses.get("409", 0),
+            "statuses": statuses,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+        }
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def run_load(base_url: str, mix: Dict[str, float], concurrency: int, duration: float, warmup: float = 0.0, seed: int = 0) -> dict:
+    """Run the mix for warmup + duration seconds; samples started during the warm-up are discarded."""
+    targets = Targets(base_url, requests.Session())
+    names, weights = list(mix), list(mix.values())
+    samples: List[Sample] = []
+    samples_lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    def worker(index: int) -> None:
+        client = LoadClient(base_url, targets, seed * 1000 + index)
+        while True:
+            began = time.perf_counter()
+            if began >= deadline:
+                return
+            op = client.random.choices(names, weights)[0]
+            result = OPERATIONS[op](client)
+            if began >= measure_from:
+                with samples_lock:
+                    samples.extend(result)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = summarize(samples, max(time.perf_counter(), deadline) - measure_from)
+    report["settings"] = {"base_url": base_url, "mix": mix, "concurrency": concurrency, "duration_s": duration, "warmup_s": warmup}
+    return report
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalApi:
+    """The API under uvicorn in a child process, pointed at the given VOS servers."""
+
+    def __init__(self, vos_servers: List[dict], workers: int = 1):
+        port = _free_port()
+        self.url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, VOS_SERVERS_JSON=json.dumps(vos_servers))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        )
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"API process exited with code {self.process.returncode}.")
+            try:
+                if requests.get(self.url + "/", timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.close()
+        raise RuntimeError("API did not become ready within 60s.")
+
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+
+def print_report(report: dict) -> None:
+    print(f"{'endpoint':<62} {'count':>7} {'rps':>8} {'err':>5} {'409':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, stats in report["endpoints"].items():
+        print(
+            f"{label:<62} {stats['count']:>7} {stats['throughput_rps']:>8.2f} {stats['errors']:>5} {stats['conflicts']:>5} "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+    print(f"Total: {report['requests']} requests in {report['elapsed_s']}s ({report['throughput_rps']} req/s)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent load test of the API endpoints.")
+    parser.add_argument("--api-url", help="existing API to test; default: start mock VOS servers and a local API")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (operations: {', '.join(OPERATIONS)})")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of load before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    local = parser.add_argument_group("local setup (without --api-url)")
+    local.add_argument("--api-workers", type=int, default=1, help="uvicorn worker processes")
+    local.add_argument("--vos-servers", type=int, default=2)
+    local.add_argument("--size", type=int, default=4, help="mock dataset size step (see mock_vos_server.dataset_options_for_size)")
+    local.add_argument("--vos-latency-ms", type=float, default=20.0)
+    local.add_argument("--vos-jitter-ms", type=float, default=10.0)
+    local.add_argument("--vos-failure-rate", type=float, default=0.0)
+    local.add_argument("--vos-gzip", action="store_true", help="mock VOS servers gzip their responses")
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    mock = api = None
+    try:
+        base_url = args.api_url
+        if not base_url:
+            mock = MockServerProcess(
+                args.vos_servers, latency_ms=args.vos_latency_ms, jitter_ms=args.vos_jitter_ms,
+                failure_rate=args.vos_failure_rate, gzip_responses=args.vos_gzip, **dataset_options_for_size(args.size),
+            )
+            api = LocalApi(mock.servers, args.api_workers)
+            base_url = api.url
+        report = run_load(base_url.rstrip("/"), mix, args.concurrency, args.duration, args.warmup, args.seed)
+        if not args.api_url:
+            report["settings"].update({
+                "api_workers": args.api_workers, "vos_servers": args.vos_servers, "size": args.size,
+                "vos_latency_ms": args.vos_latency_ms, "vos_jitter_ms": args.vos_jitter_ms, "vos_failure_rate": args.vos_failure_rate,
+                "vos_gzip": args.vos_gzip,
+            })
+    finally:
+        if api:
+            api.close()
+        if mock:
+            mock.close()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
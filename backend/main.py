@@ -1,21 +1,32 @@
 # =================================================================
 # 1. IMPORT CORE LIBRARIES & FASTAPI MODULES
 # =================================================================
+import json
 import logging
+import time
+from contextlib import asynccontextmanager
 from typing import List, Optional, Dict
 
 # Xóa các import liên quan đến bảo mật: Security, Depends, APIRouter
-from fastapi import FastAPI, HTTPException, Body, Query
+from fastapi import FastAPI, HTTPException, Body, Query, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 # =================================================================
 # 2. IMPORT CUSTOM LOGIC & CONFIG
 # =================================================================
 import config
+import metrics
+import profiling
+import tracing
 from customer_management import (
     find_customers_across_all_servers,
     get_customer_details_canonical,
     update_customer_credit_limit,
-    update_customer_lock_status
+    update_customer_lock_status,
+    bulk_update_customers,
+    list_matching_accounts,
+    get_customer_summaries_batch
 )
 from mapping_gateway_management import (
     get_all_mapping_gateways,
@@ -31,20 +42,49 @@ from routing_gateway_management import (
     identify_gateways_for_cleanup_parallel,
     find_definitions_for_virtual_keys_backend,
     add_real_numbers_to_rule_backend,
+    add_real_numbers_bulk_backend,
     get_vn_status_in_specific_rg,
+    get_vn_status_batch_backend,
+    find_customers_linked_to_virtual_numbers_backend,
     apply_rg_update_for_cleanup_backend
 )
-from utils import generate_object_hash, generate_search_variants
+from utils import generate_object_hash, generate_search_variants_batch, build_variant_origin_map, is_six_digit_virtual_number_candidate
+from job_manager import JobManager, Job, JobCancelled
+from number_stream import (
+    MODE_CLEANUP, MODE_SEARCH, build_gateway_value_index, iter_numbers_from_lines, stream_number_matches
+)
+from vn_registry import get_virtual_number_registry
+from vn_allocator import RegistryIncomplete, get_allocator
+from parse_pool import shutdown_pool
+from customer_index import SEARCH_MODES, account_indexes, search_accounts_across_servers
+from balance_history import RESOLUTIONS, balance_sampler
+from json_codec import FastJSONResponse
+from compression import CompressionMiddleware
+from cleanup_plan import PlanNotExecutable, build_cleanup_plan, execute_cleanup_plan, plan_store
 
 # =================================================================
 # 3. KHỞI TẠO FastAPI App & LOGGING
 # =================================================================
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    """Starts the background workers with the app and stops them (and the parse pool) on shutdown."""
+    account_indexes.start_background_refresh()
+    if config.BALANCE_HISTORY_ENABLED:
+        balance_sampler.start()
+    try:
+        yield
+    finally:
+        account_indexes.stop_background_refresh()
+        balance_sampler.stop()
+        shutdown_pool()
+
 app = FastAPI(
     title="VOS3000 Management API (Unsecured)",
     description="API để quản lý tập trung các VOS3000 server. Lớp bảo mật API Key đã được tạm thời vô hiệu hóa.",
-    version="1.1.0-dev"
+    version="1.1.0-dev",
+    lifespan=_lifespan,
 )
 app.add_middleware(
     CORSMiddleware,
@@ -52,7 +92,76 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Cho phép tất cả các phương thức (GET, POST, etc.)
     allow_headers=["*"], # Cho phép tất cả các header
+    expose_headers=["X-Trace-Id", "X-Profile-Id"],
+)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=config.COMPRESSION_MIN_SIZE,
+    gzip_level=config.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=config.COMPRESSION_BROTLI_QUALITY,
+)
+
+@app.middleware("http")
+async def _record_request_metrics(request: Request, call_next):
+    if not config.METRICS_ENABLED:
+        return await call_next(request)
+    metrics.HTTP_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (not raw path) to keep series bounded; streaming bodies end later
+        route = request.scope.get("route")
+        route_label = getattr(route, "path", None) or "unmatched"
+        metrics.HTTP_IN_FLIGHT.dec()
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route_label)
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route_label, status=str(status))
+
+@app.middleware("http")
+async def _trace_request(request: Request, call_next):
+    if not (config.TRACING_ENABLED and request.headers.get(config.TRACE_HEADER)):
+        return await call_next(request)
+    with tracing.start_trace(f"{request.method} {request.url.path}", method=request.method, path=request.url.path) as trace:
+        response = await call_next(request)
+        trace.root.set(status=response.status_code)
+    response.headers["X-Trace-Id"] = trace.id
+    return response
+
+@app.middleware("http")
+async def _profile_request(request: Request, call_next):
+    if not config.PROFILING_TOKEN:
+        return await call_next(request)
+    mode, token = profiling.requested_mode(request.headers, request.query_params)
+    if mode is None:
+        return await call_next(request)
+    if not profiling.token_is_valid(token):
+        return JSONResponse(status_code=403, content={"detail": "Invalid or missing profiling token."})
+    if mode not in profiling.PROFILE_MODES:
+        return JSONResponse(status_code=400, content={"detail": f"Unsupported profile mode '{mode}'. Supported: {list(profiling.PROFILE_MODES)}"})
+    session = profiling.ProfileSession(mode, f"{request.method} {request.url.path}")
+    try:
+        session.start()
+    except profiling.ProfilerBusy as exc:
+        return JSONResponse(status_code=409, content={"detail": str(exc)})
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        await run_in_threadpool(session.stop, status)
+        profiling.profile_store.add(session)
+    response.headers["X-Profile-Id"] = session.id
+    return response
+
+job_manager = JobManager(
+    max_workers=config.JOB_MAX_WORKERS,
+    retention_seconds=config.JOB_RETENTION_SECONDS,
+    max_retained=config.JOB_MAX_RETAINED,
 )
+
 # =================================================================
 # 4. HELPER FUNCTION
 # =================================================================
@@ -72,6 +181,44 @@ def get_server_info(server_name: str) -> dict:
 def read_root():
     return {"message": "Welcome to VOS3000 Management API"}
 
+@app.get("/metrics", tags=["General"], response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render_latest(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/debug/traces", tags=["Debug"])
+def list_request_traces():
+    return tracing.list_traces()
+
+@app.get("/debug/traces/{trace_id}", tags=["Debug"])
+def get_request_trace(trace_id: str):
+    trace = tracing.get_trace(trace_id)
+    if trace is None: raise HTTPException(status_code=404, detail=f"Trace '{trace_id}' not found or expired.")
+    return trace
+
+def _require_profiling_token(request: Request) -> None:
+    token = request.headers.get("X-Profile-Token") or request.query_params.get("_profile_token")
+    if not profiling.token_is_valid(token): raise HTTPException(status_code=403, detail="Invalid or missing profiling token.")
+
+@app.get("/debug/profiles", tags=["Debug"])
+def list_request_profiles(request: Request):
+    _require_profiling_token(request)
+    return profiling.profile_store.list()
+
+@app.get("/debug/profiles/{profile_id}", tags=["Debug"])
+def get_request_profile(profile_id: str, request: Request):
+    _require_profiling_token(request)
+    session = profiling.profile_store.get(profile_id)
+    if session is None: raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found or expired.")
+    return session.to_dict()
+
+@app.get("/debug/profiles/{profile_id}/folded", tags=["Debug"], response_class=PlainTextResponse)
+def download_request_profile_stacks(profile_id: str, request: Request):
+    _require_profiling_token(request)
+    session = profiling.profile_store.get(profile_id)
+    if session is None: raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found or expired.")
+    if session.mode != profiling.MODE_SAMPLE: raise HTTPException(status_code=400, detail="Collapsed stacks exist only for 'sample' profiles.")
+    return PlainTextResponse(session.folded(), headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'})
+
 @app.get("/servers", tags=["General"])
 def list_configured_servers():
     return [{"name": s["name"]} for s in config.VOS_SERVERS]
@@ -81,7 +228,59 @@ def list_configured_servers():
 @app.get("/customers/search", tags=["Customer Management"])
 def search_customers(filter_text: str, filter_type: str = "account_id"):
     results = find_customers_across_all_servers(config.VOS_SERVERS, filter_type, filter_text)
-    return results
+    return FastJSONResponse(results)
+
+@app.get("/customers/search/ids", tags=["Customer Management"])
+def search_customer_account_ids(filter_text: str, page: int = Query(1, ge=1), page_size: int = Query(config.CUSTOMER_SEARCH_DEFAULT_LIMIT, ge=1, le=500)):
+    if not filter_text: raise HTTPException(status_code=400, detail="'filter_text' cannot be empty.")
+    return list_matching_accounts(config.VOS_SERVERS, filter_text, page, page_size)
+
+@app.post("/customers/details/batch", tags=["Customer Management"])
+def get_customer_details_batch(payload: Dict = Body(...)):
+    items = payload.get("items", [])
+    if not items or not isinstance(items, list): raise HTTPException(status_code=400, detail="Payload must contain an 'items' list of {server_name, account}.")
+    if len(items) > 500: raise HTTPException(status_code=400, detail="At most 500 items per request.")
+    return get_customer_summaries_batch(config.VOS_SERVERS, [i for i in items if isinstance(i, dict)])
+
+@app.get("/customers/accounts/search", tags=["Customer Management"])
+def search_customer_accounts(q: str, mode: str = "substring", limit: int = Query(config.CUSTOMER_SEARCH_DEFAULT_LIMIT, ge=1, le=1000)):
+    if mode not in SEARCH_MODES: raise HTTPException(status_code=400, detail=f"Unsupported mode '{mode}'. Supported: {list(SEARCH_MODES)}")
+    if not q.strip(): raise HTTPException(status_code=400, detail="'q' cannot be empty.")
+    accounts, errors = search_accounts_across_servers(config.VOS_SERVERS, q, mode, limit)
+    return {"accounts": accounts, "errors": errors}
+
+@app.get("/customers/accounts/index", tags=["Customer Management"])
+def get_customer_index_stats():
+    return account_indexes.stats()
+
+def _require_balance_history():
+    if not config.BALANCE_HISTORY_ENABLED: raise HTTPException(status_code=404, detail="Balance history is disabled (set VOS_BALANCE_HISTORY_ENABLED=1).")
+
+def _job_balance_sample(job: Job):
+    return balance_sampler.sample_once(config.VOS_SERVERS)
+
+@app.get("/customers/near-limit", tags=["Customer Management"])
+def get_customers_near_limit(max_ratio: float = 0.1, max_headroom: Optional[float] = None, server_name: Optional[str] = None, limit: int = Query(100, ge=1, le=5000)):
+    _require_balance_history()
+    return balance_sampler.store.near_limit(max_ratio, max_headroom, server_name, limit=limit)
+
+@app.get("/customers/balance-history/status", tags=["Customer Management"])
+def get_balance_history_status():
+    _require_balance_history()
+    return {"enabled": config.BALANCE_HISTORY_ENABLED, "last_run": balance_sampler.last_run, "store": balance_sampler.store.stats()}
+
+@app.post("/customers/balance-history/sample", status_code=202, tags=["Customer Management"])
+def sample_balances_now():
+    _require_balance_history()
+    if balance_sampler.busy: raise HTTPException(status_code=409, detail="A balance sampling run is already in progress.")
+    return job_manager.submit("balance_sample", _job_balance_sample).to_dict()
+
+@app.get("/servers/{server_name}/customers/{account_id}/balance-history", tags=["Customer Management"])
+def get_customer_balance_history(server_name: str, account_id: str, since: Optional[int] = None, until: Optional[int] = None, resolution: str = "auto"):
+    _require_balance_history()
+    get_server_info(server_name)
+    if resolution not in RESOLUTIONS: raise HTTPException(status_code=400, detail=f"Unsupported resolution '{resolution}'. Supported: {list(RESOLUTIONS)}")
+    return {"server_name": server_name, "account": account_id, "points": balance_sampler.store.trend(server_name, account_id, since, until, resolution)}
 
 @app.get("/servers/{server_name}/customers/{account_id}", tags=["Customer Management"])
 def get_customer_details(server_name: str, account_id: str):
@@ -118,13 +317,21 @@ def set_customer_lock_status(server_name: str, account_id: str, payload: Dict =
         raise HTTPException(status_code=400, detail=message)
     return {"message": message}
 
+@app.post("/customers/bulk-update", tags=["Customer Management"])
+def bulk_update_customer_accounts(payload: Dict = Body(...)):
+    """Streams one NDJSON line per account outcome as soon as it is known."""
+    updates = payload.get("updates", [])
+    if not updates or not isinstance(updates, list): raise HTTPException(status_code=400, detail="Payload must contain an 'updates' list.")
+    outcomes = bulk_update_customers(config.VOS_SERVERS, updates)
+    return StreamingResponse((json.dumps(o, ensure_ascii=False) + "\n" for o in outcomes), media_type="application/x-ndjson")
+
 # --- Gateway Management Endpoints ---
 @app.get("/servers/{server_name}/mapping-gateways", tags=["Gateway Management"])
 def list_mapping_gateways(server_name: str, filter_text: str = ""):
     server_info = get_server_info(server_name)
     gateways, error = get_all_mapping_gateways(server_info, filter_text)
     if error: raise HTTPException(status_code=500, detail=error)
-    return gateways
+    return FastJSONResponse(gateways)
 
 @app.get("/servers/{server_name}/mapping-gateways/{mg_name}", tags=["Gateway Management"])
 def get_mg_details(server_name: str, mg_name: str):
@@ -158,7 +365,7 @@ def list_routing_gateways(server_name: str, filter_text: str = ""):
     server_info = get_server_info(server_name)
     gateways, error = get_all_routing_gateways(server_info, filter_text)
     if error: raise HTTPException(status_code=500, detail=error)
-    return gateways
+    return FastJSONResponse(gateways)
 
 @app.get("/servers/{server_name}/routing-gateways/{rg_name}", tags=["Gateway Management"])
 def get_rg_details(server_name: str, rg_name: str):
@@ -202,47 +409,183 @@ def add_reals_to_rewrite_rule(server_name: str, rg_name: str, virtual_key: str,
         raise HTTPException(status_code=400, detail=message)
     return {"message": message}
 
+@app.post("/rewrite-rules/reals/bulk", tags=["Rewrite Rule Management"])
+def add_reals_to_rewrite_rules_bulk(payload: Dict = Body(...)):
+    entries = payload.get("entries", [])
+    if not entries: raise HTTPException(status_code=400, detail="Payload must contain an 'entries' list.")
+    results = add_real_numbers_bulk_backend(config.VOS_SERVERS, entries)
+    return {"results": results, "succeeded": sum(1 for r in results if r["success"]), "failed": sum(1 for r in results if not r["success"])}
+
 # --- System-Wide Search & Cleanup Endpoints ---
 @app.post("/search/number-info", tags=["Search & Cleanup"])
 def search_number_info(payload: Dict = Body(...)):
     original_inputs = payload.get("numbers", [])
     if not original_inputs: raise HTTPException(status_code=400, detail="Payload must contain a 'numbers' list.")
-    all_variants = set().union(*(generate_search_variants(item) for item in original_inputs))
-    results = find_number_info_parallel(config.VOS_SERVERS, all_variants, original_inputs)
-    return results
+    variant_origins = build_variant_origin_map(original_inputs)
+    results = find_number_info_parallel(config.VOS_SERVERS, set(variant_origins), original_inputs, variant_origins=variant_origins)
+    return FastJSONResponse(results)
 
 @app.post("/cleanup/scan", tags=["Search & Cleanup"])
 def scan_for_cleanup(payload: Dict = Body(...)):
     numbers_to_check = set(payload.get("numbers", []))
     if not numbers_to_check: raise HTTPException(status_code=400, detail="Payload must contain a 'numbers' list to check.")
-    all_variants_to_check = set().union(*(generate_search_variants(num) for num in numbers_to_check))
+    all_variants_to_check = set().union(*generate_search_variants_batch(numbers_to_check))
     results = identify_gateways_for_cleanup_parallel(config.VOS_SERVERS, all_variants_to_check)
-    return results
+    return FastJSONResponse(results)
+
+def _run_cleanup_task(task: dict) -> str:
+    """Apply one prepared cleanup task and return its execution log line."""
+    if not isinstance(task, dict): return f"Skipping invalid task: {task}"
+    server_name, gateway_name = task.get("server_name"), task.get("gateway_name")
+    task_type, updated_payload = task.get("type"), task.get("updated_payload")
+    if not all([server_name, gateway_name, task_type, updated_payload]):
+        return f"Skipping invalid task: {task}"
+    try:
+        server_info = get_server_info(server_name)
+        server_url = server_info["url"]
+        success, message = False, "Unknown error"
+        if task_type == "MG":
+            success, message = apply_mg_update_for_cleanup_backend(server_url, server_name, gateway_name, updated_payload)
+        elif task_type == "RG":
+            success, message = apply_rg_update_for_cleanup_backend(server_url, server_name, gateway_name, updated_payload)
+        else: message = f"Unsupported task type: {task_type}"
+        status = "SUCCESS" if success else "FAILED"
+        return f"[{status}] {server_name} - {gateway_name}: {message}"
+    except HTTPException: return f"[FAILED] {server_name} - {gateway_name}: Server not found in config."
+    except Exception as e: return f"[FAILED] {server_name} - {gateway_name}: An unexpected error occurred: {e}"
+
+def run_cleanup_tasks(tasks: List[dict], progress_callback=None) -> List[str]:
+    """
+    Apply prepared cleanup tasks one by one and return the execution log.
+    progress_callback is called once per task, skipped invalid ones included. If it raises
+    JobCancelled, the remaining tasks are skipped and the log of what was already applied is
+    still returned.
+    """
+    results_log = []
+    for done, task in enumerate(tasks, start=1):
+        results_log.append(_run_cleanup_task(task))
+        if progress_callback:
+            try:
+                progress_callback(gateways_processed=1)
+            except JobCancelled:
+                if done < len(tasks):
+                    results_log.append(f"[CANCELLED] Stopped after {done} of {len(tasks)} tasks; the remaining tasks were not applied.")
+                break
+    return results_log
 
 @app.post("/cleanup/execute", tags=["Search & Cleanup"])
 def execute_cleanup(payload: Dict = Body(...)):
     tasks = payload.get("tasks", [])
-    if not tasks: raise HTTPException(status_code=400, detail="Payload must contain a 'tasks' list.")
-    results_log = []
-    for task in tasks:
-        server_name, gateway_name = task.get("server_name"), task.get("gateway_name")
-        task_type, updated_payload = task.get("type"), task.get("updated_payload")
-        if not all([server_name, gateway_name, task_type, updated_payload]):
-            results_log.append(f"Skipping invalid task: {task}"); continue
-        try:
-            server_info = get_server_info(server_name)
-            server_url = server_info["url"]
-            success, message = False, "Unknown error"
-            if task_type == "MG":
-                success, message = apply_mg_update_for_cleanup_backend(server_url, server_name, gateway_name, updated_payload)
-            elif task_type == "RG":
-                success, message = apply_rg_update_for_cleanup_backend(server_url, server_name, gateway_name, updated_payload)
-            else: message = f"Unsupported task type: {task_type}"
-            status = "SUCCESS" if success else "FAILED"
-            results_log.append(f"[{status}] {server_name} - {gateway_name}: {message}")
-        except HTTPException: results_log.append(f"[FAILED] {server_name} - {gateway_name}: Server not found in config.")
-        except Exception as e: results_log.append(f"[FAILED] {server_name} - {gateway_name}: An unexpected error occurred: {e}")
-    return {"execution_log": results_log}
+    if not tasks or not isinstance(tasks, list): raise HTTPException(status_code=400, detail="Payload must contain a 'tasks' list.")
+    return {"execution_log": run_cleanup_tasks(tasks)}
+
+@app.post("/cleanup/plan", tags=["Search & Cleanup"])
+def create_cleanup_plan(payload: Dict = Body(...)):
+    numbers_to_check = set(payload.get("numbers", []))
+    if not numbers_to_check: raise HTTPException(status_code=400, detail="Payload must contain a 'numbers' list to check.")
+    all_variants_to_check = set().union(*generate_search_variants_batch(numbers_to_check))
+    plan = plan_store.add(build_cleanup_plan(config.VOS_SERVERS, all_variants_to_check, len(numbers_to_check)))
+    return FastJSONResponse(plan.to_dict())
+
+@app.get("/cleanup/plans/{plan_id}", tags=["Search & Cleanup"])
+def get_cleanup_plan(plan_id: str):
+    plan = plan_store.get(plan_id)
+    if not plan: raise HTTPException(status_code=404, detail=f"Cleanup plan '{plan_id}' not found or expired.")
+    return FastJSONResponse(plan.to_dict())
+
+@app.post("/cleanup/plans/{plan_id}/execute", tags=["Search & Cleanup"])
+def execute_cleanup_plan_endpoint(plan_id: str, payload: Optional[Dict] = Body(None)):
+    plan = plan_store.get(plan_id)
+    if not plan: raise HTTPException(status_code=404, detail=f"Cleanup plan '{plan_id}' not found or expired.")
+    item_ids = (payload or {}).get("item_ids")
+    if item_ids is not None and not (isinstance(item_ids, list) and all(isinstance(i, int) and not isinstance(i, bool) for i in item_ids)):
+        raise HTTPException(status_code=400, detail="'item_ids' must be a list of integer item ids.")
+    try:
+        return execute_cleanup_plan(plan, item_ids)
+    except PlanNotExecutable as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def _stream_uploaded_numbers(upload: UploadFile, mode: str, include_misses: bool) -> StreamingResponse:
+    """Index the fleet once, then stream the uploaded file line by line and emit NDJSON findings."""
+    index, index_errors = build_gateway_value_index(config.VOS_SERVERS, mode)
+    findings = stream_number_matches(iter_numbers_from_lines(upload.file), index, include_misses=include_misses, index_errors=index_errors)
+    return StreamingResponse((json.dumps(f, ensure_ascii=False) + "\n" for f in findings), media_type="application/x-ndjson")
+
+@app.post("/search/number-info/upload", tags=["Search & Cleanup"])
+def search_number_info_upload(file: UploadFile = File(..., description="CSV/TXT file, one number per line (first CSV column)."), include_misses: bool = False):
+    return _stream_uploaded_numbers(file, MODE_SEARCH, include_misses)
+
+@app.post("/cleanup/scan/upload", tags=["Search & Cleanup"])
+def scan_for_cleanup_upload(file: UploadFile = File(..., description="CSV/TXT file, one number per line (first CSV column)."), include_misses: bool = False):
+    return _stream_uploaded_numbers(file, MODE_CLEANUP, include_misses)
+
+# --- Background Job Endpoints ---
+def _job_cleanup_scan(job: Job):
+    numbers_to_check = set(job.params.get("numbers", []))
+    all_variants_to_check = set().union(*generate_search_variants_batch(numbers_to_check))
+    job.set_progress(servers_total=len(config.VOS_SERVERS), servers_done=0, gateways_processed=0)
+    return identify_gateways_for_cleanup_parallel(config.VOS_SERVERS, all_variants_to_check, job.update_progress)
+
+def _job_cleanup_execute(job: Job):
+    tasks = job.params.get("tasks", [])
+    job.set_progress(gateways_total=len(tasks), gateways_processed=0)
+    return {"execution_log": run_cleanup_tasks(tasks, job.update_progress)}
+
+def _job_cleanup_plan(job: Job):
+    numbers_to_check = set(job.params.get("numbers", []))
+    all_variants_to_check = set().union(*generate_search_variants_batch(numbers_to_check))
+    job.set_progress(servers_total=len(config.VOS_SERVERS), servers_done=0, gateways_processed=0)
+    plan = plan_store.add(build_cleanup_plan(config.VOS_SERVERS, all_variants_to_check, len(numbers_to_check), job.update_progress))
+    return plan.to_dict()
+
+def _job_customer_search(job: Job):
+    job.set_progress(servers_total=len(config.VOS_SERVERS), servers_done=0)
+    return find_customers_across_all_servers(
+        config.VOS_SERVERS, job.params.get("filter_type", "account_id"), job.params.get("filter_text", ""), job.update_progress
+    )
+
+def _job_number_search(job: Job):
+    original_inputs = job.params.get("numbers", [])
+    variant_origins = build_variant_origin_map(original_inputs)
+    job.set_progress(servers_total=len(config.VOS_SERVERS), servers_done=0)
+    return find_number_info_parallel(config.VOS_SERVERS, set(variant_origins), original_inputs, job.update_progress, variant_origins)
+
+# job type -> (runner, required list/str param)
+JOB_TYPES = {
+    "cleanup_scan": (_job_cleanup_scan, "numbers"),
+    "cleanup_execute": (_job_cleanup_execute, "tasks"),
+    "cleanup_plan": (_job_cleanup_plan, "numbers"),
+    "customer_search": (_job_customer_search, "filter_text"),
+    "number_search": (_job_number_search, "numbers"),
+}
+
+@app.post("/jobs", status_code=202, tags=["Jobs"])
+def submit_job(payload: Dict = Body(...)):
+    job_type, params = payload.get("type"), payload.get("params") or {}
+    if not isinstance(params, dict): raise HTTPException(status_code=400, detail="Job 'params' must be an object.")
+    if not isinstance(job_type, str) or job_type not in JOB_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported job type '{job_type}'. Supported: {sorted(JOB_TYPES)}")
+    runner, required_param = JOB_TYPES[job_type]
+    if not params.get(required_param):
+        raise HTTPException(status_code=400, detail=f"Job params must contain '{required_param}'.")
+    job = job_manager.submit(job_type, runner, params)
+    return job.to_dict()
+
+@app.get("/jobs", tags=["Jobs"])
+def list_jobs():
+    return [job.to_dict() for job in job_manager.list()]
+
+@app.get("/jobs/{job_id}", tags=["Jobs"])
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if not job: raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or already evicted.")
+    return job.to_dict(include_result=True)
+
+@app.delete("/jobs/{job_id}", tags=["Jobs"])
+def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if not job: raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or already evicted.")
+    return job.to_dict()
 
 # --- Rewrite Rule & Status Endpoints ---
 @app.get("/rewrite-rules/search", tags=["Rewrite Rule Management"])
@@ -252,9 +595,84 @@ def search_rewrite_rules(keys: List[str] = Query(..., description="List of virtu
     if error: raise HTTPException(status_code=500, detail=error)
     return definitions
 
+@app.post("/virtual-numbers/linked-customers", tags=["Rewrite Rule Management"])
+def find_linked_customers(payload: Dict = Body(...)):
+    virtual_numbers = payload.get("virtual_numbers", [])
+    if not isinstance(virtual_numbers, list) or not all(isinstance(v, str) for v in virtual_numbers):
+        raise HTTPException(status_code=400, detail="'virtual_numbers' must be a list of strings.")
+    range_start, range_end = payload.get("range_start"), payload.get("range_end")
+    vn_range = None
+    if range_start is not None or range_end is not None:
+        bounds = [b if isinstance(b, int) and not isinstance(b, bool) else int(b) if isinstance(b, str) and b.isascii() and b.isdigit() else None for b in (range_start, range_end)]
+        if any(b is None or not 0 <= b <= 999999 for b in bounds):
+            raise HTTPException(status_code=400, detail="'range_start' and 'range_end' must both be integers between 0 and 999999.")
+        if bounds[0] > bounds[1]: raise HTTPException(status_code=400, detail="'range_start' must not be greater than 'range_end'.")
+        vn_range = (f"{bounds[0]:06d}", f"{bounds[1]:06d}")
+    if not virtual_numbers and not vn_range:
+        raise HTTPException(status_code=400, detail="Payload must contain a 'virtual_numbers' list or 'range_start'/'range_end'.")
+    linked, error = find_customers_linked_to_virtual_numbers_backend(virtual_numbers, vn_range)
+    if linked is None: raise HTTPException(status_code=500, detail=error)
+    return {"linked_customers": linked, "error": error}
+
+@app.get("/virtual-numbers/registry/stats", tags=["Rewrite Rule Management"])
+def get_vn_registry_stats(refresh: bool = False):
+    return get_virtual_number_registry(force_refresh=refresh).to_dict()
+
+@app.get("/virtual-numbers/registry/keys/{virtual_key}", tags=["Rewrite Rule Management"])
+def get_vn_registry_key(virtual_key: str):
+    registry = get_virtual_number_registry()
+    records = registry.lookup(virtual_key)
+    if not records: raise HTTPException(status_code=404, detail=f"Virtual number '{virtual_key}' is not defined on any server.")
+    return {"virtual_key": virtual_key, "built_at": registry.built_at, "definitions": [r._asdict() for r in records]}
+
+def _synced_allocator():
+    try:
+        return get_allocator()
+    except RegistryIncomplete as e:
+        raise HTTPException(status_code=503, detail={"message": "Virtual number registry is incomplete; free keys cannot be determined.", "registry_errors": e.errors})
+
+@app.get("/virtual-numbers/free", tags=["Rewrite Rule Management"])
+def find_free_virtual_numbers(
+    count: int = Query(10, ge=1, le=1000), prefix: str = "",
+    range_start: int = Query(0, ge=0, le=999999), range_end: int = Query(999999, ge=0, le=999999),
+    reserve: bool = False, holder: Optional[str] = None,
+):
+    reserve_seconds = config.VN_RESERVATION_TTL_SECONDS if reserve else None
+    keys = _synced_allocator().find_free(count, range_start, range_end, prefix, reserve_seconds, holder)
+    return {"keys": keys, "reserved": reserve, "reserved_for_seconds": reserve_seconds}
+
+@app.post("/virtual-numbers/reservations", tags=["Rewrite Rule Management"])
+def reserve_virtual_numbers(payload: Dict = Body(...)):
+    keys = payload.get("keys", [])
+    if not keys or not isinstance(keys, list): raise HTTPException(status_code=400, detail="Payload must contain a 'keys' list.")
+    invalid = [k for k in keys if not (isinstance(k, str) and is_six_digit_virtual_number_candidate(k))]
+    if invalid: raise HTTPException(status_code=400, detail=f"Keys must be six-digit strings. Invalid: {invalid[:20]}")
+    reserved, unavailable = _synced_allocator().reserve(keys, config.VN_RESERVATION_TTL_SECONDS, payload.get("holder"))
+    return {"reserved": reserved, "unavailable": unavailable}
+
+@app.post("/virtual-numbers/reservations/release", tags=["Rewrite Rule Management"])
+def release_virtual_numbers(payload: Dict = Body(...)):
+    keys, holder = payload.get("keys", []), payload.get("holder")
+    if not isinstance(keys, list): raise HTTPException(status_code=400, detail="Payload must contain a 'keys' list.")
+    if holder is not None and not isinstance(holder, str): raise HTTPException(status_code=400, detail="'holder' must be a string.")
+    released, not_held = get_allocator(sync_registry=False).release(keys, holder)
+    return {"released": released, "not_held": not_held}
+
+@app.get("/virtual-numbers/reservations", tags=["Rewrite Rule Management"])
+def list_virtual_number_reservations():
+    return get_allocator(sync_registry=False).reservations()
+
 @app.get("/status/virtual-number", tags=["Status"])
 def get_vn_status_targeted(server_name: str, rg_name: str, vn: str):
     server_info = get_server_info(server_name)
     status, error = get_vn_status_in_specific_rg(server_info, rg_name, vn)
     if error: raise HTTPException(status_code=404, detail=error)
-    return {"found": True, "definition": status}
\ No newline at end of file
+    return {"found": True, "definition": status}
+
+@app.post("/status/virtual-numbers", tags=["Status"])
+def get_vn_status_batch(payload: Dict = Body(...)):
+    items, ranges = payload.get("items") or [], payload.get("ranges") or []
+    if not isinstance(items, list) or not isinstance(ranges, list): raise HTTPException(status_code=400, detail="'items' and 'ranges' must be lists.")
+    if not items and not ranges: raise HTTPException(status_code=400, detail="Payload must contain an 'items' and/or 'ranges' list.")
+    if not all(isinstance(q, dict) for q in [*items, *ranges]): raise HTTPException(status_code=400, detail="Every entry of 'items' and 'ranges' must be an object.")
+    return FastJSONResponse(get_vn_status_batch_backend(config.VOS_SERVERS, items, ranges, payload.get("max_age")))
\ No newline at end of file
@@ -3,10 +3,13 @@
 # Backend-only helpers for Mapping Gateway management (no Streamlit/UI deps).
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Callable, Dict, List, Optional, Tuple, Set
 
 import config
+import snapshot_cache
+import tracing
 from api_client import call_api  # Expects to return (data, error_msg)
+from number_set import CompactNumberSet, as_compact_number_set
 from utils import generate_object_hash  # Keep minimal util deps
 
 
@@ -112,6 +115,7 @@ def update_mapping_gateway(server_info: dict, mg_name_param: str, payload_update
             return False, "CONFLICT_ERROR: The data has been modified by another user. Please reload and try again."
 
     api_data, error_msg_api = call_api(base_url, "ModifyGatewayMapping", payload_update_data, server_name_for_log=server_name)
+    snapshot_cache.invalidate_server(base_url, snapshot_cache.MAPPING)
     if error_msg_api:
         return False, f"Failed to update Mapping Gateway '{effective_mg_name}' on {server_name}: {error_msg_api}"
 
@@ -134,12 +138,19 @@ def fetch_mappings_for_server_backend(server_url: str, server_name: str) -> Tupl
     return api_data.get("infoGatewayMappings", []) or [], None
 
 
-def identify_mg_for_cleanup_backend(server_url: str, server_name: str, numbers_to_check_set: Set[str]) -> Tuple[Optional[List[dict]], Optional[str]]:
+def identify_mg_for_cleanup_backend(
+    server_url: str,
+    server_name: str,
+    numbers_to_check_set: Set[str] | CompactNumberSet,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> Tuple[Optional[List[dict]], Optional[str]]:
     """
     Given a set of 'numbers' (caller prefixes), find MGs that contain any of them in calloutCallerPrefixes.
+    progress_callback, if given, is called with gateways_processed=1 per MG inspected.
     Returns (list of matches | [], error).
     """
     identified: List[dict] = []
+    check = as_compact_number_set(numbers_to_check_set)
     all_mappings, error_fetch = fetch_mappings_for_server_backend(server_url, server_name)
 
     if error_fetch:
@@ -149,20 +160,23 @@ def identify_mg_for_cleanup_backend(server_url: str, server_name: str, numbers_t
     if not all_mappings:
         return [], None
 
-    for mg in all_mappings:
-        mg_name = mg.get("name") or f"Unnamed_MG_Cleanup_{server_name}"
-        prefixes_str = mg.get("calloutCallerPrefixes", "") or ""
-        original_list = [p.strip() for p in prefixes_str.split(",") if p.strip()]
-
-        common = sorted(set(original_list) & set(numbers_to_check_set))
-        if common:
-            identified.append({
-                "type": "MG",
-                "server_url": server_url, "server_name": server_name, "name": mg_name,
-                "original_calloutCallerPrefixes_list": original_list,
-                "common_numbers_in_calloutCaller": common,
-                "raw_mg_info": mg,
-            })
+    with tracing.span("intersect.mg", gateways=len(all_mappings)) as stage:
+        for mg in all_mappings:
+            if progress_callback:
+                progress_callback(gateways_processed=1)
+            mg_name = mg.get("name") or f"Unnamed_MG_Cleanup_{server_name}"
+            prefixes_str = mg.get("calloutCallerPrefixes", "") or ""
+
+            common = check.intersect_csv(prefixes_str)
+            if common:
+                identified.append({
+                    "type": "MG",
+                    "server_url": server_url, "server_name": server_name, "name": mg_name,
+                    "original_calloutCallerPrefixes_list": [p.strip() for p in prefixes_str.split(",") if p.strip()],
+                    "common_numbers_in_calloutCaller": common,
+                    "raw_mg_info": mg,
+                })
+        stage.set(matched=len(identified))
     return identified, None
 
 
@@ -172,6 +186,7 @@ def apply_mg_update_for_cleanup_backend(server_url: str, server_name: str, mg_na
     Returns (ok, message).
     """
     _, error_msg = call_api(server_url, "ModifyGatewayMapping", updated_mg_data_payload, server_name_for_log=server_name)
+    snapshot_cache.invalidate_server(server_url, snapshot_cache.MAPPING)
     if error_msg:
         return False, f"Error updating Mapping Gateway '{mg_name}' on {server_name} for cleanup: {error_msg}"
 
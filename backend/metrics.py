@@ -0,0 +1,191 @@
+# backend/metrics.py
+# Minimal in-process metrics with Prometheus text exposition (served on /metrics by main.py).
+# Counters, gauges and histograms are label-keyed and thread-safe; no client library needed.
+# api_client.call_api records every VOS call here, the HTTP middleware in main.py every request.
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import config
+
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (non-cumulative, last = +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._series.items())
+        lines = self._header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- VOS calls (api_client.call_api) ---
+VOS_CALL_SECONDS = REGISTRY.register(Histogram(
+    "vos_api_call_duration_seconds", "Duration of VOS API calls.", ("server", "endpoint"), config.METRICS_LATENCY_BUCKETS,
+))
+VOS_RESPONSE_BYTES = REGISTRY.register(Histogram(
+    "vos_api_response_bytes", "Size of VOS API response bodies.", ("server", "endpoint"), config.METRICS_SIZE_BUCKETS,
+))
+VOS_ERRORS = REGISTRY.register(Counter(
+    "vos_api_errors_total", "Failed VOS API calls by error type (timeout, connection, http, ret_code, decode, other).",
+    ("server", "endpoint", "type"),
+))
+VOS_IN_FLIGHT = REGISTRY.register(Gauge("vos_api_in_flight", "VOS API calls currently in progress.", ("server",)))
+
+# --- API requests (middleware in main.py) ---
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "API requests handled.", ("method", "route", "status"),
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "API request duration until the response starts.", ("method", "route"),
+    config.METRICS_LATENCY_BUCKETS,
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge("http_requests_in_flight", "API requests currently in progress."))
+
+
+class VosCallObservation:
+    """Records one VOS call: in-flight while open, then latency, response size and error type on finish()."""
+
+    __slots__ = ("server", "endpoint", "start", "response_bytes", "error_type")
+
+    def __init__(self, server: str, endpoint: str):
+        self.server = server
+        self.endpoint = endpoint
+        self.response_bytes: Optional[int] = None
+        self.error_type: Optional[str] = None
+        self.start = time.perf_counter()
+        if config.METRICS_ENABLED:
+            VOS_IN_FLIGHT.inc(server=server)
+
+    def finish(self) -> None:
+        if not config.METRICS_ENABLED:
+            return
+        VOS_IN_FLIGHT.dec(server=self.server)
+        VOS_CALL_SECONDS.observe(time.perf_counter() - self.start, server=self.server, endpoint=self.endpoint)
+        if self.response_bytes is not None:
+            VOS_RESPONSE_BYTES.observe(self.response_bytes, server=self.server, endpoint=self.endpoint)
+        if self.error_type:
+            VOS_ERRORS.inc(server=self.server, endpoint=self.endpoint, type=self.error_type)
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
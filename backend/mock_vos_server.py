@@ -0,0 +1,417 @@
+# backend/mock_vos_server.py
+# Synthetic VOS3000 stand-in for benchmarks, load tests and offline development.
+# Serves the endpoints the backend uses (GetGatewayRouting, GetGatewayMapping, GetAllCustomers,
+# GetCustomer, ModifyGatewayRouting, ModifyGatewayMapping, ModifyCustomer) with the real response
+# shapes over plain HTTP, backed by a deterministic generated dataset. Latency, jitter and
+# failures (HTTP 500s and retCode errors) can be injected per server, and responses can be
+# gzip-encoded for clients that accept it (--gzip), like a VOS behind a compressing proxy.
+#
+#   python mock_vos_server.py --servers 2 --port 9100 --rgs 500 --rewrite-keys 200 --accounts 20000 --latency-ms 40
+#
+# prints the matching VOS_SERVERS_JSON value; export it before starting the API to point it at the mocks.
+from __future__ import annotations
+
+import argparse
+import copy
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+
+ENDPOINTS = (
+    "GetGatewayRouting", "GetGatewayMapping", "GetAllCustomers", "GetCustomer",
+    "ModifyGatewayRouting", "ModifyGatewayMapping", "ModifyCustomer",
+)
+RET_ERROR_CODE = -10001  # retCode used for injected (and not-found) API errors
+
+
+class MockVosDataset:
+    """
+    Generated gateways and customers of one mock server. Same seed and sizes -> same data.
+    - rgs routing gateways, every 10th named "to-..." (callee side), each with rewrite_keys
+      virtual keys of reals_per_key real numbers (every 20th key is 'hetso')
+    - mgs mapping gateways whose calloutCallerPrefixes list virtual keys of the RGs
+    - accounts customers, one per MG account plus generated ones
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        rgs: int = 100,
+        rewrite_keys: int = 50,
+        reals_per_key: int = 2,
+        prefixes_per_gateway: int = 20,
+        mgs: int = 100,
+        accounts: int = 1000,
+    ):
+        rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.routings: Dict[str, dict] = {}
+        self.mappings: Dict[str, dict] = {}
+        self.customers: Dict[str, dict] = {}
+
+        def real_number() -> str:
+            return "09" + "".join(rnd.choices("0123456789", k=8))
+
+        all_keys: List[str] = []
+        for i in range(rgs):
+            name = f"to-RG{seed:02d}-{i:05d}" if i % 10 == 9 else f"RG{seed:02d}-{i:05d}"
+            rules = []
+            for k in range(rewrite_keys):
+                key = f"{1 + i % 9}{(i * rewrite_keys + k) % 100000:05d}"
+                all_keys.append(key)
+                if k % 20 == 19:
+                    rules.append(f"{key}:hetso")
+                else:
+                    rules.append(f"{key}:{';'.join(real_number() for _ in range(reals_per_key))}")
+            prefixes = ",".join(real_number() for _ in range(prefixes_per_gateway))
+            self.routings[name] = {
+                "name": name,
+                "lockType": 0,
+                "callLevel": 1,
+                "prefix": "",
+                "callinCallerPrefixes": "" if name.startswith("to-") else prefixes,
+                "callinCalleePrefixes": prefixes if name.startswith("to-") else "",
+                "rewriteRulesInCaller": ",".join(sorted(rules, key=lambda r: r.split(":", 1)[0])),
+                "rewriteRulesInCallee": "",
+                "remoteIps": f"10.{seed % 256}.{i // 256 % 256}.{i % 256}",
+            }
+
+        account_names: List[str] = []
+        for i in range(mgs):
+            account = f"acc{seed:02d}{i:06d}"
+            account_names.append(account)
+            picks = rnd.sample(all_keys, min(prefixes_per_gateway, len(all_keys))) if all_keys else []
+            self.mappings[f"MG{seed:02d}-{i:05d}"] = {
+                "name": f"MG{seed:02d}-{i:05d}",
+                "lockType": 0,
+                "account": account,
+                "accountName": f"Customer {account}",
+                "calloutCallerPrefixes": ",".join(picks),
+                "calloutCalleePrefixes": "",
+                "remoteIps": f"172.{seed % 256}.{i // 256 % 256}.{i % 256}",
+            }
+        for i in range(mgs, max(accounts, mgs)):
+            account_names.append(f"acc{seed:02d}{i:06d}")
+
+        base_ms = 1_700_000_000_000
+        for i, account in enumerate(account_names):
+            limit = rnd.choice(("-1", "0", "100", "500", "1000", "5000"))
+            self.customers[account] = {
+                "account": account,
+                "name": f"Customer {account}",
+                "agentAccount": "",
+                "feeRateGroup": f"FRG{i % 7}",
+                "money": f"{rnd.uniform(-50, 5000):.3f}",
+                "limitMoney": limit,
+                "todayConsumption": f"{rnd.uniform(0, 200):.3f}",
+                "lockType": 1 if i % 50 == 49 else 0,
+                "type": 0,
+                "category": i % 3,
+                "startTime": base_ms + i * 1000,
+                "validTime": base_ms + 10 * 365 * 86_400_000,
+                "memo": "",
+            }
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"rgs": len(self.routings), "mgs": len(self.mappings), "accounts": len(self.customers)}
+
+    # --- Endpoint handlers: payload -> (response body, error message) ---
+    def _get_gateways(self, gateways: Dict[str, dict], list_key: str, payload: dict) -> dict:
+        names = payload.get("names") if isinstance(payload, dict) else None
+        with self.lock:
+            if names:
+                items = [copy.deepcopy(gateways[n]) for n in names if n in gateways]
+            else:
+                items = [copy.deepcopy(g) for g in gateways.values()]
+        return {"retCode": 0, list_key: items}
+
+    def _modify(self, records: Dict[str, dict], key_field: str, payload: dict, replace: bool) -> Tuple[dict, Optional[str]]:
+        key = payload.get(key_field) if isinstance(payload, dict) else None
+        with self.lock:
+            if key not in records:
+                return {}, f"{key_field} '{key}' does not exist"
+            if replace:
+                records[key] = copy.deepcopy(payload)
+            else:
+                records[key].update({k: v for k, v in payload.items() if k != key_field})
+        return {"retCode": 0}, None
+
+    def handle(self, endpoint: str, payload: dict) -> Tuple[dict, Optional[str]]:
+        if endpoint == "GetGatewayRouting":
+            return self._get_gateways(self.routings, "infoGatewayRoutings", payload), None
+        if endpoint == "GetGatewayMapping":
+            return self._get_gateways(self.mappings, "infoGatewayMappings", payload), None
+        if endpoint == "GetAllCustomers":
+            with self.lock:
+                return {"retCode": 0, "accounts": list(self.customers)}, None
+        if endpoint == "GetCustomer":
+            accounts = payload.get("accounts") if isinstance(payload, dict) else None
+            if not isinstance(accounts, list):
+                return {}, "accounts is required"
+            with self.lock:
+                found = [copy.deepcopy(self.customers[a]) for a in accounts if a in self.customers]
+            return {"retCode": 0, "infoCustomers": found}, None
+        if endpoint == "ModifyGatewayRouting":
+            return self._modify(self.routings, "name", payload, replace=True)
+        if endpoint == "ModifyGatewayMapping":
+            return self._modify(self.mappings, "name", payload, replace=True)
+        if endpoint == "ModifyCustomer":
+            return self._modify(self.customers, "account", payload, replace=False)
+        return {}, f"Unknown endpoint {endpoint}"
+
+
+class _MockVosHandler(BaseHTTPRequestHandler):
+    server: "MockVosServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - silence per-request stderr logging
+        pass
+
+    def _send_json(self, status: int, body: dict) -> None:
+        raw = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        if self.server.gzip_responses and "gzip" in self.headers.get("Accept-Encoding", ""):
+            raw = gzip.compress(raw, compresslevel=6)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):  # noqa: N802
+        endpoint = self.path.rstrip("/").rsplit("/", 1)[-1].split("?", 1)[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self.server.count(endpoint, "bad_request")
+            self._send_json(400, {"retCode": RET_ERROR_CODE, "exception": "Malformed JSON body"})
+            return
+
+        self.server.inject_latency()
+        fault = self.server.pick_fault()
+        if fault == "http_error":
+            self.server.count(endpoint, "http_error")
+            self._send_json(500, {"retCode": RET_ERROR_CODE, "exception": "Injected server failure"})
+            return
+        if fault == "ret_error":
+            self.server.count(endpoint, "ret_error")
+            self._send_json(200, {"retCode": RET_ERROR_CODE, "exception": "Injected API error"})
+            return
+
+        response, err = self.server.dataset.handle(endpoint, payload)
+        if err:
+            self.server.count(endpoint, "ret_error")
+            self._send_json(200, {"retCode": RET_ERROR_CODE, "exception": err})
+            return
+        self.server.count(endpoint, "ok")
+        self._send_json(200, response)
+
+
+class MockVosServer(ThreadingHTTPServer):
+    """
+    HTTP server for one MockVosDataset. latency_ms +/- jitter_ms is slept before every response;
+    failure_rate answers HTTP 500 and ret_error_rate answers retCode != 0 (both 0..1 probabilities).
+    gzip_responses gzip-encodes responses for clients sending Accept-Encoding: gzip.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        dataset: MockVosDataset,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        ret_error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        gzip_responses: bool = False,
+    ):
+        super().__init__(address, _MockVosHandler)
+        self.dataset = dataset
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.ret_error_rate = ret_error_rate
+        self.gzip_responses = gzip_responses
+        self._random = random.Random(seed)
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._counts_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/external/server/"
+
+    def inject_latency(self) -> None:
+        with self._counts_lock:
+            delay_ms = self.latency_ms + (self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+    def pick_fault(self) -> Optional[str]:
+        if not (self.failure_rate or self.ret_error_rate):
+            return None
+        with self._counts_lock:
+            roll = self._random.random()
+        if roll < self.failure_rate:
+            return "http_error"
+        if roll < self.failure_rate + self.ret_error_rate:
+            return "ret_error"
+        return None
+
+    def count(self, endpoint: str, outcome: str) -> None:
+        with self._counts_lock:
+            per_endpoint = self._counts.setdefault(endpoint, {})
+            per_endpoint[outcome] = per_endpoint.get(outcome, 0) + 1
+
+    def request_counts(self) -> Dict[str, Dict[str, int]]:
+        with self._counts_lock:
+            return {k: dict(v) for k, v in self._counts.items()}
+
+    def start_in_thread(self) -> "MockVosServer":
+        self._thread = threading.Thread(target=self.serve_forever, name=f"mock-vos-{self.server_address[1]}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def start_mock_servers(
+    count: int = 1,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    failure_rate: float = 0.0,
+    ret_error_rate: float = 0.0,
+    gzip_responses: bool = False,
+    **dataset_options,
+) -> List[MockVosServer]:
+    """
+    Start count mock servers in background threads (port 0 = any free port, otherwise consecutive
+    ports). Server i uses dataset seed i. Returns the servers; stop them with server.stop().
+    """
+    servers = []
+    for i in range(count):
+        dataset = MockVosDataset(seed=i, **dataset_options)
+        server = MockVosServer(
+            (host, port + i if port else 0), dataset,
+            latency_ms=latency_ms, jitter_ms=jitter_ms,
+            failure_rate=failure_rate, ret_error_rate=ret_error_rate, seed=i, gzip_responses=gzip_responses,
+        )
+        servers.append(server.start_in_thread())
+    return servers
+
+
+def vos_servers_config(servers: List[MockVosServer]) -> List[dict]:
+    """VOS_SERVERS entries for the given mock servers."""
+    return [{"name": f"MOCK{i + 1}", "url": s.url} for i, s in enumerate(servers)]
+
+
+def dataset_options_for_size(size: int) -> dict:
+    """MockVosDataset dimensions growing linearly with size (used by benchmarks and load tests)."""
+    return {
+        "rgs": 50 * size,
+        "rewrite_keys": 40,
+        "reals_per_key": 2,
+        "prefixes_per_gateway": 20,
+        "mgs": 50 * size,
+        "accounts": 2000 * size,
+    }
+
+
+class MockServerProcess:
+    """
+    Mock servers run by this module's CLI in a child process, so their work does not compete
+    for the caller's GIL or show up in its measurements. VOS_SERVERS entries are in .servers.
+    """
+
+    def __init__(
+        self,
+        count: int = 1,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        ret_error_rate: float = 0.0,
+        gzip_responses: bool = False,
+        **dataset_options,
+    ):
+        options = {**dataset_options_for_size(1), **dataset_options}
+        cmd = [
+            sys.executable, os.path.abspath(__file__), "--servers", str(count), "--port", "0",
+            "--rgs", str(options["rgs"]), "--rewrite-keys", str(options["rewrite_keys"]),
+            "--reals-per-key", str(options["reals_per_key"]), "--prefixes", str(options["prefixes_per_gateway"]),
+            "--mgs", str(options["mgs"]), "--accounts", str(options["accounts"]),
+            "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms),
+            "--failure-rate", str(failure_rate), "--ret-error-rate", str(ret_error_rate),
+        ]
+        if gzip_responses:
+            cmd.append("--gzip")
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+        self.servers: List[dict] = []
+        for line in self.process.stdout:
+            if line.startswith("VOS_SERVERS_JSON="):
+                self.servers = json.loads(line.split("=", 1)[1].strip().strip("'"))
+                break
+        if not self.servers:
+            self.close()
+            raise RuntimeError("Mock VOS servers did not start.")
+
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run synthetic VOS3000 servers.")
+    parser.add_argument("--servers", type=int, default=1, help="number of mock servers (consecutive ports)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100, help="port of the first server (0: any free ports)")
+    parser.add_argument("--rgs", type=int, default=100)
+    parser.add_argument("--rewrite-keys", type=int, default=50, help="rewrite rule keys per RG")
+    parser.add_argument("--reals-per-key", type=int, default=2)
+    parser.add_argument("--prefixes", type=int, default=20, help="prefixes per gateway")
+    parser.add_argument("--mgs", type=int, default=100)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability of an HTTP 500")
+    parser.add_argument("--ret-error-rate", type=float, default=0.0, help="probability of a retCode error")
+    parser.add_argument("--gzip", action="store_true", help="gzip responses for clients accepting it")
+    args = parser.parse_args(argv)
+
+    servers = start_mock_servers(
+        args.servers, args.host, args.port,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate, ret_error_rate=args.ret_error_rate, gzip_responses=args.gzip,
+        rgs=args.rgs, rewrite_keys=args.rewrite_keys, reals_per_key=args.reals_per_key,
+        prefixes_per_gateway=args.prefixes, mgs=args.mgs, accounts=args.accounts,
+    )
+    for server in servers:
+        print(f"Mock VOS at {server.url} {server.dataset.stats()}", flush=True)
+    print(f"VOS_SERVERS_JSON='{json.dumps(vos_servers_config(servers))}'", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
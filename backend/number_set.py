@@ -0,0 +1,71 @@
+# backend/number_set.py
+# Membership structure for large sets of numeric strings (cleanup check sets).
+# Lookups go through one frozenset built once per scan, and the intersection helpers run at
+# C level over the raw gateway strings, so no per-gateway set or list is allocated for
+# gateways that do not match. For pickling (e.g. handing the set to worker processes) numeric
+# strings are packed per length into sorted int64 arrays: 8 bytes each instead of a str object,
+# with leading zeros kept because "0912" and "912" land in different length buckets.
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+_MAX_PACKED_DIGITS = 18  # 10**18 - 1 still fits in a signed 64-bit slot
+
+
+def _pack(values: Iterable[str]) -> Tuple[Dict[int, array], List[str]]:
+    buckets: Dict[int, List[int]] = {}
+    other: List[str] = []
+    for v in values:
+        if 0 < len(v) <= _MAX_PACKED_DIGITS and v.isascii() and v.isdigit():
+            buckets.setdefault(len(v), []).append(int(v))
+        else:
+            other.append(v)
+    return {length: array("q", sorted(ints)) for length, ints in buckets.items()}, other
+
+
+def _unpack(packed: Dict[int, array], other: List[str]) -> Iterator[str]:
+    for length, ints in packed.items():
+        for n in ints:
+            yield str(n).zfill(length)
+    yield from other
+
+
+class CompactNumberSet:
+    """Immutable set of strings with C-level CSV intersection helpers and a packed pickle form."""
+
+    __slots__ = ("_members",)
+
+    def __init__(self, values: Iterable[str] = ()):
+        self._members = frozenset(v if isinstance(v, str) else str(v) for v in values)
+
+    def __contains__(self, value: str) -> bool:
+        return value in self._members
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._members)
+
+    def __reduce__(self):
+        return (_from_packed, _pack(self._members))
+
+    def intersect_csv(self, csv_string: str, separator: str = ",") -> List[str]:
+        """Sorted unique tokens of csv_string that are in the set, without building a set of all tokens."""
+        if not csv_string:
+            return []
+        return sorted(t for t in self._members.intersection(map(str.strip, csv_string.split(separator))) if t)
+
+    def contains_any(self, values: Iterable[str]) -> bool:
+        return not self._members.isdisjoint(values)
+
+
+def _from_packed(packed: Dict[int, array], other: List[str]) -> CompactNumberSet:
+    return CompactNumberSet(_unpack(packed, other))
+
+
+def as_compact_number_set(values: Iterable[str]) -> CompactNumberSet:
+    """Return values unchanged if already a CompactNumberSet, else build one once."""
+    return values if isinstance(values, CompactNumberSet) else CompactNumberSet(values)
@@ -0,0 +1,167 @@
+# backend/number_stream.py
+# Streaming bulk number matching for uploaded CSV/TXT files.
+# The fleet's gateway data is indexed once per request (value -> occurrences); the uploaded
+# numbers are then read line by line in fixed-size chunks, expanded to search variants and
+# looked up in the index, so memory does not grow with the size of the upload.
+from __future__ import annotations
+
+import concurrent.futures
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import snapshot_cache
+from utils import (
+    generate_search_variants_batch,
+    is_six_digit_virtual_number_candidate,
+    parse_vos_rewrite_rules,
+)
+
+
+MODE_SEARCH = "search"
+MODE_CLEANUP = "cleanup"
+
+# (server_name, gateway type, gateway name, field, rewrite key context)
+Occurrence = Tuple[str, str, str, str, str]
+GatewayValueIndex = Dict[str, List[Occurrence]]
+
+_CSV_SEPARATORS = (",", ";", "\t")
+
+
+def _split_csv(value: str) -> List[str]:
+    return [p.strip() for p in value.split(",") if p.strip()]
+
+
+def _index_server(server_info: dict, mode: str) -> Tuple[List[Tuple[str, Occurrence]], List[str]]:
+    """
+    Collect (value, occurrence) pairs for one server. In cleanup mode the rules of
+    identify_*_for_cleanup_backend apply: callee prefixes only count on 'to' RGs and
+    rewrite keys only when they are six-digit virtual numbers.
+    """
+    s_name = server_info["name"]
+    pairs: List[Tuple[str, Occurrence]] = []
+    errors: List[str] = []
+
+    mg_snapshot, mg_err = snapshot_cache.get_gateway_snapshot(server_info, snapshot_cache.MAPPING)
+    if mg_err:
+        errors.append(f"Could not fetch MGs from {s_name}: {mg_err}")
+    else:
+        for mg in mg_snapshot.gateways:
+            mg_name = mg.get("name") or f"Unnamed_MG_{s_name}"
+            for p in _split_csv(mg.get("calloutCallerPrefixes") or ""):
+                pairs.append((p, (s_name, "MG", mg_name, "CalloutCallerPrefixes", "N/A")))
+
+    rg_snapshot, rg_err = snapshot_cache.get_gateway_snapshot(server_info, snapshot_cache.ROUTING)
+    if rg_err:
+        errors.append(f"Could not fetch RGs from {s_name}: {rg_err}")
+    else:
+        for rg in rg_snapshot.gateways:
+            rg_name = rg.get("name") or f"Unnamed_RG_{s_name}"
+            rg_name_lower = rg_name.lower()
+            is_to_rg = ("to" in rg_name_lower or "to-" in rg_name_lower or "to_" in rg_name_lower)
+
+            for p in _split_csv(rg.get("callinCallerPrefixes") or ""):
+                pairs.append((p, (s_name, "RG", rg_name, "CallinCallerPrefixes", "N/A")))
+            if mode == MODE_SEARCH or is_to_rg:
+                for p in _split_csv(rg.get("callinCalleePrefixes") or ""):
+                    pairs.append((p, (s_name, "RG", rg_name, "CallinCalleePrefixes", "N/A")))
+
+            for key, reals in parse_vos_rewrite_rules(rg.get("rewriteRulesInCaller", "") or "").items():
+                if mode == MODE_SEARCH or is_six_digit_virtual_number_candidate(key):
+                    pairs.append((key, (s_name, "RG", rg_name, "RewriteRule (Key)", key)))
+                for r in reals:
+                    if r.strip() and r.strip().lower() != "hetso":
+                        pairs.append((r.strip(), (s_name, "RG", rg_name, "RewriteRule (Real Numbers)", key)))
+    return pairs, errors
+
+
+def build_gateway_value_index(server_list: List[dict], mode: str = MODE_SEARCH) -> Tuple[GatewayValueIndex, List[str]]:
+    """Index every prefix, rewrite key and real number on all servers (fetched in parallel from snapshots)."""
+    index: GatewayValueIndex = {}
+    errors: List[str] = []
+    if not server_list:
+        return index, errors
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(server_list)) as executor:
+        future_to_server = {executor.submit(_index_server, s, mode): s for s in server_list}
+        for future in concurrent.futures.as_completed(future_to_server):
+            try:
+                pairs, server_errors = future.result()
+            except Exception as exc:
+                errors.append(f"Error indexing {future_to_server[future]['name']}: {exc}")
+                continue
+            errors.extend(server_errors)
+            for value, occurrence in pairs:
+                index.setdefault(value, []).append(occurrence)
+    return index, errors
+
+
+def iter_numbers_from_lines(lines: Iterable[bytes | str]) -> Iterator[str]:
+    """
+    Yield one raw number per non-empty line. For CSV lines only the first column is used;
+    a UTF-8 BOM and surrounding quotes are ignored. Header rows simply produce no matches.
+    """
+    for raw_line in lines:
+        line = raw_line.decode("utf-8-sig", errors="ignore") if isinstance(raw_line, bytes) else raw_line
+        line = line.strip().lstrip("\ufeff")
+        if not line:
+            continue
+        for sep in _CSV_SEPARATORS:
+            if sep in line:
+                line = line.split(sep, 1)[0]
+                break
+        line = line.strip().strip('"').strip("'").strip()
+        if line:
+            yield line
+
+
+def _chunks(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_number_matches(
+    numbers: Iterable[str],
+    index: GatewayValueIndex,
+    chunk_size: int = 5000,
+    include_misses: bool = False,
+    index_errors: Optional[List[str]] = None,
+) -> Iterator[dict]:
+    """
+    Match a (possibly huge) stream of numbers against a gateway value index.
+    Yields one finding per (input, matched value, occurrence), optional miss records,
+    and a final {"_summary": {...}} record.
+    """
+    numbers_read = numbers_matched = findings = 0
+    for chunk in _chunks(numbers, chunk_size):
+        for original, variants in zip(chunk, generate_search_variants_batch(chunk)):
+            numbers_read += 1
+            matched = False
+            for variant in sorted(variants):
+                for server_name, gw_type, gw_name, field, key_context in index.get(variant, ()):
+                    matched = True
+                    findings += 1
+                    yield {
+                        "Input": original,
+                        "Found Value": variant,
+                        "Server": server_name,
+                        "Type": gw_type,
+                        "Gateway Name": gw_name,
+                        "Field": field,
+                        "Rewrite Key Context": key_context,
+                    }
+            if matched:
+                numbers_matched += 1
+            elif include_misses:
+                yield {"Input": original, "Found Value": None}
+
+    yield {"_summary": {
+        "numbers_read": numbers_read,
+        "numbers_matched": numbers_matched,
+        "findings": findings,
+        "errors": index_errors or [],
+    }}
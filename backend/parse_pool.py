@@ -0,0 +1,222 @@
+# backend/parse_pool.py
+# CPU-bound parse/match stage for gateway scans.
+# Once the HTTP responses are in, parsing rewrite rules and intersecting prefix lists is pure
+# Python work that holds the GIL, so a thread per server still runs it on one core. For large
+# servers this stage is moved into a shared process pool. Workers receive only plain string
+# tuples and a CompactNumberSet (pickled as packed int arrays) and send back only the matches,
+# never whole gateway dicts. Small inputs stay in-process where pickling would cost more than it saves.
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import config
+import tracing
+from number_set import CompactNumberSet
+from utils import is_six_digit_virtual_number_candidate, parse_vos_rewrite_rules
+
+
+# (callinCallerPrefixes, callinCalleePrefixes, rewriteRulesInCaller) of one RG
+RgStrings = Tuple[str, str, str]
+# (common caller, common callee, common six-digit keys, key -> common reals, parsed rules)
+CleanupMatch = Tuple[List[str], List[str], List[str], Dict[str, List[str]], Optional[Dict[str, List[str]]]]
+# (field, sorted matched values, rewrite key context)
+NumberInfoMatch = Tuple[str, List[str], str]
+
+_BATCHES_PER_WORKER = 4
+
+_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+# ------------------------------
+# Pure matchers (run in-process or in workers)
+# ------------------------------
+def rewrite_rules_may_match(rewrite_str: str, check: CompactNumberSet) -> bool:
+    """Cheap pre-filter: does any key or real token of the raw rules string belong to the check set?"""
+    return check.contains_any(map(str.strip, rewrite_str.replace(":", ",").replace(";", ",").split(",")))
+
+
+def match_rg_for_cleanup(rg: RgStrings, is_to_rg: bool, check: CompactNumberSet) -> Optional[CleanupMatch]:
+    """Cleanup matching rules for one RG; None when nothing in it belongs to the check set."""
+    caller_str, callee_str, rewrite_str = rg
+    common_in_caller = check.intersect_csv(caller_str)
+    common_in_callee = check.intersect_csv(callee_str) if is_to_rg else []
+
+    parsed_rules: Optional[Dict[str, List[str]]] = None
+    common_virtual_keys: List[str] = []
+    common_real_values_map: Dict[str, List[str]] = {}
+    if rewrite_str and rewrite_rules_may_match(rewrite_str, check):
+        parsed_rules = parse_vos_rewrite_rules(rewrite_str)
+        common_virtual_keys = sorted([
+            vk for vk in parsed_rules if vk in check and is_six_digit_virtual_number_candidate(vk)
+        ])
+        for vk_map, rv_list_map in parsed_rules.items():
+            common_rv = sorted({r for r in rv_list_map if r.lower() != "hetso" and r in check})
+            if common_rv:
+                common_real_values_map[vk_map] = common_rv
+
+    if common_in_caller or common_in_callee or common_virtual_keys or common_real_values_map:
+        return common_in_caller, common_in_callee, common_virtual_keys, common_real_values_map, parsed_rules
+    return None
+
+
+def match_rg_for_number_info(rg: RgStrings, variants: CompactNumberSet) -> List[NumberInfoMatch]:
+    """Number-search matching rules for one RG, in the order findings are reported."""
+    caller_str, callee_str, rewrite_str = rg
+    matches: List[NumberInfoMatch] = []
+    matched_caller = variants.intersect_csv(caller_str)
+    if matched_caller:
+        matches.append(("CallinCallerPrefixes", matched_caller, "N/A"))
+    matched_callee = variants.intersect_csv(callee_str)
+    if matched_callee:
+        matches.append(("CallinCalleePrefixes", matched_callee, "N/A"))
+
+    if rewrite_str and rewrite_rules_may_match(rewrite_str, variants):
+        for key, reals in parse_vos_rewrite_rules(rewrite_str).items():
+            if key in variants:
+                matches.append(("RewriteRule (Key)", [key], key))
+            matched_reals = sorted({r.strip() for r in reals if r.strip().lower() != "hetso" and r.strip() in variants})
+            if matched_reals:
+                matches.append(("RewriteRule (Real Numbers)", matched_reals, key))
+    return matches
+
+
+def _cleanup_batch(batch: List[Tuple[RgStrings, bool]], check: CompactNumberSet) -> List[Optional[CleanupMatch]]:
+    return [match_rg_for_cleanup(rg, is_to_rg, check) for rg, is_to_rg in batch]
+
+
+def _number_info_batch(batch: List[RgStrings], variants: CompactNumberSet) -> List[List[NumberInfoMatch]]:
+    return [match_rg_for_number_info(rg, variants) for rg in batch]
+
+
+# ------------------------------
+# Pool management
+# ------------------------------
+def _get_pool() -> Optional[concurrent.futures.ProcessPoolExecutor]:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                # spawn, not fork: the parent runs request threads that may hold locks
+                _pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=config.PARSE_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (OSError, ValueError) as exc:
+                logging.warning(f"Parse pool unavailable, parsing in-process: {exc}")
+                return None
+        return _pool
+
+
+def _discard_pool(broken: concurrent.futures.ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def rg_text_size(rgs: Sequence[RgStrings]) -> int:
+    return sum(len(a) + len(b) + len(c) for a, b, c in rgs)
+
+
+def should_use_pool(text_size: int) -> bool:
+    return (
+        config.PARSE_POOL_ENABLED
+        and config.PARSE_POOL_WORKERS > 1
+        and text_size >= config.PARSE_POOL_MIN_CHARS
+    )
+
+
+def _split_batches(items: List, n_batches: int) -> List[List]:
+    size = max(1, -(-len(items) // n_batches))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _map_batches(
+    worker: Callable[[List, CompactNumberSet], List],
+    items: List,
+    numbers: CompactNumberSet,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> Optional[List]:
+    """
+    Run worker over contiguous batches of items in the pool; results come back in item order.
+    Returns None when the pool is unavailable or breaks, so callers fall back to in-process matching.
+    """
+    pool = _get_pool()
+    if pool is None:
+        return None
+    batches = _split_batches(items, config.PARSE_POOL_WORKERS * _BATCHES_PER_WORKER)
+    try:
+        futures = [pool.submit(worker, batch, numbers) for batch in batches]
+    except (BrokenProcessPool, RuntimeError) as exc:
+        logging.warning(f"Parse pool rejected work, parsing in-process: {exc}")
+        _discard_pool(pool)
+        return None
+
+    batch_results: List[Optional[List]] = [None] * len(batches)
+    index_of = {f: i for i, f in enumerate(futures)}
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            i = index_of[future]
+            batch_results[i] = future.result()
+            if progress_callback:
+                progress_callback(gateways_processed=len(batches[i]))
+    except BrokenProcessPool as exc:
+        logging.warning(f"Parse pool broke, parsing in-process: {exc}")
+        _discard_pool(pool)
+        return None
+    except BaseException:
+        for f in futures:
+            f.cancel()
+        raise
+    return [r for batch in batch_results for r in batch]
+
+
+def match_rgs_for_cleanup(
+    rgs: List[RgStrings],
+    is_to_flags: List[bool],
+    check: CompactNumberSet,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> List[Optional[CleanupMatch]]:
+    """match_rg_for_cleanup over many RGs, in the process pool when the text is large enough."""
+    text_size = rg_text_size(rgs)
+    with tracing.span("parse.match_cleanup", gateways=len(rgs), chars=text_size) as stage:
+        if should_use_pool(text_size):
+            results = _map_batches(_cleanup_batch, list(zip(rgs, is_to_flags)), check, progress_callback)
+            if results is not None:
+                stage.set(pool=True)
+                return results
+        stage.set(pool=False)
+        results = []
+        for rg, is_to_rg in zip(rgs, is_to_flags):
+            if progress_callback:
+                progress_callback(gateways_processed=1)
+            results.append(match_rg_for_cleanup(rg, is_to_rg, check))
+        return results
+
+
+def match_rgs_for_number_info(rgs: List[RgStrings], variants: CompactNumberSet) -> List[List[NumberInfoMatch]]:
+    """match_rg_for_number_info over many RGs, in the process pool when the text is large enough."""
+    text_size = rg_text_size(rgs)
+    with tracing.span("parse.match_number_info", gateways=len(rgs), chars=text_size) as stage:
+        if should_use_pool(text_size):
+            results = _map_batches(_number_info_batch, rgs, variants)
+            if results is not None:
+                stage.set(pool=True)
+                return results
+        stage.set(pool=False)
+        return [match_rg_for_number_info(rg, variants) for rg in rgs]
@@ -0,0 +1,200 @@
+# backend/profiling.py
+# Opt-in profiling of single API requests (see the middleware in main.py).
+# Disabled unless config.PROFILING_TOKEN is set; a request is then profiled when it carries the
+# token and a mode, either as headers (X-Profile: sample|memory, X-Profile-Token) or as the query
+# parameters _profile / _profile_token.
+# - sample: a background thread samples the Python stacks of all threads every
+#   config.PROFILING_SAMPLE_INTERVAL_MS (sys._current_frames), so work in fan-out threads is
+#   included, and so is anything concurrent requests run at the same time. Idle waits are skipped.
+# - memory: tracemalloc over the request; peak traced memory and the top allocation sites.
+# Reports are kept in memory (config.PROFILING_MAX_RETAINED) for download under /debug/profiles.
+from __future__ import annotations
+
+import hmac
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import List, Optional, Tuple
+
+import config
+
+
+MODE_SAMPLE = "sample"
+MODE_MEMORY = "memory"
+PROFILE_MODES = (MODE_SAMPLE, MODE_MEMORY)
+
+# Leaf frames in these stdlib modules are threads waiting for work, not doing it
+_IDLE_LEAF_FILES = ("threading.py", "queue.py", "selectors.py", os.path.join("concurrent", "futures", "thread.py"))
+_TOP_N = 30
+
+_memory_lock = threading.Lock()  # tracemalloc is process-wide: one memory profile at a time
+
+
+class ProfilerBusy(Exception):
+    """Raised when a memory profile is requested while another one is running."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_filename.endswith(_IDLE_LEAF_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileSession:
+    """One profiled request; start() before the handler, stop() after it, then to_dict()/folded()."""
+
+    def __init__(self, mode: str, label: str):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.label = label
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.status: Optional[int] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._start = 0.0
+        self._memory: dict = {}
+
+    def start(self) -> "ProfileSession":
+        if self.mode == MODE_MEMORY:
+            if tracemalloc.is_tracing() or not _memory_lock.acquire(blocking=False):
+                raise ProfilerBusy("Another memory profile (or tracemalloc user) is active.")
+            tracemalloc.start(config.PROFILING_TRACEMALLOC_FRAMES)
+        else:
+            self._sampler = _StackSampler(config.PROFILING_SAMPLE_INTERVAL_MS / 1000.0)
+            self._sampler.start()
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self, status: Optional[int] = None) -> None:
+        self.duration = time.perf_counter() - self._start
+        self.status = status
+        if self.mode == MODE_MEMORY:
+            try:
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                ))
+            finally:
+                tracemalloc.stop()
+                _memory_lock.release()
+            self._memory = {
+                "peak_kib": round(peak / 1024, 1),
+                "retained_kib": round(current / 1024, 1),
+                "top_allocations": [
+                    {
+                        "site": str(stat.traceback[0]),
+                        "traceback": [str(f) for f in stat.traceback],
+                        "size_kib": round(stat.size / 1024, 1),
+                        "count": stat.count,
+                    }
+                    for stat in snapshot.statistics("traceback")[:_TOP_N]
+                ],
+            }
+        elif self._sampler is not None:
+            self._sampler.stop()
+
+    def _sample_summary(self) -> dict:
+        stacks = self._sampler.stacks if self._sampler else Counter()
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in stacks.items():
+            self_counts[stack[-1]] += count
+            for label in set(stack):
+                total_counts[label] += count
+        return {
+            "interval_ms": config.PROFILING_SAMPLE_INTERVAL_MS,
+            "sampling_rounds": self._sampler.samples if self._sampler else 0,
+            "stack_samples": sum(stacks.values()),
+            "top_self": [{"function": f, "samples": c} for f, c in self_counts.most_common(_TOP_N)],
+            "top_total": [{"function": f, "samples": c} for f, c in total_counts.most_common(_TOP_N)],
+        }
+
+    def folded(self) -> str:
+        """Collapsed stacks ("a;b;c count" per line), the input format of flame-graph tools."""
+        if not self._sampler:
+            return ""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self._sampler.stacks.most_common())
+
+    def to_dict(self) -> dict:
+        report = {
+            "profile_id": self.id,
+            "mode": self.mode,
+            "request": self.label,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+        }
+        report.update(self._memory if self.mode == MODE_MEMORY else self._sample_summary())
+        return report
+
+
+class ProfileStore:
+    def __init__(self, max_profiles: int):
+        self._profiles: "OrderedDict[str, ProfileSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_profiles = max_profiles
+
+    def add(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._profiles[session.id] = session
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[ProfileSession]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            sessions = list(self._profiles.values())
+        return [
+            {"profile_id": s.id, "mode": s.mode, "request": s.label, "status": s.status, "started_at": s.started_at,
+             "duration_ms": round(s.duration * 1000, 3) if s.duration is not None else None}
+            for s in reversed(sessions)
+        ]
+
+
+profile_store = ProfileStore(config.PROFILING_MAX_RETAINED)
+
+
+def token_is_valid(token: Optional[str]) -> bool:
+    # Compare bytes: compare_digest rejects non-ASCII str arguments with a TypeError
+    return bool(config.PROFILING_TOKEN) and bool(token) and hmac.compare_digest(token.encode("utf-8"), config.PROFILING_TOKEN.encode("utf-8"))
+
+
+def requested_mode(headers, query_params) -> Tuple[Optional[str], Optional[str]]:
+    """(mode, token) asked for by a request, from headers or query parameters; (None, None) if none."""
+    mode = headers.get("X-Profile") or query_params.get("_profile")
+    if not mode:
+        return None, None
+    return mode.lower(), headers.get("X-Profile-Token") or query_params.get("_profile_token")
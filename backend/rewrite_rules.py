@@ -0,0 +1,176 @@
+# backend/rewrite_rules.py
+# Editable rewriteRulesInCaller document ("key:r1;r2,key2:hetso").
+# parse_vos_rewrite_rules + format_rewrite_rules_for_vos re-split and re-join every key for each
+# edit. Here each key keeps its unparsed segment until it is read or edited, serialized
+# segments are cached per key, and the keys are kept sorted incrementally, so an edit costs
+# O(size of the edited key) and to_string() only re-serializes the keys changed since the last call.
+# Output is identical to format_rewrite_rules_for_vos(parse_vos_rewrite_rules(s)) after the same edits.
+from __future__ import annotations
+
+import functools
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import config
+from utils import parse_vos_rewrite_rules
+
+
+HETSO = "hetso"  # VOS keyword: the key has no real numbers
+# Anything format_rewrite_rules_for_vos would rewrite: whitespace or empty real tokens
+_NON_CANONICAL = re.compile(r"\s|;;|:;|;,|;$")
+
+
+def _parse_reals(reals_segment: str) -> List[str]:
+    reals_segment = reals_segment.strip()
+    if reals_segment.lower() == HETSO:
+        return [HETSO]
+    return [r for r in map(str.strip, reals_segment.split(";")) if r]
+
+
+class RewriteRuleDocument:
+    """Lazily parsed, incrementally serialized set of rewrite rules."""
+
+    __slots__ = ("_raw", "_reals", "_segments", "_keys", "_serialized", "_raw_is_canonical")
+
+    def __init__(self, rules_string: Optional[str] = ""):
+        self._raw: Dict[str, str] = {}            # key -> unparsed reals segment (never read/edited)
+        self._reals: Dict[str, List[str]] = {}    # key -> parsed reals
+        self._segments: Dict[str, str] = {}       # key -> serialized "key:reals" cache
+        self._serialized: Optional[str] = None
+        self._raw_is_canonical = False
+        segment_count = 0
+        if rules_string and isinstance(rules_string, str):
+            for pair_segment in rules_string.split(","):
+                segment_count += 1
+                key, sep, reals_segment = pair_segment.partition(":")
+                key = key.strip()
+                if sep and key:
+                    self._raw[key] = reals_segment  # a repeated key keeps its last segment, as in the parser
+        self._keys: List[str] = sorted(self._raw)
+
+        # Strings written by format_rewrite_rules_for_vos (the usual case) are kept verbatim:
+        # untouched segments are then reused as-is and never parsed.
+        if (
+            segment_count
+            and segment_count == len(self._raw)
+            and self._keys == list(self._raw)
+            and not _NON_CANONICAL.search(rules_string)
+            and rules_string.lower().count(":" + HETSO) == rules_string.count(":" + HETSO)
+        ):
+            self._raw_is_canonical = True
+            self._serialized = rules_string
+
+    # --- Reading ---
+    def __contains__(self, key: str) -> bool:
+        return key in self._reals or key in self._raw
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def _reals_ref(self, key: str) -> List[str]:
+        reals = self._reals.get(key)
+        if reals is None:
+            reals = self._reals[key] = _parse_reals(self._raw.pop(key))
+        return reals
+
+    def get_reals(self, key: str) -> Optional[List[str]]:
+        """Copy of the reals of key (["hetso"] for hetso keys), or None if the key is absent."""
+        return list(self._reals_ref(key)) if key in self else None
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """Same shape as parse_vos_rewrite_rules (keys in sorted order)."""
+        return {k: list(self._reals_ref(k)) for k in self._keys}
+
+    # --- Serialization ---
+    def _segment(self, key: str) -> str:
+        segment = self._segments.get(key)
+        if segment is None and self._raw_is_canonical and key in self._raw:
+            segment = self._segments[key] = f"{key}:{self._raw[key]}"
+        elif segment is None:
+            reals = self._reals_ref(key)
+            segment = f"{key}:{HETSO}" if reals == [HETSO] else f"{key}:{';'.join(reals)}"
+            self._segments[key] = segment
+        return segment
+
+    def to_string(self) -> str:
+        if self._serialized is None:
+            self._serialized = ",".join([self._segment(k) for k in self._keys])
+        return self._serialized
+
+    __str__ = to_string
+
+    # --- Editing ---
+    def _store(self, key: str, reals: List[str]) -> None:
+        if key not in self:
+            insort(self._keys, key)
+        self._raw.pop(key, None)
+        self._reals[key] = reals
+        self._segments.pop(key, None)
+        self._serialized = None
+
+    def set_reals(self, key: str, reals: Iterable[str]) -> None:
+        self._store(key, [r for r in reals if r])
+
+    def set_hetso(self, key: str) -> None:
+        self._store(key, [HETSO])
+
+    def add_reals(self, key: str, reals: Iterable[str]) -> int:
+        """
+        Append reals to key (creating it if needed), replacing 'hetso' and dropping duplicates
+        while keeping order. Returns the key's new real count.
+        """
+        current = self._reals_ref(key) if key in self else []
+        if current == [HETSO]:
+            current = []
+        seen: set = set()
+        merged = [r for r in (*current, *reals) if r and not (r in seen or seen.add(r))]
+        self._store(key, merged)
+        return len(merged)
+
+    def remove_reals(self, key: str, reals: Iterable[str], drop_empty: bool = False) -> int:
+        """Remove reals from key. Returns how many were removed; drop_empty deletes a key left with none."""
+        if key not in self:
+            return 0
+        to_remove = set(reals)
+        current = self._reals_ref(key)
+        remaining = [r for r in current if r not in to_remove]
+        removed = len(current) - len(remaining)
+        if drop_empty and not remaining:
+            self.delete_key(key)
+        elif removed:
+            self._store(key, remaining)
+        return removed
+
+    def delete_key(self, key: str) -> bool:
+        if key not in self:
+            return False
+        del self._keys[bisect_left(self._keys, key)]
+        self._raw.pop(key, None)
+        self._reals.pop(key, None)
+        self._segments.pop(key, None)
+        self._serialized = None
+        return True
+
+
+class ParsedRules(NamedTuple):
+    """Shared, read-only parse result: rules as from parse_vos_rewrite_rules plus its keys sorted."""
+    rules: Dict[str, List[str]]
+    sorted_keys: Tuple[str, ...]
+
+    def keys_between(self, start: str, end: str) -> Tuple[str, ...]:
+        """Keys k with start <= k <= end (string order, so equal-length numeric keys compare numerically)."""
+        return self.sorted_keys[bisect_left(self.sorted_keys, start):bisect_right(self.sorted_keys, end)]
+
+
+@functools.lru_cache(maxsize=config.PARSED_RULES_CACHE_SIZE)
+def parse_rewrite_rules_cached(rules_string: str) -> ParsedRules:
+    """
+    Memoized parse keyed on the raw rules string, so unchanged RGs are not re-parsed when a
+    snapshot is re-downloaded. Callers must not mutate the returned structures.
+    """
+    rules = parse_vos_rewrite_rules(rules_string)
+    return ParsedRules(rules, tuple(sorted(rules)))
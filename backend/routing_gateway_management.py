@@ -4,21 +4,26 @@ from __future__ import annotations
 
 import logging
 import concurrent.futures
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 import config
+import snapshot_cache
+import tracing
 from api_client import call_api  # Must return (data, error_message)
+from customer_management import get_raw_customer_details_batch
+from number_set import CompactNumberSet, as_compact_number_set
+from rewrite_rules import RewriteRuleDocument, parse_rewrite_rules_cached
+from parse_pool import RgStrings, match_rgs_for_cleanup, match_rgs_for_number_info
 from mapping_gateway_management import (
     identify_mg_for_cleanup_backend,
     get_all_mapping_gateways,
 )
 from utils import (
     parse_vos_rewrite_rules,
-    format_rewrite_rules_for_vos,
     is_six_digit_virtual_number_candidate,
-    generate_search_variants,
+    build_variant_origin_map,
     generate_object_hash,
-    transform_real_number_for_vos_storage,
+    transform_real_numbers_for_vos_storage_batch,
 )
 
 
@@ -114,6 +119,7 @@ def update_routing_gateway(
             return False, "CONFLICT_ERROR: The data has been modified by another user. Please reload and try again."
 
     _, error_msg_api = call_api(base_url, "ModifyGatewayRouting", payload_update_data, server_name_for_log=server_name)
+    snapshot_cache.invalidate_server(base_url, snapshot_cache.ROUTING)
     if error_msg_api:
         return False, f"Failed to update Routing Gateway '{effective_rg_name}' on {server_name}: {error_msg_api}"
     return True, f"Routing Gateway '{effective_rg_name}' on server {server_name} updated successfully."
@@ -226,6 +232,14 @@ def find_definitions_for_virtual_keys_backend(virtual_keys_to_find: List[str]) -
     return definitions_list, final_error
 
 
+def _reals_are_strings(new_real_numbers_to_add) -> bool:
+    return isinstance(new_real_numbers_to_add, list) and all(isinstance(x, str) for x in new_real_numbers_to_add)
+
+
+def _normalize_new_reals(new_real_numbers_to_add: List[str]) -> List[str]:
+    return transform_real_numbers_for_vos_storage_batch([x for x in new_real_numbers_to_add if x and x.strip()])
+
+
 def add_real_numbers_to_rule_backend(
     server_info: dict,
     rg_name: str,
@@ -235,36 +249,129 @@ def add_real_numbers_to_rule_backend(
 ) -> Tuple[bool, str]:
     if not new_real_numbers_to_add:
         return False, "The list of real numbers to add cannot be empty."
+    if not _reals_are_strings(new_real_numbers_to_add):
+        return False, "'new_reals' must be a list of strings."
 
     rg_details, error = get_routing_gateway_details(server_info, rg_name)
     if error or not rg_details:
         return False, f"Could not retrieve details for RG '{rg_name}'. Error: {error or 'no data'}"
 
-    rules_dict = parse_vos_rewrite_rules(rg_details.get("rewriteRulesInCaller", "") or "")
-
-    current_reals = rules_dict.get(virtual_key, [])
-    if current_reals == ["hetso"]:
-        current_reals = []
-
-    normalized_new = [transform_real_number_for_vos_storage(x) for x in new_real_numbers_to_add if x and x.strip()]
-    combined_reals = current_reals + normalized_new
-
-    seen: Set[str] = set()
-    unique_reals = [x for x in combined_reals if not (x in seen or seen.add(x))]
-
-    rules_dict[virtual_key] = unique_reals
+    rules_doc = RewriteRuleDocument(rg_details.get("rewriteRulesInCaller", "") or "")
+    new_total = rules_doc.add_reals(virtual_key, _normalize_new_reals(new_real_numbers_to_add))
     payload = dict(rg_details)
-    payload["rewriteRulesInCaller"] = format_rewrite_rules_for_vos(rules_dict)
+    payload["rewriteRulesInCaller"] = rules_doc.to_string()
 
     if not initial_hash:
         initial_hash = generate_object_hash(rg_details)
 
     ok, msg = update_routing_gateway(server_info, rg_name, payload, initial_hash=initial_hash)
     if ok:
-        return True, msg or f"Successfully added numbers to rule '{virtual_key}' in RG '{rg_name}'. New total: {len(unique_reals)}."
+        return True, msg or f"Successfully added numbers to rule '{virtual_key}' in RG '{rg_name}'. New total: {new_total}."
     return False, msg or f"Failed to update rule for '{virtual_key}' in RG '{rg_name}'."
 
 
+def _entry_result(index: int, entry: dict, success: bool, message: str) -> dict:
+    return {
+        "index": index,
+        "server_name": entry.get("server_name"),
+        "rg_name": entry.get("rg_name"),
+        "virtual_key": entry.get("virtual_key"),
+        "success": success,
+        "message": message,
+    }
+
+
+def _add_real_numbers_bulk_on_server(server_info: dict, indexed_entries: List[Tuple[int, dict]]) -> List[dict]:
+    """
+    Apply all bulk entries targeting one server: one GetGatewayRouting for the whole server,
+    then one RewriteRuleDocument edit session and one ModifyGatewayRouting per touched RG.
+    """
+    base_url, server_name = server_info["url"], server_info["name"]
+    results: List[dict] = []
+
+    all_routings, error_fetch = fetch_routings_for_server_backend(base_url, server_name)
+    if error_fetch or all_routings is None:
+        msg = f"Could not fetch RGs from {server_name}: {error_fetch or 'no data'}"
+        return [_entry_result(i, e, False, msg) for i, e in indexed_entries]
+
+    routings_by_name = {rg.get("name"): rg for rg in all_routings}
+    entries_by_rg: Dict[str, List[Tuple[int, dict]]] = {}
+    for i, e in indexed_entries:
+        entries_by_rg.setdefault(e["rg_name"], []).append((i, e))
+
+    for rg_name, rg_entries in entries_by_rg.items():
+        rg_details = routings_by_name.get(rg_name)
+        if not rg_details:
+            msg = f"Routing Gateway '{rg_name}' not found on server {server_name}."
+            results.extend(_entry_result(i, e, False, msg) for i, e in rg_entries)
+            continue
+
+        # The RG was read just now, so a supplied hash is compared against it instead of re-fetching.
+        latest_hash = generate_object_hash(rg_details)
+        if any(e.get("initial_hash") and e["initial_hash"] != latest_hash for _, e in rg_entries):
+            msg = "CONFLICT_ERROR: The data has been modified by another user. Please reload and try again."
+            results.extend(_entry_result(i, e, False, msg) for i, e in rg_entries)
+            continue
+
+        rules_doc = RewriteRuleDocument(rg_details.get("rewriteRulesInCaller", "") or "")
+        for _, e in rg_entries:
+            rules_doc.add_reals(e["virtual_key"], _normalize_new_reals(e["new_reals"]))
+
+        payload = dict(rg_details)
+        payload["rewriteRulesInCaller"] = rules_doc.to_string()
+        _, error_msg_api = call_api(base_url, "ModifyGatewayRouting", payload, server_name_for_log=server_name)
+        snapshot_cache.invalidate_server(base_url, snapshot_cache.ROUTING)
+        if error_msg_api:
+            msg = f"Failed to update Routing Gateway '{rg_name}' on {server_name}: {error_msg_api}"
+            results.extend(_entry_result(i, e, False, msg) for i, e in rg_entries)
+            continue
+
+        for i, e in rg_entries:
+            total = len(rules_doc.get_reals(e["virtual_key"]))
+            results.append(_entry_result(i, e, True, f"Added numbers to rule '{e['virtual_key']}' in RG '{rg_name}'. New total: {total}."))
+    return results
+
+
+def add_real_numbers_bulk_backend(server_list: List[dict], entries: List[dict]) -> List[dict]:
+    """
+    Bulk variant of add_real_numbers_to_rule_backend.
+    Each entry is {"server_name", "rg_name", "virtual_key", "new_reals", "initial_hash"?}.
+    Entries are grouped per server and RG so each RG is read, parsed and written once.
+    Returns one result dict per entry, in input order.
+    """
+    servers_by_name = {s["name"]: s for s in server_list or []}
+    results: List[dict] = []
+    entries_by_server: Dict[str, List[Tuple[int, dict]]] = {}
+
+    for i, e in enumerate(entries or []):
+        if not isinstance(e, dict) or not all(isinstance(e.get(f), str) and e.get(f) for f in ("server_name", "rg_name", "virtual_key")):
+            results.append(_entry_result(i, e if isinstance(e, dict) else {}, False, "Invalid entry: 'server_name', 'rg_name' and 'virtual_key' must be non-empty strings."))
+        elif not _reals_are_strings(e.get("new_reals") or []):
+            results.append(_entry_result(i, e, False, "'new_reals' must be a list of strings."))
+        elif not [x for x in e.get("new_reals") or [] if x.strip()]:
+            results.append(_entry_result(i, e, False, "The list of real numbers to add cannot be empty."))
+        elif e["server_name"] not in servers_by_name:
+            results.append(_entry_result(i, e, False, f"Server '{e['server_name']}' not found in config."))
+        else:
+            entries_by_server.setdefault(e["server_name"], []).append((i, e))
+
+    if entries_by_server:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(entries_by_server)) as executor:
+            future_to_server = {
+                executor.submit(_add_real_numbers_bulk_on_server, servers_by_name[name], server_entries): (name, server_entries)
+                for name, server_entries in entries_by_server.items()
+            }
+            for future in concurrent.futures.as_completed(future_to_server):
+                server_name, server_entries = future_to_server[future]
+                try:
+                    results.extend(future.result())
+                except Exception as exc:
+                    msg = f"Error during bulk add on {server_name}: {exc}"
+                    results.extend(_entry_result(i, e, False, msg) for i, e in server_entries)
+
+    return sorted(results, key=lambda r: r["index"])
+
+
 def find_rewrite_rule_keys_globally_backend(search_key_term_str: str) -> Tuple[List[dict], Optional[str]]:
     if not search_key_term_str:
         return [], "Search term for rewrite rule keys cannot be empty."
@@ -319,8 +426,33 @@ def fetch_routings_for_server_backend(server_url: str, server_name: str) -> Tupl
     return api_data.get("infoGatewayRoutings", []) or [], None
 
 
-def identify_rgs_for_cleanup_backend(server_url: str, server_name: str, numbers_to_check_set: Set[str]) -> Tuple[Optional[List[dict]], Optional[str]]:
+def _is_to_rg(rg_name: str) -> bool:
+    rg_name_lower = rg_name.lower()
+    return ("to" in rg_name_lower or "to-" in rg_name_lower or "to_" in rg_name_lower)
+
+
+def _rg_strings(rg: dict) -> RgStrings:
+    return (
+        rg.get("callinCallerPrefixes", "") or "",
+        rg.get("callinCalleePrefixes", "") or "",
+        rg.get("rewriteRulesInCaller", "") or "",
+    )
+
+
+def identify_rgs_for_cleanup_backend(
+    server_url: str,
+    server_name: str,
+    numbers_to_check_set: Set[str] | CompactNumberSet,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """
+    Find RGs whose caller/callee prefixes or rewrite rules contain any number of the check set.
+    Matching runs over the raw strings through a CompactNumberSet; the rules string is only parsed
+    for RGs that pass a token pre-filter, and per-RG lists are only materialized for identified RGs.
+    Large servers are matched in the process pool (see parse_pool).
+    """
     identified: List[dict] = []
+    check = as_compact_number_set(numbers_to_check_set)
     all_routings, error_fetch = fetch_routings_for_server_backend(server_url, server_name)
 
     if error_fetch:
@@ -330,55 +462,38 @@ def identify_rgs_for_cleanup_backend(server_url: str, server_name: str, numbers_
     if not all_routings:
         return [], None
 
-    for rg in all_routings:
-        rg_name = rg.get("name", f"Unnamed_RG_Cleanup_{server_name}")
-        rg_name_lower = rg_name.lower()
-        is_to_rg = ("to" in rg_name_lower or "to-" in rg_name_lower or "to_" in rg_name_lower)
-
-        callin_caller_str = rg.get("callinCallerPrefixes", "") or ""
-        caller_list = [p.strip() for p in callin_caller_str.split(",") if p.strip()]
-        common_in_caller = sorted(list(set(caller_list) & numbers_to_check_set))
-
-        callin_callee_str = rg.get("callinCalleePrefixes", "") or ""
-        callee_list = [p.strip() for p in callin_callee_str.split(",") if p.strip()]
-        common_in_callee = sorted(list(set(callee_list) & numbers_to_check_set)) if is_to_rg else []
-
-        rewrite_str = rg.get("rewriteRulesInCaller", "") or ""
-        parsed_rules = parse_vos_rewrite_rules(rewrite_str)
-
-        common_virtual_keys = sorted([
-            vk for vk in parsed_rules if vk in numbers_to_check_set and is_six_digit_virtual_number_candidate(vk)
-        ])
-
-        common_real_values_map: Dict[str, List[str]] = {}
-        for vk_map, rv_list_map in parsed_rules.items():
-            actual_reals = [r for r in rv_list_map if r.lower() != "hetso"]
-            common_rv = sorted(list(set(actual_reals) & numbers_to_check_set))
-            if common_rv:
-                common_real_values_map[vk_map] = common_rv
-
-        if common_in_caller or common_in_callee or common_virtual_keys or bool(common_real_values_map):
-            identified.append({
-                "type": "RG",
-                "server_url": server_url,
-                "server_name": server_name,
-                "name": rg_name,
-                "is_to_rg": is_to_rg,
-                "original_callin_caller_prefixes_list": caller_list,
-                "common_in_callin_caller": common_in_caller,
-                "original_callin_callee_prefixes_list": callee_list,
-                "common_in_callin_callee": common_in_callee,
-                "original_rewrite_str": rewrite_str,
-                "original_rewrite_parsed": parsed_rules,
-                "common_virtual_keys_to_delete": common_virtual_keys,
-                "common_real_values_to_delete_map": common_real_values_map,
-                "raw_rg_info": rg,
-            })
+    rg_names = [rg.get("name", f"Unnamed_RG_Cleanup_{server_name}") for rg in all_routings]
+    is_to_flags = [_is_to_rg(name) for name in rg_names]
+    rg_strings = [_rg_strings(rg) for rg in all_routings]
+    matches = match_rgs_for_cleanup(rg_strings, is_to_flags, check, progress_callback)
+
+    for rg, rg_name, is_to_rg, strings, match in zip(all_routings, rg_names, is_to_flags, rg_strings, matches):
+        if match is None:
+            continue
+        callin_caller_str, callin_callee_str, rewrite_str = strings
+        common_in_caller, common_in_callee, common_virtual_keys, common_real_values_map, parsed_rules = match
+        identified.append({
+            "type": "RG",
+            "server_url": server_url,
+            "server_name": server_name,
+            "name": rg_name,
+            "is_to_rg": is_to_rg,
+            "original_callin_caller_prefixes_list": [p.strip() for p in callin_caller_str.split(",") if p.strip()],
+            "common_in_callin_caller": common_in_caller,
+            "original_callin_callee_prefixes_list": [p.strip() for p in callin_callee_str.split(",") if p.strip()],
+            "common_in_callin_callee": common_in_callee,
+            "original_rewrite_str": rewrite_str,
+            "original_rewrite_parsed": parsed_rules if parsed_rules is not None else parse_vos_rewrite_rules(rewrite_str),
+            "common_virtual_keys_to_delete": common_virtual_keys,
+            "common_real_values_to_delete_map": common_real_values_map,
+            "raw_rg_info": rg,
+        })
     return identified, None
 
 
 def apply_rg_update_for_cleanup_backend(server_url: str, server_name: str, rg_name: str, updated_rg_data_payload: dict) -> Tuple[bool, str]:
     _, error_msg = call_api(server_url, "ModifyGatewayRouting", updated_rg_data_payload, server_name_for_log=server_name)
+    snapshot_cache.invalidate_server(server_url, snapshot_cache.ROUTING)
     if error_msg:
         return False, f"Error updating Routing Gateway '{rg_name}' on {server_name} for cleanup: {error_msg}"
     new_prefixes_count = len([p for p in (updated_rg_data_payload.get('callinCallerPrefixes') or '').split(',') if p.strip()])
@@ -388,69 +503,108 @@ def apply_rg_update_for_cleanup_backend(server_url: str, server_name: str, rg_na
 # ------------------------------
 # Linked Customers via MG (Backend only)
 # ------------------------------
-def find_customers_linked_to_virtual_number_backend(virtual_number_key_str: str) -> Tuple[Optional[List[dict]], Optional[str]]:
-    if not virtual_number_key_str:
-        return None, "Virtual number key cannot be empty."
-
-    linked_customers: List[dict] = []
-    processed_pairs: Set[Tuple[str, str]] = set()  # (account, server_url)
-    error_messages: List[str] = []
-    active_servers_list = config.VOS_SERVERS
-
-    for server_info_mg in active_servers_list:
-        server_url_mg = server_info_mg["url"]
-        server_name_mg = server_info_mg["name"]
-
-        mg_list_api_data, mg_list_error = call_api(server_url_mg, "GetGatewayMapping", {}, timeout=20, server_name_for_log=server_name_mg)
-        if mg_list_error:
-            error_messages.append(f"Could not fetch MGs from {server_name_mg} for VN link check: {mg_list_error}")
-            continue
-        if not mg_list_api_data or not mg_list_api_data.get("infoGatewayMappings"):
+def _collect_linked_customers_on_server(
+    server_info: dict,
+    vn_keys: Set[str],
+    vn_range: Optional[Tuple[str, str]],
+) -> Tuple[List[dict], List[str]]:
+    """
+    One server of the linked-customer fan-out: one GetGatewayMapping to collect candidate
+    (virtual number, MG account) pairs, then batched GetCustomer calls to confirm them.
+    """
+    server_url_mg, server_name_mg = server_info["url"], server_info["name"]
+    errors: List[str] = []
+
+    mg_list_api_data, mg_list_error = call_api(server_url_mg, "GetGatewayMapping", {}, timeout=20, server_name_for_log=server_name_mg)
+    if mg_list_error:
+        return [], [f"Could not fetch MGs from {server_name_mg} for VN link check: {mg_list_error}"]
+    if not mg_list_api_data or not mg_list_api_data.get("infoGatewayMappings"):
+        return [], []
+
+    candidates: List[Tuple[str, dict]] = []
+    processed: Set[Tuple[str, str]] = set()  # (virtual number, account)
+    for mg_item in mg_list_api_data.get("infoGatewayMappings", []) or []:
+        mg_account = mg_item.get("account")
+        if not (mg_account and mg_item.get("accountName")):
             continue
+        for p in (mg_item.get("calloutCallerPrefixes", "") or "").split(","):
+            vn = p.strip()
+            if not vn:
+                continue
+            in_range = vn_range is not None and is_six_digit_virtual_number_candidate(vn) and vn_range[0] <= vn <= vn_range[1]
+            if (vn in vn_keys or in_range) and (vn, mg_account) not in processed:
+                processed.add((vn, mg_account))
+                candidates.append((vn, mg_item))
+
+    if not candidates:
+        return [], errors
+
+    customers_by_account, cust_err = get_raw_customer_details_batch(server_url_mg, server_name_mg, [mg["account"] for _, mg in candidates])
+    if cust_err:
+        errors.append(f"Error fetching details for potential customers on {server_name_mg} (for VN link): {cust_err}")
+
+    linked: List[dict] = []
+    for vn, mg_item in candidates:
+        customer_raw = customers_by_account.get(mg_item["account"])
+        if customer_raw and str(customer_raw.get("name", "")).lower() == str(mg_item["accountName"]).lower():
+            linked.append({
+                "virtual_number": vn,
+                "account_id": customer_raw.get("account"),
+                "customer_name_on_vos": customer_raw.get("name"),
+                "customer_name_in_mg": mg_item["accountName"],
+                "server_name": server_name_mg,
+                "server_url": server_url_mg,
+                "linked_via_mg_name": mg_item.get("name"),
+            })
+    return linked, errors
 
-        for mg_item in mg_list_api_data.get("infoGatewayMappings", []) or []:
-            prefixes_str = mg_item.get("calloutCallerPrefixes", "") or ""
-            if virtual_number_key_str in {p.strip() for p in prefixes_str.split(",") if p.strip()}:
-
-                mg_account = mg_item.get("account")
-                mg_account_name = mg_item.get("accountName")
 
-                if not (mg_account and mg_account_name):
-                    continue
+def find_customers_linked_to_virtual_numbers_backend(
+    virtual_number_keys: List[str],
+    vn_range: Optional[Tuple[str, str]] = None,
+) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """
+    Find customers linked (via MG calloutCallerPrefixes) to any of the given virtual numbers,
+    or to any six-digit key in the inclusive vn_range (start, end), given as zero-padded six-digit
+    strings so that string order matches numeric order. Servers are scanned in parallel.
+    """
+    vn_keys = {k.strip() for k in virtual_number_keys or [] if k and k.strip()}
+    if not vn_keys and not vn_range:
+        return None, "Virtual number key cannot be empty."
 
-                pair_key = (mg_account, server_url_mg)
-                if pair_key in processed_pairs:
-                    continue
-                processed_pairs.add(pair_key)
+    active_servers_list = config.VOS_SERVERS
+    if not active_servers_list:
+        return [], None
 
-                try:
-                    # late import to avoid circular deps
-                    from customer_management import get_raw_customer_details
-                    customer_raw, cust_err = get_raw_customer_details(server_url_mg, server_name_mg, mg_account)
-                except Exception as import_exc:  # pragma: no cover
-                    error_messages.append(f"Critical: Could not import customer_management_backend for VN link check: {import_exc}")
-                    continue
-
-                if cust_err:
-                    error_messages.append(f"Error fetching details for potential customer {mg_account} on {server_name_mg} (for VN link): {cust_err}")
-                    continue
-
-                if customer_raw and str(customer_raw.get("name", "")).lower() == str(mg_account_name).lower():
-                    linked_customers.append({
-                        "account_id": customer_raw.get("account"),
-                        "customer_name_on_vos": customer_raw.get("name"),
-                        "customer_name_in_mg": mg_account_name,
-                        "server_name": server_name_mg,
-                        "server_url": server_url_mg,
-                        "linked_via_mg_name": mg_item.get("name"),
-                    })
+    linked_customers: List[dict] = []
+    error_messages: List[str] = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(active_servers_list)) as executor:
+        future_to_server = {
+            executor.submit(_collect_linked_customers_on_server, server_info, vn_keys, vn_range): server_info
+            for server_info in active_servers_list
+        }
+        for future in concurrent.futures.as_completed(future_to_server):
+            try:
+                linked, errors = future.result()
+                linked_customers.extend(linked)
+                error_messages.extend(errors)
+            except Exception as exc:
+                server_name = future_to_server[future]["name"]
+                error_messages.append(f"Error during VN link check on {server_name}: {exc}")
 
+    linked_customers.sort(key=lambda x: (x["virtual_number"], x["server_name"], x["account_id"] or ""))
     final_error = "; ".join(error_messages) if error_messages else None
     if not linked_customers and final_error:
         return None, final_error
     return linked_customers, final_error
 
 
+def find_customers_linked_to_virtual_number_backend(virtual_number_key_str: str) -> Tuple[Optional[List[dict]], Optional[str]]:
+    if not virtual_number_key_str:
+        return None, "Virtual number key cannot be empty."
+    return find_customers_linked_to_virtual_numbers_backend([virtual_number_key_str])
+
+
 def get_vn_status_in_specific_rg(server_info: dict, rg_name: str, virtual_number: str) -> Tuple[Optional[dict], Optional[str]]:
     """
     Optimized check: a single virtual number inside a single RG on a given server.
@@ -475,37 +629,176 @@ def get_vn_status_in_specific_rg(server_info: dict, rg_name: str, virtual_number
     return None, f"Virtual number '{virtual_number}' not found in RG '{rg_name}'."
 
 
+def _vn_definition(server_name: str, rg_name: str, vn: str, reals: List[str]) -> dict:
+    is_hetso = reals == ["hetso"]
+    return {
+        "server_name": server_name,
+        "rg_name": rg_name,
+        "vn": vn,
+        "real_numbers_count": 0 if is_hetso else len(reals),
+        "is_hetso": is_hetso,
+    }
+
+
+def _vn_status_for_item(snapshot: snapshot_cache.GatewaySnapshot, rg_name: str, vn: str) -> dict:
+    rg = snapshot.get(rg_name)
+    if rg is None:
+        return {"server_name": snapshot.server_name, "rg_name": rg_name, "vn": vn, "found": False,
+                "error": f"Routing Gateway '{rg_name}' not found on server {snapshot.server_name}."}
+    parsed = parse_rewrite_rules_cached(rg.get("rewriteRulesInCaller", "") or "")
+    reals = parsed.rules.get(vn)
+    if reals is None:
+        return {"server_name": snapshot.server_name, "rg_name": rg_name, "vn": vn, "found": False,
+                "error": f"Virtual number '{vn}' not found in RG '{rg_name}'."}
+    return {**_vn_definition(snapshot.server_name, rg_name, vn, reals), "found": True}
+
+
+def _vn_status_for_range(snapshot: snapshot_cache.GatewaySnapshot, rng: dict, limit: int) -> dict:
+    start, end, rg_name = str(rng["start"]).strip(), str(rng["end"]).strip(), rng.get("rg_name")
+    result = {"server_name": snapshot.server_name, "rg_name": rg_name, "start": start, "end": end, "definitions": [], "truncated": False}
+    rgs = [snapshot.get(rg_name)] if rg_name else snapshot.gateways
+    if rgs == [None]:
+        result["error"] = f"Routing Gateway '{rg_name}' not found on server {snapshot.server_name}."
+        return result
+    definitions: List[dict] = result["definitions"]
+    for rg in rgs:
+        parsed = parse_rewrite_rules_cached(rg.get("rewriteRulesInCaller", "") or "")
+        for vn in parsed.keys_between(start, end):
+            if not is_six_digit_virtual_number_candidate(vn):
+                continue
+            if len(definitions) >= limit:
+                result["truncated"] = True
+                break
+            definitions.append(_vn_definition(snapshot.server_name, rg.get("name"), vn, parsed.rules[vn]))
+        if result["truncated"]:
+            break
+    definitions.sort(key=lambda d: (d["vn"], d["rg_name"] or ""))
+    return result
+
+
+def get_vn_status_batch_backend(
+    server_list: List[dict],
+    items: List[dict],
+    ranges: Optional[List[dict]] = None,
+    max_age: Optional[float] = None,
+) -> dict:
+    """
+    Batch form of get_vn_status_in_specific_rg, answered from RG snapshots and the parsed-rule cache.
+    items:  [{"server_name", "rg_name", "vn"}, ...] -> one status per item, in input order.
+    ranges: [{"server_name", "start", "end", "rg_name"?, "limit"?}, ...] -> every six-digit key in
+            [start, end] on that server (or RG), up to limit (default config.VN_STATUS_RANGE_LIMIT).
+    Each server's RG list is downloaded at most once, and not at all while its snapshot is fresh.
+    """
+    ranges = ranges or []
+    servers_by_name = {s["name"]: s for s in server_list or []}
+    wanted = {q.get("server_name") for q in [*items, *ranges] if isinstance(q.get("server_name"), str)} & set(servers_by_name)
+
+    snapshots: Dict[str, Tuple[Optional[snapshot_cache.GatewaySnapshot], Optional[str]]] = {}
+    if wanted:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(wanted)) as executor:
+            future_to_name = {
+                executor.submit(snapshot_cache.get_gateway_snapshot, servers_by_name[name], snapshot_cache.ROUTING, max_age): name
+                for name in wanted
+            }
+            for future in concurrent.futures.as_completed(future_to_name):
+                try:
+                    snapshots[future_to_name[future]] = future.result()
+                except Exception as exc:
+                    snapshots[future_to_name[future]] = (None, str(exc))
+
+    def _snapshot_or_error(query: dict) -> Tuple[Optional[snapshot_cache.GatewaySnapshot], Optional[str]]:
+        name = query.get("server_name")
+        if not isinstance(name, str) or name not in servers_by_name:
+            return None, f"Server '{name}' not found in config."
+        snapshot, err = snapshots[name]
+        if err or snapshot is None:
+            return None, f"Could not fetch RGs from {name}: {err or 'no data'}"
+        return snapshot, None
+
+    results: List[dict] = []
+    for q in items:
+        if not all(isinstance(q.get(f), str) and q.get(f).strip() for f in ("server_name", "rg_name", "vn")):
+            results.append({**q, "found": False, "error": "Each item requires 'server_name', 'rg_name' and 'vn' as non-empty strings."})
+            continue
+        rg_name, vn = q["rg_name"], q["vn"].strip()
+        snapshot, err = _snapshot_or_error(q)
+        results.append({**q, "found": False, "error": err} if err else _vn_status_for_item(snapshot, rg_name, vn))
+
+    range_results: List[dict] = []
+    for rng in ranges:
+        if not (is_six_digit_virtual_number_candidate(rng.get("start")) and is_six_digit_virtual_number_candidate(rng.get("end"))):
+            range_results.append({**rng, "definitions": [], "error": "'start' and 'end' must be six-digit virtual numbers."})
+            continue
+        if not isinstance(rng.get("server_name"), str) or not isinstance(rng.get("rg_name") or "", str):
+            range_results.append({**rng, "definitions": [], "error": "'server_name' and 'rg_name' must be strings."})
+            continue
+        limit = rng.get("limit")
+        if limit is None:
+            limit = config.VN_STATUS_RANGE_LIMIT
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+            range_results.append({**rng, "definitions": [], "error": "'limit' must be a positive integer."})
+            continue
+        snapshot, err = _snapshot_or_error(rng)
+        if err:
+            range_results.append({**rng, "definitions": [], "error": err})
+            continue
+        range_results.append(_vn_status_for_range(snapshot, rng, limit))
+
+    return {
+        "results": results,
+        "ranges": range_results,
+        "snapshots": {
+            name: {"version": snap.version, "age": round(snap.age, 3)}
+            for name, (snap, _) in sorted(snapshots.items()) if snap is not None
+        },
+    }
+
+
 # ------------------------------
 # Discovery / Number Search (parallel)
 # ------------------------------
-def _scan_server_for_cleanup(server_info: dict, numbers_to_check_set: Set[str]) -> List[dict]:
+def _scan_server_for_cleanup(
+    server_info: dict,
+    numbers_to_check_set: Set[str] | CompactNumberSet,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> List[dict]:
     """Scan both MG and RG on one server to find candidates for cleanup. Returns a flat list of findings."""
     s_url, s_name = server_info["url"], server_info["name"]
     found_items: List[dict] = []
 
-    mg_items, err_mg = identify_mg_for_cleanup_backend(s_url, s_name, numbers_to_check_set)
-    if mg_items:
-        found_items.extend(mg_items)
-    if err_mg:
-        found_items.append({"_error": f"Cleanup Scan Error (MG) on {s_name}: {err_mg}", "server_name": s_name, "type": "MG"})
+    with tracing.span("scan.cleanup.server", server=s_name) as server_span:
+        mg_items, err_mg = identify_mg_for_cleanup_backend(s_url, s_name, numbers_to_check_set, progress_callback)
+        if mg_items:
+            found_items.extend(mg_items)
+        if err_mg:
+            found_items.append({"_error": f"Cleanup Scan Error (MG) on {s_name}: {err_mg}", "server_name": s_name, "type": "MG"})
 
-    rg_items, err_rg = identify_rgs_for_cleanup_backend(s_url, s_name, numbers_to_check_set)
-    if rg_items:
-        found_items.extend(rg_items)
-    if err_rg:
-        found_items.append({"_error": f"Cleanup Scan Error (RG) on {s_name}: {err_rg}", "server_name": s_name, "type": "RG"})
+        rg_items, err_rg = identify_rgs_for_cleanup_backend(s_url, s_name, numbers_to_check_set, progress_callback)
+        if rg_items:
+            found_items.extend(rg_items)
+        if err_rg:
+            found_items.append({"_error": f"Cleanup Scan Error (RG) on {s_name}: {err_rg}", "server_name": s_name, "type": "RG"})
+        server_span.set(findings=len(found_items))
 
     return found_items
 
 
-def identify_gateways_for_cleanup_parallel(server_list: List[dict], numbers_to_check_set: Set[str]) -> List[dict]:
-    """Run cleanup scan across all servers in parallel."""
+def identify_gateways_for_cleanup_parallel(
+    server_list: List[dict],
+    numbers_to_check_set: Set[str] | CompactNumberSet,
+    progress_callback: Optional[Callable[..., None]] = None,
+) -> List[dict]:
+    """
+    Run cleanup scan across all servers in parallel.
+    progress_callback, if given, receives servers_done=1 per finished server and gateways_processed=1 per gateway.
+    """
     if not server_list:
         return []
+    numbers_to_check_set = as_compact_number_set(numbers_to_check_set)
     all_found_items: List[dict] = []
     with concurrent.futures.ThreadPoolExecutor(max_workers=len(server_list)) as executor:
         future_to_server = {
-            executor.submit(_scan_server_for_cleanup, server_info, numbers_to_check_set): server_info
+            executor.submit(tracing.bind_context(_scan_server_for_cleanup), server_info, numbers_to_check_set, progress_callback): server_info
             for server_info in server_list
         }
         for future in concurrent.futures.as_completed(future_to_server):
@@ -516,103 +809,89 @@ def identify_gateways_for_cleanup_parallel(server_list: List[dict], numbers_to_c
             except Exception as exc:
                 server_name = future_to_server[future]['name']
                 all_found_items.append({"_error": f"Error during parallel cleanup scan for {server_name}: {exc}", "server_name": server_name})
+            if progress_callback:
+                progress_callback(servers_done=1)
     return all_found_items
 
 
-def _scan_server_for_number_info(server_info: dict, all_variants: Set[str], original_inputs: List[str]) -> List[dict]:
-    s_url, s_name = server_info["url"], server_info["name"]
-    findings: List[dict] = []
+def _origins_for(matched_variants, variant_origins: Dict[str, Set[str]]) -> str:
+    origins: Set[str] = set()
+    for var in matched_variants:
+        origins |= variant_origins.get(var, set())
+    return ", ".join(sorted(origins))
 
-    # MG scan
-    mg_list, _ = get_all_mapping_gateways(server_info, "")
-    if mg_list:
-        for mg in mg_list:
-            prefixes = {p.strip() for p in (mg.get("calloutCallerPrefixes") or "").split(',') if p.strip()}
-            matched = all_variants.intersection(prefixes)
-            if matched:
-                findings.append({
-                    "Server": s_name,
-                    "Type": "MG",
-                    "Gateway Name": mg.get("name"),
-                    "Field": "CalloutCallerPrefixes",
-                    "Found Values": ", ".join(sorted(list(matched))),
-                    "Matching Original Inputs": ", ".join(sorted(list(set(orig for var in matched for orig in original_inputs if var in generate_search_variants(orig))))),
-                    "Rewrite Key Context": "N/A",
-                })
 
-    # RG scan
-    rg_list, _ = get_all_routing_gateways(server_info, "")
-    if rg_list:
-        for rg in rg_list:
-            rg_name = rg.get("name")
-
-            # CallinCallerPrefixes
-            caller_prefixes = {p.strip() for p in (rg.get("callinCallerPrefixes") or "").split(',') if p.strip()}
-            matched_caller = all_variants.intersection(caller_prefixes)
-            if matched_caller:
-                findings.append({
-                    "Server": s_name,
-                    "Type": "RG",
-                    "Gateway Name": rg_name,
-                    "Field": "CallinCallerPrefixes",
-                    "Found Values": ", ".join(sorted(list(matched_caller))),
-                    "Matching Original Inputs": ", ".join(sorted(list(set(orig for var in matched_caller for orig in original_inputs if var in generate_search_variants(orig))))),
-                    "Rewrite Key Context": "N/A",
-                })
-
-            # CallinCalleePrefixes
-            callee_prefixes = {p.strip() for p in (rg.get("callinCalleePrefixes") or "").split(',') if p.strip()}
-            matched_callee = all_variants.intersection(callee_prefixes)
-            if matched_callee:
-                findings.append({
-                    "Server": s_name,
-                    "Type": "RG",
-                    "Gateway Name": rg_name,
-                    "Field": "CallinCalleePrefixes",
-                    "Found Values": ", ".join(sorted(list(matched_callee))),
-                    "Matching Original Inputs": ", ".join(sorted(list(set(orig for var in matched_callee for orig in original_inputs if var in generate_search_variants(orig))))),
-                    "Rewrite Key Context": "N/A",
-                })
+def _scan_server_for_number_info(
+    server_info: dict,
+    all_variants: Set[str] | CompactNumberSet,
+    original_inputs: List[str],
+    variant_origins: Optional[Dict[str, Set[str]]] = None,
+) -> List[dict]:
+    if variant_origins is None:
+        variant_origins = build_variant_origin_map(original_inputs)
+    s_url, s_name = server_info["url"], server_info["name"]
+    variants = as_compact_number_set(all_variants)
+    findings: List[dict] = []
 
-            # RewriteRules
-            rules_str = rg.get("rewriteRulesInCaller", "") or ""
-            if rules_str:
-                parsed_rules = parse_vos_rewrite_rules(rules_str)
-                for key, reals in parsed_rules.items():
-                    if key in all_variants:
+    with tracing.span("scan.number_info.server", server=s_name) as server_span:
+        # MG scan
+        mg_list, _ = get_all_mapping_gateways(server_info, "")
+        if mg_list:
+            with tracing.span("intersect.mg", gateways=len(mg_list)):
+                for mg in mg_list:
+                    matched = variants.intersect_csv(mg.get("calloutCallerPrefixes") or "")
+                    if matched:
                         findings.append({
                             "Server": s_name,
-                            "Type": "RG",
-                            "Gateway Name": rg_name,
-                            "Field": "RewriteRule (Key)",
-                            "Found Values": key,
-                            "Matching Original Inputs": ", ".join(sorted(list(set(orig for var in {key} for orig in original_inputs if var in generate_search_variants(orig))))),
-                            "Rewrite Key Context": key,
+                            "Type": "MG",
+                            "Gateway Name": mg.get("name"),
+                            "Field": "CalloutCallerPrefixes",
+                            "Found Values": ", ".join(matched),
+                            "Matching Original Inputs": _origins_for(matched, variant_origins),
+                            "Rewrite Key Context": "N/A",
                         })
 
-                    reals_set = {r.strip() for r in reals if r.strip().lower() != "hetso"}
-                    matched_reals = all_variants.intersection(reals_set)
-                    if matched_reals:
-                        findings.append({
-                            "Server": s_name,
-                            "Type": "RG",
-                            "Gateway Name": rg_name,
-                            "Field": "RewriteRule (Real Numbers)",
-                            "Found Values": ", ".join(sorted(list(matched_reals))),
-                            "Matching Original Inputs": ", ".join(sorted(list(set(orig for var in matched_reals for orig in original_inputs if var in generate_search_variants(orig))))),
-                            "Rewrite Key Context": key,
-                        })
+        # RG scan (parse/match may run in the process pool for large servers)
+        rg_list, _ = get_all_routing_gateways(server_info, "")
+        if rg_list:
+            rg_matches = match_rgs_for_number_info([_rg_strings(rg) for rg in rg_list], variants)
+            for rg, matches in zip(rg_list, rg_matches):
+                for field, matched, key_context in matches:
+                    findings.append({
+                        "Server": s_name,
+                        "Type": "RG",
+                        "Gateway Name": rg.get("name"),
+                        "Field": field,
+                        "Found Values": ", ".join(matched),
+                        "Matching Original Inputs": _origins_for(matched, variant_origins),
+                        "Rewrite Key Context": key_context,
+                    })
+        server_span.set(findings=len(findings))
     return findings
 
 
-def find_number_info_parallel(server_list: List[dict], all_variants: Set[str], original_inputs: List[str]) -> List[dict]:
-    """Parallel search of MG/RG across servers for number-related occurrences."""
+def find_number_info_parallel(
+    server_list: List[dict],
+    all_variants: Set[str] | CompactNumberSet,
+    original_inputs: List[str],
+    progress_callback: Optional[Callable[..., None]] = None,
+    variant_origins: Optional[Dict[str, Set[str]]] = None,
+) -> List[dict]:
+    """
+    Parallel search of MG/RG across servers for number-related occurrences.
+    progress_callback, if given, receives servers_done=1 per finished server.
+    variant_origins (variant -> original inputs) is built once here when not supplied
+    and shared by every server scan.
+    """
     if not server_list:
         return []
+    if variant_origins is None:
+        variant_origins = build_variant_origin_map(original_inputs)
+    all_variants = as_compact_number_set(all_variants)
     all_findings: List[dict] = []
     with concurrent.futures.ThreadPoolExecutor(max_workers=len(server_list)) as executor:
         future_to_server = {
-            executor.submit(_scan_server_for_number_info, server, all_variants, original_inputs): server
+            executor.submit(tracing.bind_context(_scan_server_for_number_info), server, all_variants, original_inputs, variant_origins): server
             for server in server_list
         }
         for future in concurrent.futures.as_completed(future_to_server):
@@ -623,4 +902,6 @@ def find_number_info_parallel(server_list: List[dict], all_variants: Set[str], o
             except Exception as exc:
                 server_name = future_to_server[future]['name']
                 all_findings.append({"_error": f"Error during parallel number search for {server_name}: {exc}", "server_name": server_name})
+            if progress_callback:
+                progress_callback(servers_done=1)
     return all_findings
\ No newline at end of file
@@ -0,0 +1,124 @@
+# backend/snapshot_cache.py
+# Short-lived, per-server snapshots of the full gateway lists (GetGatewayRouting / GetGatewayMapping).
+# Read-heavy features (registries, status lookups) share one download per server instead of
+# re-fetching the whole list for every request. Writes must call invalidate_server().
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import config
+from api_client import call_api  # Must return (data, error_message)
+
+
+ROUTING = "GetGatewayRouting"
+MAPPING = "GetGatewayMapping"
+
+_LIST_KEYS = {
+    ROUTING: "infoGatewayRoutings",
+    MAPPING: "infoGatewayMappings",
+}
+
+
+class GatewaySnapshot:
+    """
+    One downloaded gateway list. `gateways` is shared between readers and must be treated as read-only.
+    `version` increases every time the list for this (server, endpoint) is re-downloaded.
+    """
+
+    __slots__ = ("server_name", "server_url", "endpoint", "gateways", "fetched_at", "version", "_by_name")
+
+    def __init__(self, server_name: str, server_url: str, endpoint: str, gateways: List[dict], version: int):
+        self.server_name = server_name
+        self.server_url = server_url
+        self.endpoint = endpoint
+        self.gateways = gateways
+        self.fetched_at = time.time()
+        self.version = version
+        self._by_name: Optional[Dict[str, dict]] = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def get(self, name: str) -> Optional[dict]:
+        """Gateway by name (the name index is built on first use)."""
+        if self._by_name is None:
+            self._by_name = {gw.get("name"): gw for gw in self.gateways}
+        return self._by_name.get(name)
+
+
+_snapshots: Dict[Tuple[str, str], GatewaySnapshot] = {}
+_versions: Dict[Tuple[str, str], int] = {}
+_generations: Dict[Tuple[str, str], int] = {}  # bumped by invalidate_server(); guards in-flight downloads
+_key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def _lock_for(key: Tuple[str, str]) -> threading.Lock:
+    with _registry_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def get_gateway_snapshot(
+    server_info: dict,
+    endpoint: str,
+    max_age: Optional[float] = None,
+) -> Tuple[Optional[GatewaySnapshot], Optional[str]]:
+    """
+    Return a snapshot of the gateway list for `endpoint` (ROUTING or MAPPING) on one server,
+    re-downloading it when older than max_age (default config.SNAPSHOT_TTL_SECONDS).
+    Concurrent callers for the same server wait for a single download. A download overlapping an
+    invalidate_server() call is returned to its caller but not cached. Returns (snapshot, error).
+    """
+    if endpoint not in _LIST_KEYS:
+        return None, f"Unsupported snapshot endpoint '{endpoint}'."
+    server_url = server_info.get("url")
+    if not server_url:
+        return None, "Error: Server URL not provided."
+    server_name = server_info.get("name", server_url)
+    max_age = config.SNAPSHOT_TTL_SECONDS if max_age is None else max_age
+    key = (server_url, endpoint)
+
+    with _lock_for(key):
+        snapshot = _snapshots.get(key)
+        if snapshot is not None and snapshot.age <= max_age:
+            return snapshot, None
+
+        with _registry_lock:
+            generation = _generations.get(key, 0)
+        api_data, error_msg = call_api(server_url, endpoint, {}, server_name_for_log=server_name)
+        if error_msg:
+            return None, error_msg
+        if not api_data:
+            return None, f"No data returned from API for {endpoint}."
+
+        version = _versions.get(key, 0) + 1
+        _versions[key] = version
+        snapshot = GatewaySnapshot(server_name, server_url, endpoint, api_data.get(_LIST_KEYS[endpoint], []) or [], version)
+        with _registry_lock:
+            # A write invalidated the server while we downloaded: the list may predate it
+            if _generations.get(key, 0) == generation:
+                _snapshots[key] = snapshot
+        return snapshot, None
+
+
+def invalidate_server(server_url: str, endpoint: Optional[str] = None) -> None:
+    """Drop cached snapshots for a server (all endpoints, or only `endpoint`) after a write."""
+    with _registry_lock:
+        for ep in ([endpoint] if endpoint is not None else list(_LIST_KEYS)):
+            key = (server_url, ep)
+            _generations[key] = _generations.get(key, 0) + 1
+            _snapshots.pop(key, None)
+
+
+def get_invalidation_generation(server_url: str, endpoint: str) -> int:
+    """Number of invalidate_server() calls so far covering (server, endpoint); lets derived caches detect writes."""
+    with _registry_lock:
+        return _generations.get((server_url, endpoint), 0)
+
+
+def get_snapshot_version(server_url: str, endpoint: str) -> int:
+    """Number of downloads so far for (server, endpoint); 0 if never fetched."""
+    return _versions.get((server_url, endpoint), 0)
@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+# Backend modules import each other by bare name (they run from backend/), so put backend/ on sys.path.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,76 @@
+# backend/tests/test_phone_numbers.py
+# The table-driven classifier in utils.py must behave exactly like the original implementation
+# (tests/legacy_phone_numbers.py), for single numbers and for the batch APIs.
+import random
+
+import pytest
+
+import utils
+import legacy_phone_numbers as legacy
+
+
+VINA = ["91", "94", "88", "81", "82", "83", "84", "85"]
+OTHER_MOBILE = ["90", "96", "97", "98", "32", "70", "77", "86", "89", "99"]
+LANDLINE = ["20", "24", "28", "29", "2", "30"]
+
+REPRESENTATIVE = [
+    # Vinaphone in every trunk form
+    "0912345678", "84912345678", "912345678", "0841234567", "84841234567", "841234567",
+    "0881234567", "84881234567", "881234567", "0851234567",
+    # Landlines
+    "02412345678", "0241234567", "842412345678", "84241234567", "0201234567", "8420123456",
+    "0301234567", "02", "842",
+    # Other mobiles and near misses
+    "0901234567", "0321234567", "84901234567", "901234567", "09123456789", "091234567",
+    "91234567", "9123456789",
+    # Formatting, unicode and odd inputs
+    "+84 91 234 5678", "(024) 1234-5678", "091.234.5678", " 0912345678 ", "０９１２３４５６７８",
+    "٠٩١٢٣٤٥٦٧٨", "abc", "", "0", "84", "8", "00", "0084912345678", "840912345678",
+    912345678, 84912345678, None,
+]
+
+
+def _generated_inputs():
+    """Every trunk prefix x national prefix x subscriber length around the valid ones."""
+    out = []
+    for trunk in ("", "0", "84", "840", "00"):
+        for national in VINA + OTHER_MOBILE + LANDLINE:
+            for subscriber_len in range(5, 10):
+                out.append(trunk + national + "1234567890"[:subscriber_len])
+    rng = random.Random(32)
+    for _ in range(3000):
+        out.append("".join(rng.choice("0123456789") for _ in range(rng.randint(0, 13))))
+    return out
+
+
+ALL_INPUTS = REPRESENTATIVE + _generated_inputs()
+
+
+@pytest.mark.parametrize("number", REPRESENTATIVE, ids=repr)
+def test_representative_inputs_match_legacy(number):
+    assert utils.classify_phone_number(number) == legacy.classify_phone_number(number)
+    assert utils.transform_real_number_for_vos_storage(number) == legacy.transform_real_number_for_vos_storage(number)
+    assert utils.generate_search_variants(number) == legacy.generate_search_variants(number)
+
+
+def test_generated_inputs_match_legacy():
+    for number in ALL_INPUTS:
+        assert utils.classify_phone_number(number) == legacy.classify_phone_number(number), number
+        assert utils.transform_real_number_for_vos_storage(number) == legacy.transform_real_number_for_vos_storage(number), number
+        assert utils.generate_search_variants(number) == legacy.generate_search_variants(number), number
+
+
+def test_batch_apis_match_single_number_legacy():
+    numbers = ALL_INPUTS + ALL_INPUTS[:200]  # repeats exercise the per-call memo
+    assert utils.classify_phone_numbers_batch(numbers) == [legacy.classify_phone_number(n) for n in numbers]
+    assert utils.transform_real_numbers_for_vos_storage_batch(numbers) == [legacy.transform_real_number_for_vos_storage(n) for n in numbers]
+    assert utils.generate_search_variants_batch(numbers) == [legacy.generate_search_variants(n) for n in numbers]
+
+
+def test_variant_origin_map():
+    inputs = ["0912345678", "912345678", "02412345678"]
+    origins = utils.build_variant_origin_map(inputs)
+    for orig in inputs:
+        for variant in legacy.generate_search_variants(orig):
+            assert orig in origins[variant]
+    assert origins["912345678"] == {"0912345678", "912345678"}
@@ -0,0 +1,128 @@
+# backend/tests/test_rewrite_rules.py
+# RewriteRuleDocument must produce exactly what format_rewrite_rules_for_vos(parse_vos_rewrite_rules(s))
+# produced for the same string and edits (the dict-based code it replaced in the add-reals and
+# cleanup paths).
+import random
+
+import pytest
+
+from rewrite_rules import RewriteRuleDocument, parse_rewrite_rules_cached
+from utils import format_rewrite_rules_for_vos, parse_vos_rewrite_rules
+
+
+RULE_STRINGS = [
+    "",
+    None,
+    "100000:912345678;913345678,100001:hetso,100002:2412345678",  # canonical
+    "100002:1,100000:2,100001:3",  # unsorted keys
+    " 100000 : 912345678 ; 913345678 , 100001:hetso ",  # whitespace
+    "100000:1;2,100000:3",  # repeated key: last segment wins
+    "100000:1;;2;,100001:;,100002:",  # empty real tokens and empty keys
+    "100000:HETSO,100001:HetSo",  # keyword case
+    "100000:hetso;1",  # hetso together with reals is not the keyword
+    "novalue,:123,100000:1,",  # segments without colon / key, trailing comma
+    "100000:a:b,100001:1",  # colon inside the reals
+    ",,,",
+    "100000:1\t;2\n,100001:3",
+]
+
+
+def _generate_rules(rng: random.Random, keys: int) -> str:
+    rules = {}
+    for _ in range(keys):
+        key = f"{rng.randint(0, 999999):06d}"
+        rules[key] = ["hetso"] if rng.random() < 0.1 else [f"9{rng.randint(10000000, 99999999)}" for _ in range(rng.randint(0, 4))]
+    return format_rewrite_rules_for_vos(rules)
+
+
+@pytest.mark.parametrize("rules_string", RULE_STRINGS, ids=repr)
+def test_roundtrip_matches_parse_format(rules_string):
+    doc = RewriteRuleDocument(rules_string)
+    expected = parse_vos_rewrite_rules(rules_string)
+    assert doc.to_string() == format_rewrite_rules_for_vos(expected)
+    assert doc.to_dict() == expected
+    assert doc.keys() == sorted(expected)
+    assert len(doc) == len(expected)
+
+
+@pytest.mark.parametrize("rules_string", RULE_STRINGS, ids=repr)
+def test_reads_match_parse(rules_string):
+    doc = RewriteRuleDocument(rules_string)
+    expected = parse_vos_rewrite_rules(rules_string)
+    for key in [*expected, "999999"]:
+        assert (key in doc) == (key in expected)
+        assert doc.get_reals(key) == expected.get(key)
+
+
+def test_parse_rewrite_rules_cached_matches_parse():
+    for rules_string in [s for s in RULE_STRINGS if s is not None]:
+        parsed = parse_rewrite_rules_cached(rules_string)
+        assert parsed.rules == parse_vos_rewrite_rules(rules_string)
+        assert list(parsed.sorted_keys) == sorted(parsed.rules)
+
+
+# --- Edits, against the dict operations they replaced ---
+
+def _dict_add_reals(rules, key, reals):
+    current = rules.get(key, [])
+    if current == ["hetso"]:
+        current = []
+    seen = set()
+    rules[key] = [r for r in current + [r for r in reals if r] if not (r in seen or seen.add(r))]
+
+
+def _dict_remove_reals(rules, key, reals, drop_empty):
+    if key not in rules:
+        return
+    remaining = [r for r in rules[key] if r not in set(reals)]
+    if drop_empty and not remaining:
+        del rules[key]
+    else:
+        rules[key] = remaining
+
+
+def _apply(doc, rules, op, key, reals):
+    if op == "add":
+        doc.add_reals(key, reals)
+        _dict_add_reals(rules, key, reals)
+    elif op == "set":
+        doc.set_reals(key, reals)
+        rules[key] = [r for r in reals if r]
+    elif op == "hetso":
+        doc.set_hetso(key)
+        rules[key] = ["hetso"]
+    elif op == "remove":
+        doc.remove_reals(key, reals, drop_empty=False)
+        _dict_remove_reals(rules, key, reals, drop_empty=False)
+    elif op == "remove_drop":
+        doc.remove_reals(key, reals, drop_empty=True)
+        _dict_remove_reals(rules, key, reals, drop_empty=True)
+    elif op == "delete":
+        doc.delete_key(key)
+        rules.pop(key, None)
+
+
+def test_add_reals_semantics():
+    doc = RewriteRuleDocument("100000:hetso,100001:1;2")
+    assert doc.add_reals("100000", ["5", "5", ""]) == 1
+    assert doc.add_reals("100001", ["2", "3"]) == 3
+    assert doc.add_reals("100002", ["7"]) == 1
+    assert doc.to_string() == "100000:5,100001:1;2;3,100002:7"
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_edit_sequences_match_dict_edits(seed):
+    rng = random.Random(seed)
+    rules_string = rng.choice([s for s in RULE_STRINGS if s] + [_generate_rules(rng, rng.randint(0, 60)) for _ in range(3)])
+    doc = RewriteRuleDocument(rules_string)
+    rules = parse_vos_rewrite_rules(rules_string)
+    for _ in range(40):
+        existing = sorted(rules)
+        key = rng.choice(existing) if existing and rng.random() < 0.7 else f"{rng.randint(0, 999999):06d}"
+        pool = list(rules.get(key, [])) + [f"9{rng.randint(10, 99)}", "", "hetso"]
+        reals = [rng.choice(pool) for _ in range(rng.randint(0, 4))]
+        _apply(doc, rules, rng.choice(["add", "set", "hetso", "remove", "remove_drop", "delete"]), key, reals)
+        if rng.random() < 0.5:
+            assert doc.to_string() == format_rewrite_rules_for_vos(rules)
+    assert doc.to_string() == format_rewrite_rules_for_vos(rules)
+    assert doc.to_dict() == rules
@@ -0,0 +1,190 @@
+# backend/tracing.py
+# Lightweight in-process request tracing.
+# A trace is started per request only when the client opts in (header config.TRACE_HEADER, see
+# the middleware in main.py). Spans nest through a contextvar; without an active trace span()
+# is a no-op. Thread-pool fan-outs carry the trace into worker threads by submitting
+# bind_context(fn). Finished traces are kept in a small in-memory store for /debug/traces and
+# handed to registered exporters.
+from __future__ import annotations
+
+import contextvars
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import config
+
+
+class Span:
+    __slots__ = ("name", "attributes", "start", "end", "children", "error", "trace")
+
+    def __init__(self, name: str, attributes: Dict[str, object], trace: "Trace"):
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List[Span] = []
+        self.error: Optional[str] = None
+        self.trace = trace
+
+    def set(self, **attributes: object) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self, origin: float) -> dict:
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+            "children": [c.to_dict(origin) for c in sorted(self.children, key=lambda c: c.start)],
+        }
+
+
+class Trace:
+    """One traced request. Span count is capped at config.TRACE_MAX_SPANS; extra spans are dropped and counted."""
+
+    def __init__(self, name: str, attributes: Dict[str, object]):
+        self.id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._span_count = itertools.count(1)
+        self.dropped_spans = 0
+        self.root = Span(name, attributes, self)
+        next(self._span_count)
+
+    def _new_child(self, parent: Span, name: str, attributes: Dict[str, object]) -> Optional[Span]:
+        if next(self._span_count) > config.TRACE_MAX_SPANS:
+            with self._lock:
+                self.dropped_spans += 1
+            return None
+        span = Span(name, attributes, self)
+        with self._lock:
+            parent.children.append(span)
+        return span
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "trace_id": self.id,
+                "started_at": self.started_at,
+                "dropped_spans": self.dropped_spans,
+                "root": self.root.to_dict(self.root.start),
+            }
+
+
+class _NoopSpan:
+    """Yielded by span() outside a trace so callers can call set() unconditionally."""
+    __slots__ = ()
+
+    def set(self, **attributes: object) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_exporters: List[Callable[[dict], None]] = []
+_store: "OrderedDict[str, Trace]" = OrderedDict()
+_store_lock = threading.Lock()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: object) -> Iterator[Span | _NoopSpan]:
+    """Child span of the current span; outside a trace (or over the span cap) nothing is recorded."""
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+    child = parent.trace._new_child(parent, name, attributes)
+    if child is None:
+        yield _NOOP_SPAN
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attributes: object) -> Iterator[Trace]:
+    """Root span of a new trace; on exit the trace is stored and exported."""
+    trace = Trace(name, attributes)
+    token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as exc:
+        trace.root.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        trace.root.end = time.perf_counter()
+        _current_span.reset(token)
+        _finish(trace)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """fn bound to a copy of the caller's context, so spans it opens in a worker thread join the caller's trace."""
+    if _current_span.get() is None:
+        return fn
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def add_exporter(exporter: Callable[[dict], None]) -> None:
+    """Register a callable receiving every finished trace as a dict (e.g. to ship it to a collector)."""
+    _exporters.append(exporter)
+
+
+def remove_exporter(exporter: Callable[[dict], None]) -> None:
+    if exporter in _exporters:
+        _exporters.remove(exporter)
+
+
+def _finish(trace: Trace) -> None:
+    with _store_lock:
+        _store[trace.id] = trace
+        while len(_store) > config.TRACE_MAX_RETAINED:
+            _store.popitem(last=False)
+    if _exporters:
+        data = trace.to_dict()
+        for exporter in list(_exporters):
+            try:
+                exporter(data)
+            except Exception as exc:  # noqa: BLE001
+                logging.warning(f"Trace exporter {exporter!r} failed: {exc}")
+
+
+def get_trace(trace_id: str) -> Optional[dict]:
+    with _store_lock:
+        trace = _store.get(trace_id)
+    return trace.to_dict() if trace else None
+
+
+def list_traces() -> List[dict]:
+    """Most recent first: id, root name/attributes and total duration."""
+    with _store_lock:
+        traces = list(_store.values())
+    return [
+        {
+            "trace_id": t.id,
+            "started_at": t.started_at,
+            "name": t.root.name,
+            "attributes": t.root.attributes,
+            "duration_ms": round(((t.root.end or time.perf_counter()) - t.root.start) * 1000, 3),
+        }
+        for t in reversed(traces)
+    ]
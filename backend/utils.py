@@ -17,60 +17,63 @@ LANDLINE_02X_PREFIXES_AFTER_0_NATIONAL = [
 MOBILE_SUBSCRIBER_PART_LENGTH = 7
 LANDLINE_SUBSCRIBER_PART_MIN_LENGTH = 7
 
-# --- Phone Number Utility Functions ---
+# Lookup tables compiled once from the prefix lists above. Because a Vinaphone number must be
+# exactly <national prefix> + MOBILE_SUBSCRIBER_PART_LENGTH digits, the prefix is fully determined
+# by the length, so one set lookup replaces a loop over VINAPHONE_PREFIXES_NATIONAL.
+_VINA_PREFIX_SET = frozenset(VINAPHONE_PREFIXES_NATIONAL)
+_LANDLINE_PREFIX_SET = frozenset(LANDLINE_02X_PREFIXES_AFTER_0_NATIONAL)
+_NON_DIGITS = re.compile(r"[^0-9]")
 
-def classify_phone_number(phone_number_str: str) -> tuple[str, str, str]:
-    cleaned_number = re.sub(r"[^0-9]", "", str(phone_number_str))
-    original_cleaned_for_return = cleaned_number
+# --- Phone Number Utility Functions ---
 
+def _clean_number(value) -> str:
+    s = value if isinstance(value, str) else str(value)
+    if s.isascii() and s.isdigit():
+        return s
+    return _NON_DIGITS.sub("", s)
+
+def _vina_national_prefix(digits: str) -> str | None:
+    """Return the Vinaphone national prefix if digits is exactly <prefix> + subscriber part, else None."""
+    prefix_len = len(digits) - MOBILE_SUBSCRIBER_PART_LENGTH
+    if prefix_len <= 0:
+        return None
+    prefix = digits[:prefix_len]
+    return prefix if prefix in _VINA_PREFIX_SET else None
+
+def _is_landline_after_trunk(digits: str) -> bool:
+    return digits.startswith("2") and \
+        len(digits) >= 1 + LANDLINE_SUBSCRIBER_PART_MIN_LENGTH and \
+        digits[0:2] in _LANDLINE_PREFIX_SET
+
+def _classify_cleaned(cleaned_number: str) -> tuple[str, str]:
     if not cleaned_number:
-        return "Unknown", "", original_cleaned_for_return
+        return "Unknown", ""
 
     if cleaned_number.startswith("84"):
         number_after_84 = cleaned_number[2:]
-        for nat_prefix in VINAPHONE_PREFIXES_NATIONAL:
-            if number_after_84.startswith(nat_prefix) and \
-               len(number_after_84) == len(nat_prefix) + MOBILE_SUBSCRIBER_PART_LENGTH:
-                return "VinaMobile_84", "84" + nat_prefix, original_cleaned_for_return
-        
-        if number_after_84.startswith("2") and \
-           len(number_after_84) >= 1 + LANDLINE_SUBSCRIBER_PART_MIN_LENGTH:
-            area_prefix_check = number_after_84[0:2]
-            if area_prefix_check in LANDLINE_02X_PREFIXES_AFTER_0_NATIONAL:
-                return "Landline_842x", "84" + area_prefix_check, original_cleaned_for_return
+        nat_prefix = _vina_national_prefix(number_after_84)
+        if nat_prefix:
+            return "VinaMobile_84", "84" + nat_prefix
+        if _is_landline_after_trunk(number_after_84):
+            return "Landline_842x", "84" + number_after_84[0:2]
 
     if cleaned_number.startswith("0"):
         number_after_0 = cleaned_number[1:]
-        for nat_prefix in VINAPHONE_PREFIXES_NATIONAL:
-            if number_after_0.startswith(nat_prefix) and \
-               len(number_after_0) == len(nat_prefix) + MOBILE_SUBSCRIBER_PART_LENGTH:
-                return "VinaMobile_0", "0" + nat_prefix, original_cleaned_for_return
-
-        if number_after_0.startswith("2") and \
-           len(number_after_0) >= 1 + LANDLINE_SUBSCRIBER_PART_MIN_LENGTH:
-            area_prefix_check = number_after_0[0:2]
-            if area_prefix_check in LANDLINE_02X_PREFIXES_AFTER_0_NATIONAL:
-                return "Landline_02x", "0" + area_prefix_check, original_cleaned_for_return
-        
-        is_processed_vina = any(
-            cleaned_number.startswith("0" + vp_prefix) and \
-            len(cleaned_number[1:]) == len(vp_prefix) + MOBILE_SUBSCRIBER_PART_LENGTH
-            for vp_prefix in VINAPHONE_PREFIXES_NATIONAL
-            if cleaned_number[1:].startswith(vp_prefix)
-        )
-        if len(cleaned_number) == 10 and not is_processed_vina:
-            return "Mobile_Other_0", cleaned_number[0:3], original_cleaned_for_return
-
-    for nat_prefix in VINAPHONE_PREFIXES_NATIONAL:
-        if cleaned_number.startswith(nat_prefix) and \
-           len(cleaned_number) == len(nat_prefix) + MOBILE_SUBSCRIBER_PART_LENGTH:
-            return "VinaMobile_NoPrefix", nat_prefix, original_cleaned_for_return
-
-    return "Unknown", "", original_cleaned_for_return
+        nat_prefix = _vina_national_prefix(number_after_0)
+        if nat_prefix:
+            return "VinaMobile_0", "0" + nat_prefix
+        if _is_landline_after_trunk(number_after_0):
+            return "Landline_02x", "0" + number_after_0[0:2]
+        if len(cleaned_number) == 10:
+            return "Mobile_Other_0", cleaned_number[0:3]
 
-def transform_real_number_for_vos_storage(real_number_str: str) -> str:
-    number_type, _, cleaned_original_num = classify_phone_number(real_number_str)
+    nat_prefix = _vina_national_prefix(cleaned_number)
+    if nat_prefix:
+        return "VinaMobile_NoPrefix", nat_prefix
+
+    return "Unknown", ""
 
+def _transform_classified(number_type: str, cleaned_original_num: str) -> str:
     if not cleaned_original_num:
         return ""
 
@@ -79,31 +82,23 @@ def transform_real_number_for_vos_storage(real_number_str: str) -> str:
             return cleaned_original_num[1:]
         elif cleaned_original_num.startswith("84") and len(cleaned_original_num) > 2:
             num_after_84_check = cleaned_original_num[2:]
-            for vp_prefix_check in VINAPHONE_PREFIXES_NATIONAL:
-                if num_after_84_check.startswith(vp_prefix_check) and \
-                   len(num_after_84_check) == len(vp_prefix_check) + MOBILE_SUBSCRIBER_PART_LENGTH:
-                    return num_after_84_check
-            return cleaned_original_num 
+            if _vina_national_prefix(num_after_84_check):
+                return num_after_84_check
+            return cleaned_original_num
         return cleaned_original_num
 
     if number_type == "Landline_02x":
         return "84" + cleaned_original_num[1:]
 
-    if number_type == "Landline_842x":
-        return cleaned_original_num
-
     return cleaned_original_num
 
-def generate_search_variants(original_number_input: str) -> set[str]:
+def _variants_classified(number_type_class: str, cleaned_original_class: str) -> set[str]:
     variants_set = set()
-    number_type_class, _, cleaned_original_class = classify_phone_number(original_number_input)
-
     if not cleaned_original_class:
         return variants_set
 
     variants_set.add(cleaned_original_class)
-    transformed_for_storage = transform_real_number_for_vos_storage(cleaned_original_class)
-    variants_set.add(transformed_for_storage)
+    variants_set.add(_transform_classified(number_type_class, cleaned_original_class))
 
     if number_type_class.startswith("VinaMobile"):
         base_vina_num = cleaned_original_class
@@ -111,20 +106,10 @@ def generate_search_variants(original_number_input: str) -> set[str]:
             base_vina_num = cleaned_original_class[1:]
         elif cleaned_original_class.startswith("84"):
             temp_after_84_vina = cleaned_original_class[2:]
-            is_valid_after_84 = any(
-                temp_after_84_vina.startswith(vp) and \
-                len(temp_after_84_vina) == len(vp) + MOBILE_SUBSCRIBER_PART_LENGTH
-                for vp in VINAPHONE_PREFIXES_NATIONAL
-            )
-            if is_valid_after_84:
+            if _vina_national_prefix(temp_after_84_vina):
                 base_vina_num = temp_after_84_vina
-        
-        is_valid_base = any(
-             base_vina_num.startswith(vp) and \
-             len(base_vina_num) == len(vp) + MOBILE_SUBSCRIBER_PART_LENGTH
-             for vp in VINAPHONE_PREFIXES_NATIONAL
-        )
-        if is_valid_base:
+
+        if _vina_national_prefix(base_vina_num):
             variants_set.add(base_vina_num)
             variants_set.add("0" + base_vina_num)
             # variants_set.add("84" + base_vina_num) # Optional: VOS usually doesn't store with 84 for Vina
@@ -132,11 +117,11 @@ def generate_search_variants(original_number_input: str) -> set[str]:
     elif number_type_class == "Landline_02x": # e.g., 024xxxxxxx
         variants_set.add(cleaned_original_class[1:]) # 24xxxxxxx
         variants_set.add("84" + cleaned_original_class[1:]) # 8424xxxxxxx
-        
+
     elif number_type_class == "Landline_842x": # e.g., 8424xxxxxxx
         num_after_84_landline = cleaned_original_class[2:] # 24xxxxxxx
         if num_after_84_landline.startswith("2") and \
-           num_after_84_landline[0:2] in LANDLINE_02X_PREFIXES_AFTER_0_NATIONAL:
+           num_after_84_landline[0:2] in _LANDLINE_PREFIX_SET:
             variants_set.add("0" + num_after_84_landline) # 024xxxxxxx
             variants_set.add(num_after_84_landline) # 24xxxxxxx
 
@@ -153,8 +138,68 @@ def generate_search_variants(original_number_input: str) -> set[str]:
         else: # Does not start with 0 or 84
             variants_set.add("0" + cleaned_original_class)
             variants_set.add("84" + cleaned_original_class)
-            
-    return {v for v in variants_set if v}
+
+    variants_set.discard("")
+    return variants_set
+
+def classify_phone_number(phone_number_str: str) -> tuple[str, str, str]:
+    cleaned_number = _clean_number(phone_number_str)
+    number_type, prefix = _classify_cleaned(cleaned_number)
+    return number_type, prefix, cleaned_number
+
+def transform_real_number_for_vos_storage(real_number_str: str) -> str:
+    cleaned_number = _clean_number(real_number_str)
+    return _transform_classified(_classify_cleaned(cleaned_number)[0], cleaned_number)
+
+def generate_search_variants(original_number_input: str) -> set[str]:
+    cleaned_number = _clean_number(original_number_input)
+    return _variants_classified(_classify_cleaned(cleaned_number)[0], cleaned_number)
+
+# --- Batch Phone Number APIs ---
+# Accept any iterable of numbers, including NumPy arrays (converted with .tolist()).
+# Integer inputs lose leading zeros, so pass numbers as strings when the trunk prefix matters.
+# Results are memoized per cleaned number within one call, so repeated inputs cost one lookup.
+
+def _as_python_list(numbers) -> list:
+    return numbers.tolist() if hasattr(numbers, "tolist") else list(numbers)
+
+def classify_phone_numbers_batch(numbers) -> list[tuple[str, str, str]]:
+    memo: dict[str, tuple[str, str, str]] = {}
+    out = []
+    for value in _as_python_list(numbers):
+        cleaned_number = _clean_number(value)
+        result = memo.get(cleaned_number)
+        if result is None:
+            result = memo[cleaned_number] = (*_classify_cleaned(cleaned_number), cleaned_number)
+        out.append(result)
+    return out
+
+def transform_real_numbers_for_vos_storage_batch(numbers) -> list[str]:
+    return [_transform_classified(number_type, cleaned) for number_type, _, cleaned in classify_phone_numbers_batch(numbers)]
+
+def generate_search_variants_batch(numbers) -> list[set[str]]:
+    """One variant set per input, in input order. Sets for repeated inputs are shared; do not mutate them."""
+    memo: dict[str, set[str]] = {}
+    out = []
+    for number_type, _, cleaned in classify_phone_numbers_batch(numbers):
+        variants = memo.get(cleaned)
+        if variants is None:
+            variants = memo[cleaned] = _variants_classified(number_type, cleaned)
+        out.append(variants)
+    return out
+
+def build_variant_origin_map(original_inputs) -> dict[str, set[str]]:
+    """
+    Reverse map from every search variant to the original inputs that produce it.
+    Built once per search so attributing a matched variant is a dict lookup instead of
+    regenerating variants for every original input.
+    """
+    variant_origins: dict[str, set[str]] = {}
+    inputs = _as_python_list(original_inputs)
+    for orig, variants in zip(inputs, generate_search_variants_batch(inputs)):
+        for v in variants:
+            variant_origins.setdefault(v, set()).add(orig)
+    return variant_origins
 
 
 # --- Currency Formatting Utility ---
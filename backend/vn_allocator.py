@@ -0,0 +1,160 @@
+# backend/vn_allocator.py
+# Free six-digit virtual number allocator.
+# Keeps a 1,000,000-bit bitmap (125 KB) of keys used by any server's rewrite rules,
+# built from the virtual number registry, plus short-lived reservations so two
+# operators are never handed the same key.
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils import is_six_digit_virtual_number_candidate
+from vn_registry import VirtualNumberRegistry, get_virtual_number_registry
+
+
+KEY_SPACE = 1_000_000
+_NOT_FULL_BYTE = re.compile(b"[^\xff]")
+
+
+class RegistryIncomplete(Exception):
+    """Some servers' rewrite rules could not be read, so keys used there would look free."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class VirtualNumberAllocator:
+    def __init__(self):
+        self._used = bytearray(KEY_SPACE // 8)
+        self._reservations: Dict[int, Tuple[float, Optional[str]]] = {}  # key -> (expires_at, holder)
+        self._lock = threading.Lock()
+        self.registry_built_at: Optional[float] = None
+        self.used_count = 0
+
+    def load_from_registry(self, registry: VirtualNumberRegistry) -> None:
+        """Rebuild the used-key bitmap from a registry (no-op if it is the one already loaded)."""
+        if registry.built_at == self.registry_built_at:
+            return
+        used = bytearray(KEY_SPACE // 8)
+        count = 0
+        for key in registry.records:
+            if is_six_digit_virtual_number_candidate(key):
+                k = int(key)
+                used[k >> 3] |= 1 << (k & 7)
+                count += 1
+        with self._lock:
+            self._used = used
+            self.used_count = count
+            self.registry_built_at = registry.built_at
+
+    def _is_taken_locked(self, k: int, now: float) -> bool:
+        if self._used[k >> 3] & (1 << (k & 7)):
+            return True
+        reservation = self._reservations.get(k)
+        if reservation is None:
+            return False
+        if reservation[0] <= now:
+            del self._reservations[k]
+            return False
+        return True
+
+    def find_free(
+        self,
+        count: int,
+        range_start: int = 0,
+        range_end: int = KEY_SPACE - 1,
+        prefix: str = "",
+        reserve_seconds: Optional[float] = None,
+        holder: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Return up to `count` free keys (ascending) within [range_start, range_end] and the optional
+        digit prefix. Fully used bitmap bytes are skipped at C speed. When reserve_seconds is given,
+        the returned keys are reserved atomically for that long.
+        """
+        if prefix:
+            if not prefix.isdigit() or len(prefix) > 6:
+                return []
+            width = 10 ** (6 - len(prefix))
+            range_start = max(range_start, int(prefix) * width)
+            range_end = min(range_end, (int(prefix) + 1) * width - 1)
+        range_start, range_end = max(0, range_start), min(KEY_SPACE - 1, range_end)
+
+        found: List[int] = []
+        now = time.time()
+        with self._lock:
+            k = range_start
+            while k <= range_end and len(found) < count:
+                if k & 7 == 0:
+                    m = _NOT_FULL_BYTE.search(self._used, k >> 3, (range_end >> 3) + 1)
+                    if m is None:
+                        break
+                    k = max(k, m.start() << 3)
+                    if k > range_end:
+                        break
+                if not self._is_taken_locked(k, now):
+                    found.append(k)
+                k += 1
+            if reserve_seconds:
+                for f in found:
+                    self._reservations[f] = (now + reserve_seconds, holder)
+        return [f"{f:06d}" for f in found]
+
+    def reserve(self, keys: List[str], reserve_seconds: float, holder: Optional[str] = None) -> Tuple[List[str], List[str]]:
+        """Reserve specific keys. Returns (reserved, unavailable)."""
+        reserved, unavailable = [], []
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                if not isinstance(key, str) or not is_six_digit_virtual_number_candidate(key) or self._is_taken_locked(int(key), now):
+                    unavailable.append(key)
+                    continue
+                self._reservations[int(key)] = (now + reserve_seconds, holder)
+                reserved.append(key.strip())
+        return reserved, unavailable
+
+    def release(self, keys: List[str], holder: Optional[str] = None) -> Tuple[int, List[str]]:
+        """Release reservations made by `holder`. Returns (released count, keys not held by holder)."""
+        released, not_held = 0, []
+        with self._lock:
+            for key in keys:
+                if not (isinstance(key, str) and is_six_digit_virtual_number_candidate(key)):
+                    not_held.append(key)
+                    continue
+                reservation = self._reservations.get(int(key))
+                if reservation is None or reservation[1] != holder:
+                    not_held.append(key)
+                    continue
+                del self._reservations[int(key)]
+                released += 1
+        return released, not_held
+
+    def reservations(self) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            for k in [k for k, (exp, _) in self._reservations.items() if exp <= now]:
+                del self._reservations[k]
+            return [
+                {"key": f"{k:06d}", "expires_at": exp, "holder": holder}
+                for k, (exp, holder) in sorted(self._reservations.items())
+            ]
+
+
+allocator = VirtualNumberAllocator()
+
+
+def get_allocator(sync_registry: bool = True) -> VirtualNumberAllocator:
+    """
+    Return the shared allocator, synced with the current (possibly just rebuilt) registry.
+    Raises RegistryIncomplete while any server's rules are missing from the registry.
+    sync_registry=False skips the registry for calls that only touch reservations.
+    """
+    if sync_registry:
+        registry = get_virtual_number_registry()
+        if registry.errors:
+            raise RegistryIncomplete(registry.errors)
+        allocator.load_from_registry(registry)
+    return allocator
@@ -0,0 +1,172 @@
+# backend/vn_registry.py
+# Fleet-wide virtual number registry built in parallel from gateway snapshots.
+# Stores one compact record per (key, server, RG) plus precomputed utilization aggregates,
+# so capacity dashboards never need their own full fleet scan.
+from __future__ import annotations
+
+import threading
+import time
+import concurrent.futures
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import config
+import snapshot_cache
+from utils import parse_vos_rewrite_rules
+
+
+class VirtualNumberRecord(NamedTuple):
+    server_name: str
+    rg_name: str
+    real_count: int
+    is_hetso: bool
+
+
+class VirtualNumberRegistry:
+    """
+    Immutable result of one registry build.
+    - records: virtual key -> [VirtualNumberRecord, ...]
+    - stats: aggregates computed once at build time (see _compute_stats)
+    """
+
+    def __init__(
+        self,
+        records: Dict[str, List[VirtualNumberRecord]],
+        errors: List[str],
+        snapshot_versions: Dict[str, int],
+        generations: Optional[Dict[str, int]] = None,
+    ):
+        self.records = records
+        self.errors = errors
+        self.snapshot_versions = snapshot_versions
+        self.generations = generations or {}  # server url -> RG invalidation generation seen by the build
+        self.built_at = time.time()
+        self.stats = self._compute_stats()
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def is_current(self, server_list: List[dict]) -> bool:
+        """False once any server's RGs were written (snapshot_cache.invalidate_server) after the build."""
+        return all(
+            snapshot_cache.get_invalidation_generation(s["url"], snapshot_cache.ROUTING) == self.generations.get(s["url"], 0)
+            for s in server_list
+        )
+
+    def lookup(self, virtual_key: str) -> List[VirtualNumberRecord]:
+        return self.records.get(virtual_key, [])
+
+    def _compute_stats(self) -> dict:
+        keys_per_rg: Counter = Counter()
+        hetso_per_server: Counter = Counter()
+        keys_per_server: Counter = Counter()
+        reals_histogram: Counter = Counter()
+        multi_server_keys: Dict[str, List[str]] = {}
+
+        for key, recs in self.records.items():
+            servers = sorted({r.server_name for r in recs})
+            if len(servers) > 1:
+                multi_server_keys[key] = servers
+            for r in recs:
+                keys_per_rg[(r.server_name, r.rg_name)] += 1
+                keys_per_server[r.server_name] += 1
+                if r.is_hetso:
+                    hetso_per_server[r.server_name] += 1
+                else:
+                    reals_histogram[r.real_count] += 1
+
+        return {
+            "total_keys": len(self.records),
+            "total_definitions": sum(keys_per_server.values()),
+            "keys_per_server": dict(sorted(keys_per_server.items())),
+            "keys_per_rg": [
+                {"server_name": s, "rg_name": rg, "keys": n} for (s, rg), n in sorted(keys_per_rg.items())
+            ],
+            "hetso_total": sum(hetso_per_server.values()),
+            "hetso_per_server": dict(sorted(hetso_per_server.items())),
+            "reals_per_key_histogram": {str(k): v for k, v in sorted(reals_histogram.items())},
+            "multi_server_keys": dict(sorted(multi_server_keys.items())),
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "built_at": self.built_at,
+            "snapshot_versions": self.snapshot_versions,
+            "errors": self.errors,
+            "stats": self.stats,
+        }
+
+
+def _registry_part_for_server(server_info: dict) -> Tuple[List[Tuple[str, VirtualNumberRecord]], Optional[str], int]:
+    snapshot, error = snapshot_cache.get_gateway_snapshot(server_info, snapshot_cache.ROUTING)
+    if error or snapshot is None:
+        return [], f"Failed to fetch RG data from {server_info.get('name')}: {error or 'no data'}", 0
+
+    server_name = snapshot.server_name
+    part: List[Tuple[str, VirtualNumberRecord]] = []
+    for rg in snapshot.gateways:
+        rg_name = rg.get("name", f"Unnamed_RG_on_{server_name}")
+        for key, reals in parse_vos_rewrite_rules(rg.get("rewriteRulesInCaller", "") or "").items():
+            is_hetso = reals == ["hetso"]
+            part.append((key, VirtualNumberRecord(server_name, rg_name, 0 if is_hetso else len(reals), is_hetso)))
+    return part, None, snapshot.version
+
+
+def build_virtual_number_registry(server_list: List[dict]) -> VirtualNumberRegistry:
+    """Build a registry from RG snapshots of every server, one worker per server."""
+    records: Dict[str, List[VirtualNumberRecord]] = {}
+    errors: List[str] = []
+    versions: Dict[str, int] = {}
+    # Taken before downloading, so a write during the build makes the result stale right away
+    generations = {s["url"]: snapshot_cache.get_invalidation_generation(s["url"], snapshot_cache.ROUTING) for s in server_list or []}
+    if not server_list:
+        return VirtualNumberRegistry(records, errors, versions, generations)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(server_list)) as executor:
+        future_to_server = {executor.submit(_registry_part_for_server, s): s for s in server_list}
+        for future in concurrent.futures.as_completed(future_to_server):
+            server_name = future_to_server[future]["name"]
+            try:
+                part, error, version = future.result()
+            except Exception as exc:
+                errors.append(f"Error building VN registry for {server_name}: {exc}")
+                continue
+            if error:
+                errors.append(error)
+                continue
+            versions[server_name] = version
+            for key, rec in part:
+                records.setdefault(key, []).append(rec)
+
+    return VirtualNumberRegistry(records, sorted(errors), versions, generations)
+
+
+_current: Optional[VirtualNumberRegistry] = None
+_build_lock = threading.Lock()
+
+
+def _needs_rebuild(registry: Optional[VirtualNumberRegistry], force_refresh: bool) -> bool:
+    if registry is None or registry.age > config.VN_REGISTRY_TTL_SECONDS or not registry.is_current(config.VOS_SERVERS):
+        return True
+    # A registry missing some servers is retried as soon as forced refreshes would be
+    return (force_refresh or bool(registry.errors)) and registry.age >= config.VN_REGISTRY_MIN_REFRESH_SECONDS
+
+
+def get_virtual_number_registry(force_refresh: bool = False) -> VirtualNumberRegistry:
+    """
+    Return the cached registry, rebuilding it when older than config.VN_REGISTRY_TTL_SECONDS or
+    when a server's RGs were written since it was built (or, if some servers failed, after
+    config.VN_REGISTRY_MIN_REFRESH_SECONDS). force_refresh rebuilds unless the
+    registry is younger than config.VN_REGISTRY_MIN_REFRESH_SECONDS. One build runs at a time;
+    callers with a usable registry never wait for it.
+    """
+    global _current
+    current = _current
+    if not _needs_rebuild(current, force_refresh):
+        return current
+    with _build_lock:
+        if _current is not current and not _needs_rebuild(_current, False):
+            return _current  # rebuilt by another caller while we waited
+        _current = build_virtual_number_registry(config.VOS_SERVERS)
+        return _current